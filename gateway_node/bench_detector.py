@@ -0,0 +1,227 @@
+"""Benchmark: PersonDetector over recorded video or an image directory (headless)
+
+Sweeps inference backends (including the Haar fallback), input sizes, confidence thresholds and batch
+sizes (frames per model call, as with several cameras) over the same
+frames and reports throughput, latency percentiles and memory per
+configuration. Each backend / input size runs in a forked process of its
+own and its memory is the peak RSS above the RSS just before the model
+loaded, so neither models loaded earlier nor the preloaded frames are
+counted. With --labels, frame-level person presence is scored
+(precision / recall). --out writes the results as JSON for diffing
+between releases.
+
+    python bench_detector.py clip.mp4 --imgsz 320,640 --conf 0.25,0.5
+    python bench_detector.py frames/ --labels labels.json --backends pytorch,onnx --out v1.2.json
+
+Labels are a JSON object mapping an image file name (image directories) or
+a frame index (videos) to the number of people in it; frames without an
+entry are not scored.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import time
+
+import cv2
+import psutil
+
+from hardware import VideoFileCamera
+from haar_detector import HaarPersonDetector
+from person_detector import PersonDetector
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+frames = []  # [(key, frame)], loaded once in the parent and inherited by each forked configuration
+
+
+def load_frames(source, max_frames):
+    """[(key, frame)] where key is the file name or the frame index"""
+    frames = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(source, name))
+                if frame is not None:
+                    frames.append((name, frame))
+            if len(frames) >= max_frames:
+                break
+    else:
+        cap = VideoFileCamera(source, loop=False, realtime=False)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append((str(len(frames)), frame))
+        cap.release()
+    return frames
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def score(predictions, labels):
+    """Frame-level presence precision / recall over the labelled frames"""
+    tp = fp = fn = tn = 0
+    for key, count in predictions.items():
+        if key not in labels:
+            continue
+        truth, predicted = labels[key] > 0, count > 0
+        tp += truth and predicted
+        fp += predicted and not truth
+        fn += truth and not predicted
+        tn += not truth and not predicted
+    return {
+        "frames": tp + fp + fn + tn,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": tp / (tp + fp) if tp + fp else None,
+        "recall": tp / (tp + fn) if tp + fn else None,
+    }
+
+
+def run(detector, frames, warmup, base_rss, batch=1):
+    """Latency is per model call (a batch of `batch` frames); memory is peak RSS above base_rss"""
+    proc = psutil.Process()
+    for i in range(0, min(warmup, len(frames)), batch):
+        detector.detect_batch([frame for _, frame in frames[i:i + batch]])
+    detector.reset_stats()
+
+    timings, predictions = [], {}
+    peak_rss = proc.memory_info().rss
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        chunk = frames[i:i + batch]
+        t0 = time.perf_counter()
+        if batch == 1:
+            counts = [detector.detect_frame(chunk[0][1])[0]]
+        else:
+            counts = [count for count, _ in detector.detect_batch([frame for _, frame in chunk])]
+        timings.append((time.perf_counter() - t0) * 1000)
+        for (key, _), count in zip(chunk, counts):
+            predictions[key] = count
+        peak_rss = max(peak_rss, proc.memory_info().rss)
+    wall = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "frames": len(frames),
+        "fps": len(frames) / wall,
+        "latency_ms": {
+            "mean": statistics.fmean(timings),
+            "p50": percentile(timings, 0.50),
+            "p95": percentile(timings, 0.95),
+            "p99": percentile(timings, 0.99),
+            "max": timings[-1],
+        },
+        "rss_mb": (peak_rss - base_rss) / 1e6,
+    }, predictions
+
+
+def bench_config(conn, args, backend, imgsz, roi, labels):
+    """One backend / input size (in a forked process): sends [result] per conf and batch, or an error"""
+    try:
+        base_rss = psutil.Process().memory_info().rss
+        if backend.startswith("haar"):
+            detector = HaarPersonDetector(camera=None, motion_threshold=None, imgsz=imgsz, roi=roi,
+                                          hog=backend == "haar+hog")
+        else:
+            detector = PersonDetector(model_path=args.model, camera=None, motion_threshold=None,
+                                      backend=backend, int8=args.int8, imgsz=imgsz, roi=roi,
+                                      dynamic=any(int(v) > 1 for v in args.batch.split(",")))
+    except Exception as e:
+        conn.send(f"{backend} imgsz={imgsz} unavailable: {e}")
+        return
+    results = []
+    for conf in (float(v) for v in args.conf.split(",")):
+        for batch in (int(v) for v in args.batch.split(",")):
+            detector.conf = conf
+            result, predictions = run(detector, frames, args.warmup, base_rss, batch)
+            result.update({"backend": detector.backend, "imgsz": imgsz, "conf": conf, "batch": batch})
+            if labels is not None:
+                result["accuracy"] = score(predictions, labels)
+            results.append(result)
+    conn.send(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--model", default="yolo11n.pt")
+    parser.add_argument("--backends", default="pytorch", help="comma-separated: pytorch,onnx,openvino,haar,haar+hog")
+    parser.add_argument("--int8", action="store_true", help="use INT8 exports for onnx / openvino")
+    parser.add_argument("--imgsz", default="640", help="comma-separated input sizes")
+    parser.add_argument("--conf", default="0.5", help="comma-separated confidence thresholds")
+    parser.add_argument("--batch", default="1", help="comma-separated frames per model call")
+    parser.add_argument("--roi", help="x,y,w,h fractions of the frame")
+    parser.add_argument("--labels", help="JSON {file name or frame index: person count}")
+    parser.add_argument("--max-frames", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=5, help="untimed frames per configuration")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    frames.extend(load_frames(args.source, args.max_frames))
+    if not frames:
+        parser.error(f"no frames read from {args.source}")
+    labels = None
+    if args.labels:
+        with open(args.labels) as f:
+            labels = {str(k): int(v) for k, v in json.load(f).items()}
+    roi = tuple(float(v) for v in args.roi.split(",")) if args.roi else None
+    h, w = frames[0][1].shape[:2]
+    print(f"[BENCH] {len(frames)} frames ({w}x{h}) from {args.source}")
+
+    results = []
+    fork = multiprocessing.get_context("fork")
+    for backend in args.backends.split(","):
+        for imgsz in (int(v) for v in args.imgsz.split(",")):
+            receiver, sender = fork.Pipe(duplex=False)
+            proc = fork.Process(target=bench_config, args=(sender, args, backend, imgsz, roi, labels))
+            proc.start()
+            sender.close()
+            try:
+                outcome = receiver.recv()
+            except EOFError:
+                outcome = None  # died without sending (e.g. out of memory)
+            proc.join()
+            if outcome is None:
+                outcome = f"{backend} imgsz={imgsz} exited with code {proc.exitcode}"
+            if isinstance(outcome, str):
+                print(f"[BENCH] {outcome}")
+                continue
+            results.extend(outcome)
+
+    print("\n" + "=" * 98)
+    print(f"DETECTOR BENCHMARK ({args.model}, {len(frames)} frames)")
+    print("=" * 98)
+    print(f"{'backend':<14} {'imgsz':>5} {'conf':>5} {'batch':>5} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'+RSS MB':>8} {'prec':>6} {'recall':>6}")
+    for r in results:
+        acc = r.get("accuracy") or {}
+        fmt = lambda v: f"{v:6.3f}" if v is not None else f"{'-':>6}"
+        lat = r["latency_ms"]
+        print(f"{r['backend']:<14} {r['imgsz']:>5} {r['conf']:>5.2f} {r['batch']:>5} {r['fps']:>8.2f} {lat['p50']:>8.2f} "
+              f"{lat['p95']:>8.2f} {lat['p99']:>8.2f} {r['rss_mb']:>8.1f} "
+              f"{fmt(acc.get('precision'))} {fmt(acc.get('recall'))}")
+    print("=" * 98)
+
+    if args.out:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": {"machine": platform.machine(), "processor": platform.processor(),
+                     "cpus": os.cpu_count(), "python": platform.python_version()},
+            "model": args.model,
+            "source": args.source,
+            "frames": len(frames),
+            "roi": roi,
+            "results": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark: many sensor nodes on one gateway (simulated hardware, no broker)
+
+N simulated ESP32 nodes publish on esp32/<id>/data at a fixed rate; the
+messages go through the gateway's on_message, per-device fusion and the
+per-device sample logger. Reports process CPU, RSS, handled messages/s and
+DB rows/s. --sweep runs several fleet sizes in fresh processes to show how
+cost grows with the number of devices.
+
+    python bench_devices.py --devices 100 --rate 10
+    python bench_devices.py --sweep 10,25,50,100
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import psutil
+
+from bench_gateway import LoopbackClient
+
+
+def run(args):
+    workdir = tempfile.mkdtemp()
+    os.environ["GATEWAY_HW"] = "sim"
+    os.environ.setdefault("DB_PATH", os.path.join(workdir, "bench.db"))
+
+    import gateway
+    gateway.client = LoopbackClient()
+    gateway.person_present = 1
+    gateway.writer.start()
+    gateway.mqtt_dispatcher.start()
+    threading.Thread(target=gateway.actuator_control_thread, name="actuator", daemon=True).start()
+    threading.Thread(target=gateway.sample_logger_thread, name="logger", daemon=True).start()
+
+    # Pre-encode one message per device and reading so the driver costs little itself
+    rng = random.Random(0)
+    messages = []
+    for i in range(args.devices):
+        topic = f"esp32/node{i:03d}/data"
+        variants = []
+        for _ in range(8):
+            payload = {"temperature": round(rng.uniform(22, 28), 1), "humidity": round(rng.uniform(40, 60), 1),
+                       "buttonPressed": int(rng.random() < 0.01), "abnormalMovement": 0}
+            variants.append(SimpleNamespace(topic=topic, payload=json.dumps(payload).encode()))
+        messages.append(variants)
+
+    proc = psutil.Process()
+    sent = [0]
+    result = {}
+
+    def driver():
+        """Each device publishes args.rate times per second, spread over the period"""
+        time.sleep(4)  # main loop and logger start after 3 s
+        interval = 1.0 / (args.rate * args.devices)
+        start = time.perf_counter()
+        result["cpu_before"] = sum(proc.cpu_times()[:2])
+        result["rows_before"] = gateway.writer.stats["rows_written"]
+        result["start"] = start
+        while time.perf_counter() - start < args.duration:
+            variants = messages[sent[0] % args.devices]
+            gateway.on_message(gateway.client, None, variants[(sent[0] // args.devices) % len(variants)])
+            sent[0] += 1
+            delay = start + sent[0] * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        result["wall"] = time.perf_counter() - start
+        result["cpu_after"] = sum(proc.cpu_times()[:2])
+        result["rows_after"] = gateway.writer.stats["rows_written"]
+        result["rss_mb"] = proc.memory_info().rss / 1e6
+        gateway.system_running = False
+
+    rss_start = proc.memory_info().rss / 1e6
+    threading.Thread(target=driver, name="driver", daemon=True).start()
+    gateway.main_loop()
+
+    wall = result["wall"]
+    cpu = result["cpu_after"] - result["cpu_before"]
+    return {
+        "devices": len(gateway.devices),
+        "rate": args.rate,
+        "msgs_per_s": sent[0] / wall,
+        "rows_per_s": (result["rows_after"] - result["rows_before"]) / wall,
+        "cpu_pct": cpu / wall * 100,
+        "rss_mb": result["rss_mb"],
+        "rss_delta_mb": result["rss_mb"] - rss_start,
+        "dropped": gateway.writer.stats["rows_dropped"],
+    }
+
+
+def print_table(results):
+    print("\n" + "=" * 72)
+    print("MULTI-DEVICE GATEWAY BENCHMARK (simulated hardware)")
+    print("=" * 72)
+    print(f"{'devices':>8} {'msgs/s':>10} {'rows/s':>10} {'CPU %':>8} {'CPU %/dev':>10} {'RSS MB':>8} {'dropped':>8}")
+    for r in results:
+        print(f"{r['devices']:>8} {r['msgs_per_s']:>10.0f} {r['rows_per_s']:>10.0f} {r['cpu_pct']:>8.1f} "
+              f"{r['cpu_pct'] / r['devices']:>10.3f} {r['rss_mb']:>8.1f} {r['dropped']:>8}")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="messages per second per device")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic")
+    parser.add_argument("--sweep", help="comma-separated device counts, each run in a fresh process")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)  # sweep worker output
+    args = parser.parse_args()
+
+    if args.sweep:
+        results = []
+        for n in [int(x) for x in args.sweep.split(",")]:
+            print(f"[BENCH] {n} devices at {args.rate:g} Hz for {args.duration:.0f}s...")
+            out = subprocess.run([sys.executable, __file__, "--devices", str(n), "--rate", str(args.rate),
+                                  "--duration", str(args.duration), "--json"],
+                                 capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        print_table(results)
+        return
+
+    if args.json:
+        sys.stdout = open(os.devnull, "w")  # keep the gateway's logging out of the result line
+    result = run(args)
+    if args.json:
+        sys.stdout = sys.__stdout__
+        print(json.dumps(result), flush=True)
+    else:
+        print_table([result])
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
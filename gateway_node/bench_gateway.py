@@ -0,0 +1,161 @@
+"""Benchmark: run the full gateway on simulated hardware (no Pi, no broker)
+
+Scripted ESP32 messages and KY-037 pulses are fed in, GPIO/PWM calls are
+recorded, and the report covers button-to-buzzer latency, per-thread CPU
+time and DB writer throughput.
+
+    python bench_gateway.py --duration 60
+    python bench_gateway.py --vision --camera path/to/video.mp4
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import psutil
+
+from storage import SampleWriter
+
+
+class LoopbackClient:
+    """Stands in for the paho client: publishes are recorded, not sent"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, retain=False):
+        self.published.append((time.perf_counter(), topic, payload))
+
+
+def esp32_message(gateway, button=0, temperature=25.0, humidity=50.0):
+    payload = {"temperature": temperature, "humidity": humidity,
+               "buttonPressed": button, "abnormalMovement": 0}
+    return SimpleNamespace(topic=gateway.MQTT_TOPIC_DATA, payload=json.dumps(payload).encode())
+
+
+def thread_cpu_times():
+    """{thread name: cpu seconds} for this process"""
+    by_id = {t.native_id: t.name for t in threading.enumerate()}
+    return {by_id.get(t.id, f"tid-{t.id}"): t.user_time + t.system_time
+            for t in psutil.Process().threads()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of main-loop time")
+    parser.add_argument("--press-every", type=float, default=8.0, help="seconds between button presses")
+    parser.add_argument("--sound-every", type=float, default=2.0, help="seconds between KY-037 pulses")
+    parser.add_argument("--sound-width", type=float, default=0.01, help="KY-037 pulse width in seconds")
+    parser.add_argument("--vision", action="store_true", help="also run PersonDetector (needs ultralytics)")
+    parser.add_argument("--camera", default="synthetic@15", help="camera source for --vision")
+    parser.add_argument("--db-burst", type=int, default=20000, help="rows pushed through a SampleWriter after the run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["GATEWAY_HW"] = "sim"
+    os.environ["GATEWAY_CAMERA"] = args.camera
+    os.environ.setdefault("DB_PATH", os.path.join(workdir, "bench.db"))
+
+    import gateway
+    gpio = gateway.GPIO
+    gateway.client = LoopbackClient()
+
+    gateway.writer.start()
+    gateway.mqtt_dispatcher.start()
+    threading.Thread(target=gateway.ky037_watcher_thread, name="ky037", daemon=True).start()
+    threading.Thread(target=gateway.actuator_control_thread, name="actuator", daemon=True).start()
+    threading.Thread(target=gateway.sample_logger_thread, name="logger", daemon=True).start()
+    if args.vision:
+        threading.Thread(target=gateway.person_detector_thread, name="vision", daemon=True).start()
+    else:
+        gateway.person_present = 1  # no camera: pretend someone is home
+
+    presses = []
+    cpu = {}
+
+    def driver():
+        """ESP32-like traffic: one data message per second, a press now and then"""
+        time.sleep(5)  # actuator thread waits 4 s before it acts
+        next_press = next_sound = time.perf_counter()
+        while gateway.system_running:
+            now = time.perf_counter()
+            pressed = now >= next_press
+            if pressed:
+                presses.append(now)
+                next_press += args.press_every
+            gateway.on_message(gateway.client, None, esp32_message(gateway, button=int(pressed)))
+            if now >= next_sound:
+                gpio.pulse(gateway.KY037_PIN, width_s=args.sound_width)
+                next_sound += args.sound_every
+            time.sleep(1.0)
+
+    def finish():
+        cpu["after"] = thread_cpu_times()  # before the threads see system_running=False
+        gateway.system_running = False
+
+    threading.Thread(target=driver, name="driver", daemon=True).start()
+    threading.Timer(5 + args.duration, finish).start()
+
+    print(f"[BENCH] Running gateway for {args.duration:.0f}s on simulated hardware...")
+    wall_start = time.perf_counter()
+    cpu_before = thread_cpu_times()
+    gateway.main_loop()
+    wall = time.perf_counter() - wall_start
+    cpu_after = cpu["after"]
+
+    # Button press -> first buzzer PWM start after it
+    starts = [c[0] for c in gpio.pwm_calls(gateway.BUZZER_PIN) if c[2] == "pwm_start"]
+    latencies = []
+    for t in presses:
+        later = [s for s in starts if t <= s < t + args.press_every]
+        if later:
+            latencies.append((later[0] - t) * 1000)
+
+    # DB throughput: a writer configured like the gateway's, pushed as fast as it drains
+    writer = SampleWriter(gateway.DB_PATH, batch_size=gateway.DB_BATCH_SIZE,
+                          flush_interval_ms=gateway.DB_FLUSH_INTERVAL_MS, queue_size=gateway.DB_QUEUE_SIZE)
+    writer.start()
+    burst_start = time.perf_counter()
+    now_ms = int(time.time() * 1000)
+    for i in range(args.db_burst):
+        writer.write({"ts_ms": now_ms + i, "ts": "bench", "temperature": 25.0, "humidity": 50.0,
+                      "button": 0, "abnormal_movement": 0, "sound_alert": 0,
+                      "person_present": 1, "status": "NORMAL"})
+        while writer.queue.qsize() > writer.queue.maxsize // 2:
+            time.sleep(0.001)
+    writer.stop()
+    burst = time.perf_counter() - burst_start
+    burst_rows = writer.stats["rows_written"]
+
+    print("\n" + "=" * 60)
+    print("GATEWAY BENCHMARK (simulated hardware)")
+    print("=" * 60)
+    print(f"1. BUTTON -> BUZZER LATENCY ({len(latencies)}/{len(presses)} presses)")
+    if latencies:
+        print(f"   - median {statistics.median(latencies):8.1f} ms   max {max(latencies):8.1f} ms")
+    if gateway.actuator_latency_ms:
+        internal = sorted(gateway.actuator_latency_ms)
+        print(f"   - gateway-measured input -> actuator: median {statistics.median(internal):.1f} ms, "
+              f"max {internal[-1]:.1f} ms over {len(internal)} status changes")
+    print(f"\n2. THREAD CPU TIME over {wall:.1f}s")
+    for name in sorted(cpu_after):
+        used = cpu_after[name] - cpu_before.get(name, 0.0)
+        print(f"   - {name:<20} {used * 1000:8.1f} ms  ({used / wall * 100:5.2f}% of one core)")
+    print(f"\n3. KY-037")
+    print(f"   - {gateway.sound_events.total_events} events recorded, {gateway.sound_events.bounces} bounces dropped")
+    print(f"\n4. DB WRITER")
+    print(f"   - burst: {burst_rows} rows in {burst:.2f}s = {burst_rows / burst:,.0f} rows/s")
+    if writer.stats["batches"]:
+        print(f"   - commit avg {writer.stats['total_commit_ms'] / writer.stats['batches']:.2f} ms, "
+              f"max {writer.stats['max_commit_ms']:.2f} ms, dropped {writer.stats['rows_dropped']}")
+    print("=" * 60)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: latest-row and range query latency, legacy vs. indexed schema
+
+Builds a v1 (TEXT ts, no index) database with N rows of 1 Hz samples, times
+the dashboard queries, migrates it in place to the current schema and times
+the equivalent ts_ms queries again.
+
+    python bench_storage.py --rows 10000000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import storage
+
+LEGACY_CREATE = """
+CREATE TABLE samples (
+    ts TEXT, temperature REAL, humidity REAL, button INTEGER,
+    abnormal_movement INTEGER, sound_alert INTEGER, person_present INTEGER, status TEXT
+)
+"""
+
+# 1 Hz rows ending "now", generated inside SQLite (much faster than executemany)
+LEGACY_FILL = """
+WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < ? - 1)
+INSERT INTO samples
+SELECT strftime('%Y-%m-%d %H:%M:%S', ? + i, 'unixepoch', 'localtime'),
+       20 + (i % 100) / 10.0, 40 + (i % 50) / 5.0, 0, 0, i % 7 = 0, 1,
+       CASE WHEN i % 7 = 0 THEN 'WARNING' ELSE 'NORMAL' END
+FROM seq
+"""
+
+
+def time_query(conn, sql, params=(), repeat=20):
+    """Median / max latency in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def report(name, result):
+    med, worst = result
+    print(f"   - {name:<28} median {med:9.3f} ms   max {worst:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--range-seconds", type=int, default=3600, help="width of the range query")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", help="database path (default: temp file, removed afterwards)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    end_s = int(time.time())
+    start_s = end_s - args.rows + 1
+    range_from = end_s - args.range_seconds * 2
+    range_to = range_from + args.range_seconds
+
+    print(f"[BENCH] Building legacy database with {args.rows:,} rows at {path}")
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_CREATE)
+    t0 = time.time()
+    with conn:
+        conn.execute(LEGACY_FILL, (args.rows, start_s))
+    print(f"[BENCH] Filled in {time.time() - t0:.1f}s")
+
+    fmt = lambda s: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s))
+    print("\n1. LEGACY SCHEMA (TEXT ts, no index)")
+    report("latest row", time_query(conn, "SELECT * FROM samples ORDER BY ts DESC LIMIT 1", repeat=args.repeat))
+    report("history (last 100)", time_query(conn, "SELECT * FROM samples ORDER BY ts DESC LIMIT 100", repeat=args.repeat))
+    report(f"range ({args.range_seconds}s)", time_query(
+        conn, "SELECT * FROM samples WHERE ts BETWEEN ? AND ? ORDER BY ts",
+        (fmt(range_from), fmt(range_to)), repeat=args.repeat))
+    conn.close()
+
+    print("\n2. MIGRATION (offline upgrade)")
+    conn = storage.connect(path)
+    t0 = time.time()
+    storage.migrate(conn, offline=True)
+    print(f"   - offline migration          {time.time() - t0:9.1f} s")
+
+    print(f"\n3. SCHEMA v{storage.SCHEMA_VERSION} (ts_ms index, INTEGER PRIMARY KEY)")
+    report("latest row", time_query(conn, "SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 1", repeat=args.repeat))
+    report("history (last 100)", time_query(conn, "SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 100", repeat=args.repeat))
+    report(f"range ({args.range_seconds}s)", time_query(
+        conn, "SELECT * FROM samples WHERE ts_ms BETWEEN ? AND ? ORDER BY ts_ms",
+        (range_from * 1000, range_to * 1000), repeat=args.repeat))
+    conn.close()
+
+    if not args.db:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
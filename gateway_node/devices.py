@@ -0,0 +1,122 @@
+import heapq
+
+STATUSES = ("NORMAL", "WARNING", "EMERGENCY")  # in increasing severity
+
+
+class DeviceState:
+    """Latest readings and fusion state of one sensor node"""
+
+    __slots__ = ("device_id", "temperature", "humidity", "button", "abnormal_movement",
+                 "online", "last_seen", "status", "alert_hold_until", "dirty")
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.temperature = None
+        self.humidity = None
+        self.button = 0
+        self.abnormal_movement = 0
+        self.online = False
+        self.last_seen = 0.0
+        self.status = "NORMAL"
+        self.alert_hold_until = 0.0
+        self.dirty = False
+
+
+class DeviceTable:
+    """Per-device state keyed by device id
+
+    Fusion only re-evaluates devices marked dirty (or whose alert hold
+    expired), and the gateway-wide status is kept from per-status counts,
+    so the work per input is O(1) in the number of devices. Not locked
+    itself: callers hold the gateway's `lock`.
+    """
+
+    def __init__(self, max_devices=256):
+        self.max_devices = max_devices
+        self.by_id = {}
+        self.dirty = []   # devices with input changes not yet fused
+        self.holds = []   # heap of (alert_hold_until, device_id); stale entries skipped
+        self.status_counts = dict.fromkeys(STATUSES, 0)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def get(self, device_id):
+        """The device's state, created on first sight (None once max_devices is reached)
+
+        A new device is marked dirty, so fusion evaluates it at least once
+        even if its readings never change from the defaults.
+        """
+        dev = self.by_id.get(device_id)
+        if dev is None:
+            if len(self.by_id) >= self.max_devices:
+                return None
+            dev = self.by_id[device_id] = DeviceState(device_id)
+            self.status_counts[dev.status] += 1
+            self.mark_dirty(dev)
+        return dev
+
+    def update(self, dev, **readings):
+        """Set readings; marks the device dirty and returns True if anything changed"""
+        changed = False
+        for field, value in readings.items():
+            if getattr(dev, field) != value:
+                setattr(dev, field, value)
+                changed = True
+        if changed:
+            self.mark_dirty(dev)
+        return changed
+
+    def mark_dirty(self, dev):
+        if not dev.dirty:
+            dev.dirty = True
+            self.dirty.append(dev)
+
+    def mark_all_dirty(self):
+        """A gateway-wide input (sound, vision, control) changed"""
+        for dev in self.by_id.values():
+            self.mark_dirty(dev)
+
+    def take_dirty(self):
+        devs, self.dirty = self.dirty, []
+        for dev in devs:
+            dev.dirty = False
+        return devs
+
+    def set_status(self, dev, status):
+        if status != dev.status:
+            self.status_counts[dev.status] -= 1
+            self.status_counts[status] += 1
+            dev.status = status
+
+    def overall_status(self):
+        """Most severe status across devices"""
+        for status in reversed(STATUSES):
+            if self.status_counts[status]:
+                return status
+        return "NORMAL"
+
+    def push_hold(self, dev):
+        heapq.heappush(self.holds, (dev.alert_hold_until, dev.device_id))
+
+    def next_hold(self):
+        """Earliest pending alert-hold expiry (None if no hold is active)"""
+        while self.holds:
+            until, device_id = self.holds[0]
+            if self.by_id[device_id].alert_hold_until == until:
+                return until
+            heapq.heappop(self.holds)  # superseded by a later hold
+        return None
+
+    def pop_expired_holds(self, now):
+        """Devices whose alert hold ran out, to be re-fused"""
+        expired = []
+        while self.holds and self.holds[0][0] <= now:
+            until, device_id = heapq.heappop(self.holds)
+            dev = self.by_id[device_id]
+            if dev.alert_hold_until == until:
+                expired.append(dev)
+        return expired
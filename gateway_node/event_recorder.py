@@ -0,0 +1,158 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import metrics
+from storage import INSERT_EVENT, connect
+
+CLIP_ENCODE_MS = metrics.histogram("events_clip_encode_ms", "Time to encode and save one event clip")
+CLIPS_WRITTEN = metrics.counter("events_clips_written", "Event clips saved to disk")
+EVENTS_DROPPED = metrics.counter("events_dropped", "Events dropped because the recorder queue was full")
+
+
+class EventRecorder:
+    """Saves pre/post-event clips from the cameras' FrameRings on its own thread
+
+    trigger() only queues the event, so fusion never waits on disk or the
+    encoder. The worker waits until `post_s` seconds after the event, then
+    copies the frames from `pre_s` before to `post_s` after it out of each
+    ring one at a time (the capture threads keep recording meanwhile) and
+    encodes them: "avi" is an MJPEG AVI file, "jpeg" a directory of JPEG
+    frames. Each clip gets a row in the events table.
+    """
+
+    def __init__(self, db_path, clip_dir, pre_s=10.0, post_s=10.0, clip_format="avi",
+                 jpeg_quality=80, queue_size=8):
+        self.db_path = db_path
+        self.clip_dir = clip_dir
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.clip_format = clip_format
+        self.jpeg_quality = jpeg_quality
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.thread = None
+        self.running = False
+
+        # --- stats ---
+        self.stats = {
+            "events": 0,
+            "events_dropped": 0,
+            "clips_written": 0,
+            "frames_written": 0,
+            "total_encode_ms": 0,
+            "max_encode_ms": 0,
+        }
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.stopping.clear()
+        os.makedirs(self.clip_dir, exist_ok=True)
+        self.thread = threading.Thread(target=self._worker_thread, name="EventRecorder")
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[EVENTS] Recorder started ({self.pre_s:g}s before / {self.post_s:g}s after, "
+              f"{self.clip_format} in {self.clip_dir})")
+
+    def stop(self, timeout=30):
+        """Save pending events with the frames recorded so far and stop the thread"""
+        if not self.running: return
+        self.running = False
+        self.stopping.set()  # cut post-event waits short
+        self.queue.put(None)
+        if self.thread: self.thread.join(timeout)
+        print(f"[EVENTS] Recorder stopped ({self.stats['clips_written']} clips, "
+              f"{self.stats['events_dropped']} events dropped)")
+
+    def trigger(self, device_id, status, rings, ts=None):
+        """Queue an event clip; rings is {camera name: FrameRing}. Never blocks."""
+        if not self.running or not rings:
+            return False
+        try:
+            self.queue.put_nowait((device_id, status, time.time() if ts is None else ts, dict(rings)))
+        except queue.Full:
+            self.stats["events_dropped"] += 1
+            EVENTS_DROPPED.inc()
+            print(f"[EVENTS] Recorder busy, event for {device_id} dropped")
+            return False
+        self.stats["events"] += 1
+        return True
+
+    def _worker_thread(self):
+        conn = connect(self.db_path)
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            device_id, status, ts, rings = job
+            # Wait for the post-event frames (shorter when stopping)
+            self.stopping.wait(max(0.0, ts + self.post_s - time.time()))
+            rows = []
+            for camera, ring in rings.items():
+                try:
+                    rows.append(self._save_clip(device_id, status, ts, camera, ring))
+                except Exception as e:
+                    print(f"[EVENTS] Clip for {device_id}/{camera} failed: {e}")
+            try:
+                with conn:
+                    conn.executemany(INSERT_EVENT, rows)
+            except sqlite3.Error as e:
+                print(f"[EVENTS] Event insert failed: {e}")
+        conn.close()
+
+    def _save_clip(self, device_id, status, ts, camera, ring):
+        """Encode one camera's frames around ts -> events row"""
+        start = time.time()
+        stamp = datetime.fromtimestamp(ts).strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        path = os.path.join(self.clip_dir, f"{device_id}_{stamp}_{camera}")
+        frame = np.empty_like(ring.frames[0])  # one reused copy buffer per clip
+        writer, frames, first_ts, last_ts = None, 0, None, None
+
+        for seq in ring.seqs_between(ts - self.pre_s, ts + self.post_s):
+            frame_ts = ring.copy_frame(seq, frame)
+            if frame_ts is None:
+                continue  # overwritten while the recorder was busy
+            if self.clip_format == "jpeg":
+                if writer is None:
+                    os.makedirs(path, exist_ok=True)
+                    writer = path
+                cv2.imwrite(os.path.join(path, f"{frames:04d}.jpg"), frame,
+                            [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            else:
+                if writer is None:
+                    path += ".avi"
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), ring.fps, ring.size)
+                    writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.jpeg_quality)
+                writer.write(frame)
+            frames += 1
+            first_ts = frame_ts if first_ts is None else first_ts
+            last_ts = frame_ts
+        if isinstance(writer, cv2.VideoWriter):
+            writer.release()
+
+        encode_ms = (time.time() - start) * 1000
+        if frames:
+            CLIP_ENCODE_MS.observe(encode_ms)
+            CLIPS_WRITTEN.inc()
+            self.stats["clips_written"] += 1
+            self.stats["frames_written"] += frames
+            self.stats["total_encode_ms"] += encode_ms
+            if encode_ms > self.stats["max_encode_ms"]: self.stats["max_encode_ms"] = encode_ms
+            print(f"[EVENTS] Saved {path} ({frames} frames, {encode_ms:.0f} ms)")
+        return {
+            "device_id": device_id,
+            "status": status,
+            "ts_ms": int(ts * 1000),
+            "camera": camera,
+            "clip_path": os.path.abspath(path) if frames else None,
+            "frames": frames,
+            "clip_start_ms": int(first_ts * 1000) if frames else None,
+            "clip_end_ms": int(last_ts * 1000) if frames else None,
+        }
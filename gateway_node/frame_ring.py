@@ -0,0 +1,58 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """Bounded ring of recent downscaled frames for event clips
+
+    All storage is one preallocated (capacity, h, w, 3) uint8 array; push()
+    resizes the frame straight into the next slot, so recording allocates
+    nothing per frame. At most `fps` frames per second are kept, so the ring
+    covers capacity / fps seconds. Readers copy frames out one at a time
+    (copy_frame) and never hold the lock while encoding.
+    """
+
+    def __init__(self, seconds=20.0, fps=5.0, size=(320, 240)):
+        self.fps = fps
+        self.size = size  # (w, h)
+        self.capacity = max(1, int(seconds * fps))
+        self.frames = np.zeros((self.capacity, size[1], size[0], 3), dtype=np.uint8)
+        self.times = np.zeros(self.capacity, dtype=np.float64)  # time.time() of each slot
+        self.seqs = np.zeros(self.capacity, dtype=np.int64)  # push number stored in each slot (0 = empty)
+        self.seq = 0
+        self.last_push = 0.0
+        self.lock = threading.Lock()
+
+    def push(self, frame, ts=None):
+        """Store a downscaled copy of frame if the ring's fps allows; True if stored"""
+        ts = time.time() if ts is None else ts
+        if ts - self.last_push < 1.0 / self.fps:
+            return False
+        if frame.ndim != 3 or frame.shape[2] != 3:
+            return False  # grayscale / YUV planes are not recorded
+        with self.lock:
+            self.seq += 1
+            i = self.seq % self.capacity
+            cv2.resize(frame, self.size, dst=self.frames[i], interpolation=cv2.INTER_AREA)
+            self.times[i] = ts
+            self.seqs[i] = self.seq
+            self.last_push = ts
+        return True
+
+    def seqs_between(self, start, end):
+        """Push numbers of the frames stored with start <= ts <= end, oldest first"""
+        with self.lock:
+            mask = (self.seqs > 0) & (self.times >= start) & (self.times <= end)
+            return sorted(self.seqs[mask].tolist())
+
+    def copy_frame(self, seq, out):
+        """Copy frame `seq` into out -> its timestamp, or None if it was overwritten"""
+        i = seq % self.capacity
+        with self.lock:
+            if self.seqs[i] != seq:
+                return None
+            np.copyto(out, self.frames[i])
+            return float(self.times[i])
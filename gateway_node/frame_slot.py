@@ -0,0 +1,69 @@
+import threading
+import time
+
+import numpy as np
+
+
+class FrameSlot:
+    """Single-slot "latest frame" buffer between a capture and an inference thread
+
+    Triple-buffered with preallocated arrays: the writer copies into its own
+    back buffer and swaps it into the slot; the reader swaps its buffer for
+    the slot's. Neither side ever waits for the other to finish with a
+    frame, and a frame that is overwritten before being taken counts as
+    dropped. Several slots can share one Condition so a single consumer
+    can wait for a new frame from any of them.
+    """
+
+    def __init__(self, cond=None):
+        self.cond = cond or threading.Condition()
+        self.back = None    # writer's buffer
+        self.latest = None  # newest published frame
+        self.front = None   # reader's buffer
+        self.seq = 0        # frames published
+        self.taken_seq = 0  # seq of the frame last handed to the reader
+        self.capture_time = 0.0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame, capture_time=None):
+        """Publish a copy of frame as the newest one"""
+        if self.back is None or self.back.shape != frame.shape or self.back.dtype != frame.dtype:
+            self.back = np.empty_like(frame)
+        np.copyto(self.back, frame)
+        with self.cond:
+            if self.seq > self.taken_seq:
+                self.dropped += 1  # previous frame was never taken
+            self.back, self.latest = self.latest, self.back
+            self.seq += 1
+            self.capture_time = time.perf_counter() if capture_time is None else capture_time
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """Wait for a frame newer than the last one taken -> (frame, perf_counter capture time)
+
+        Returns (None, None) on timeout or after close(). The frame stays
+        valid until the next get().
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.has_new or self.closed, timeout):
+                return None, None
+            return self.take()
+
+    @property
+    def has_new(self):
+        return self.seq > self.taken_seq
+
+    def take(self):
+        """Non-blocking get(): (frame, capture time), or (None, None) if nothing new"""
+        with self.cond:
+            if not self.has_new:
+                return None, None
+            self.front, self.latest = self.latest, self.front
+            self.taken_seq = self.seq
+            return self.front, self.capture_time
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
@@ -1,32 +1,67 @@
 import paho.mqtt.client as mqtt
-import RPi.GPIO as GPIO
 import json
+import os
 import time
 import threading
-import sqlite3
-import cv2
+from collections import deque
 import numpy as np
 from datetime import datetime
 from person_detector import PersonDetector
+from haar_detector import HaarPersonDetector
+from vision_scheduler import DetectionScheduler
+from hardware import get_gpio
+from sound_events import SoundEventBuffer
+from devices import DeviceTable
+from storage import SampleWriter, Retention, init_db, DEFAULT_DEVICE_ID
+from event_recorder import EventRecorder
+from mqtt_dispatch import MessageDispatcher
+from servo import ServoController
+import metrics
 
 # ---------------------------
 # Config
 # ---------------------------
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-MQTT_TOPIC_DATA = "esp32/data"  # รับ JSON จาก ESP32
+MQTT_TOPIC_DATA = "esp32/data"  # รับ JSON จาก ESP32 (single node, device id DEFAULT_DEVICE_ID)
 MQTT_TOPIC_STATUS = "esp32/status"  # ESP32 online/offline status
+MQTT_TOPIC_DEVICE_DATA = "esp32/+/data"  # Multi-node: esp32/<device_id>/data
+MQTT_TOPIC_DEVICE_STATUS = "esp32/+/status"  # Multi-node: esp32/<device_id>/status
 MQTT_TOPIC_CONTROL = "esp32/control"  # Control ESP32 sensor reading
 MQTT_TOPIC_PI_STATUS = "pi/status"  # Pi online/offline status
 MQTT_TOPIC_PI_CONTROL = "pi/control"  # Control Pi processing
 MQTT_TOPIC_SERVO = "pi/servo"  # Control servo motor (on/off)
+MQTT_TOPIC_STATE = "pi/state/{device_id}"  # Fused sample per device (retained JSON, for the dashboard)
 
 KY037_PIN = 22         # Digital output of KY-037 -> GPIO22 (ปรับตามต่อจริง)
 LED_PIN = 17           # สถานะ LED
 BUZZER_PIN = 27        # Buzzer (ใช้ PWM)
 SERVO_PIN = 18         # Servo motor for light switch control
 
-DB_PATH = "/home/earnt/Final_Project/data.db"
+# Hardware backends: "pi" drives the real pins, "sim" runs anywhere (see hardware.py)
+HARDWARE_BACKEND = os.getenv("GATEWAY_HW", "pi")
+CAMERA_SOURCE = os.getenv("GATEWAY_CAMERA", "auto")  # comma-separated for several cameras: "door=0,hall=1"
+CAMERA_SOURCES = [s.strip() for s in CAMERA_SOURCE.split(",") if s.strip()]
+CAMERA_ZONES = {}  # camera name -> device ids it covers, e.g. {"door": ["esp32-1"]}; others use any camera
+
+DB_PATH = os.getenv("DB_PATH", "/home/earnt/Final_Project/data.db")
+DB_BATCH_SIZE = 20          # rows per transaction
+DB_FLUSH_INTERVAL_MS = 2000 # max time a row waits before commit
+DB_QUEUE_SIZE = 1000        # rows buffered before new ones are dropped
+
+# Retention (days; None = keep forever). Alert episodes are always kept.
+DB_RETAIN_RAW_DAYS = 7
+DB_RETAIN_ROLLUP_DAYS = 90  # 1-minute and 1-hour rollups
+DB_RETAIN_DAILY_DAYS = None # 1-day rollups
+
+# EMERGENCY clips (frames before + after the event, linked from the events table)
+EVENT_CLIP_DIR = os.getenv("GATEWAY_CLIP_DIR", os.path.join(os.path.dirname(DB_PATH), "clips"))
+EVENT_PRE_SECONDS = 10.0
+EVENT_POST_SECONDS = 10.0
+EVENT_CLIP_FPS = 5.0
+EVENT_CLIP_SIZE = (320, 240)
+EVENT_CLIP_FORMAT = "avi"  # avi (MJPEG) | jpeg (directory of frames)
+EVENT_RING_SECONDS = EVENT_PRE_SECONDS + EVENT_POST_SECONDS + 5  # frames kept in memory per camera (+ slack for a busy encoder)
 
 # Safe ranges (ปรับได้)
 TEMP_SAFE_MIN = 15.0
@@ -34,18 +69,51 @@ TEMP_SAFE_MAX = 37.0
 HUM_SAFE_MIN  = 20.0
 HUM_SAFE_MAX  = 70.0
 
+MAX_DEVICES = 256  # sensor nodes tracked per gateway (extra device ids are ignored)
+MQTT_QUEUE_SIZE = 1000  # messages buffered for the dispatch worker before new ones are dropped
+
+# KY-037 sound detection
+SOUND_EDGE_DETECT = True      # GPIO interrupts; falls back to polling where unavailable
+SOUND_POLL_INTERVAL = 0.05    # seconds between reads in polling mode
+SOUND_DEBOUNCE_MS = 20        # edges closer than this count as one event
+SOUND_WINDOW_SECONDS = 1.0    # window for the events-per-second measure
+SOUND_ALERT_MIN_EVENTS = 1    # events inside the window that raise sound_alert
+SOUND_EMERGENCY_RATE = 10.0   # events/s over the window that fusion treats as EMERGENCY (sustained loud noise); None: off
+
 # Buzzer PWM params
 BUZZER_FREQ = 1800
 
 # Alert duration
 ALERT_DURATION_SECONDS = 3  # Keep alert active for minimum 5 seconds
 
+# Prometheus-format metrics on http://127.0.0.1:<port>/metrics (0 disables)
+METRICS_PORT = int(os.getenv("GATEWAY_METRICS_PORT", "9100"))
+
+# Sample logging period (independent of fusion, which is event-driven)
+LOG_INTERVAL_SECONDS = 1.0
+
 # Camera detection params
-PERSON_DETECT_INTERVAL = 1.0  # วินาทีระหว่างการตรวจซ้ำ
+PERSON_HAAR_IMGSZ = 320  # Haar fallback detection size (long side, pixels)
+PERSON_HAAR_HOG = False  # also run the HOG people detector in the fallback (slower, fewer misses)
+VISION_CV_THREADS = 2  # OpenCV worker threads for the Haar fallback
+PERSON_RATES = {"NORMAL": 0.5, "WARNING": None, "EMERGENCY": None}  # detections/sec per status (None = full rate)
+PERSON_ENTER_HITS = 2  # detections before a new person counts as present
+PERSON_EXIT_SECONDS = 10.0  # a person stays present this long after last being seen
+VISION_CPU_BUDGET = 70.0  # % system CPU above which vision backs off
+VISION_TEMP_BUDGET_C = 70.0  # SoC °C above which vision backs off
+PERSON_MOTION_THRESHOLD = 0.01  # fraction of changed pixels that triggers YOLO (None: every frame)
+PERSON_MAX_STALE_SECONDS = 5.0  # run YOLO at least this often even without motion
+PERSON_BACKEND = os.getenv("GATEWAY_VISION_BACKEND", "pytorch")  # pytorch | onnx | openvino
+PERSON_INT8 = os.getenv("GATEWAY_VISION_INT8", "0") == "1"  # INT8-quantized export (onnx/openvino)
+PERSON_IMGSZ = 320  # YOLO input size (people fill much of the frame; 640 is the model default)
+PERSON_ROI = None  # (x, y, w, h) fractions of the frame to check, e.g. doorway + bed; None = full frame
+PERSON_LORES_SIZE = (320, 240)  # Picamera2 low-res stream used for detection (None: main stream)
+PERSON_BATCH_WAIT_MS = 20  # several cameras: wait this long for all of them so YOLO gets one batch
 
 # ---------------------------
 # GPIO init
 # ---------------------------
+GPIO = get_gpio(HARDWARE_BACKEND)
 GPIO.setwarnings(False)
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(KY037_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)  # Add pull-down resistor
@@ -66,9 +134,6 @@ try:
     servo_pwm.ChangeDutyCycle(2.5)  # 0° = 2.5% duty
     time.sleep(0.5)
     servo_pwm.ChangeDutyCycle(0)
-    
-    # Also reset the state variable
-    light_switch_on = False
     print("[SERVO] Servo reset complete - position: 0° (OFF), state: OFF")
 except Exception as e:
     print(f"[WARNING] PWM initialization failed: {e}")
@@ -76,176 +141,216 @@ except Exception as e:
 # ---------------------------
 # DB init (SQLite)
 # ---------------------------
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cur = conn.cursor()
-cur.execute("""
-CREATE TABLE IF NOT EXISTS samples (
-        ts TEXT,
-        temperature REAL,
-        humidity REAL,
-        button INTEGER,
-        abnormal_movement INTEGER,
-        sound_alert INTEGER,
-        person_present INTEGER,
-        status TEXT
-    )
-    """)
-conn.commit()
+init_db(DB_PATH)
+writer = SampleWriter(DB_PATH,
+                      batch_size=DB_BATCH_SIZE,
+                      flush_interval_ms=DB_FLUSH_INTERVAL_MS,
+                      queue_size=DB_QUEUE_SIZE,
+                      retention=Retention(raw_days=DB_RETAIN_RAW_DAYS,
+                                          rollup_days=DB_RETAIN_ROLLUP_DAYS,
+                                          daily_days=DB_RETAIN_DAILY_DAYS))
+event_recorder = EventRecorder(DB_PATH, EVENT_CLIP_DIR, pre_s=EVENT_PRE_SECONDS, post_s=EVENT_POST_SECONDS,
+                               clip_format=EVENT_CLIP_FORMAT)
 
 # ---------------------------
 # Global state
 # ---------------------------
-latest = {
-    "temperature": None,
-    "humidity": None,
-    "button": 0,
-    "abnormal_movement": 0  # Changed from "abnormalMovement" to match usage
-}
+devices = DeviceTable(max_devices=MAX_DEVICES)  # per-node readings + fusion state
+devices.get(DEFAULT_DEVICE_ID)  # the single-node setup is always present
 sound_alert = 0
+sound_rate = 0.0  # KY-037 events/s over SOUND_WINDOW_SECONDS
 person_present = 0
-current_status = "NORMAL"
-esp32_online = False
+person_by_camera = {}  # camera name -> 0/1 stable presence
+current_status = "NORMAL"  # most severe status across devices (drives the actuators)
 pi_control_enabled = True  # Default: enabled
-light_switch_on = False  # Servo position: False=OFF, True=ON
-alert_start_time = 0
-alert_hold_until = 0
 beep_state = False
 beep_last_toggle = 0
 lock = threading.Lock()
 system_running = True  # Global flag to stop all threads
 
+# Event-driven fusion: inputs wake the fusion loop, status changes wake the actuator
+fusion_wakeup = threading.Event()
+pending_input_time = None       # perf_counter() of the oldest input not yet fused
+status_cond = threading.Condition()
+status_input_time = None        # input time behind the current status change
+actuator_latency_ms = deque(maxlen=1000)  # input -> actuator applied, recent changes
+
 # ---------------------------
-# Servo Motor Control
+# Metrics
 # ---------------------------
-def set_servo_angle(angle):
-    """Set servo angle (0-180 degrees)
-    
-    Simple formula: duty_cycle = 2.5 + (angle / 18)
-    - 0° = 2.5% duty
-    - 90° = 7.5% duty
-    - 180° = 12.5% duty
+FUSION_MS = metrics.histogram("gateway_fusion_ms", "Fusion pass time (dirty devices + expired holds)")
+ACTUATOR_LATENCY_MS = metrics.histogram("gateway_input_to_actuator_ms", "Input change to actuator applied")
+STATUS_CHANGES = metrics.counter("gateway_status_changes", "Fused status changes")
+STATES_PUBLISHED = metrics.counter("gateway_states_published", "Fused samples published on the state topic")
+metrics.gauge("gateway_devices", "Sensor nodes tracked", func=lambda: len(devices))
+metrics.gauge("gateway_status", "Fused status (0=NORMAL 1=WARNING 2=EMERGENCY)",
+              func=lambda: ("NORMAL", "WARNING", "EMERGENCY").index(current_status))
+metrics.gauge("gateway_person_present", "Stable person presence", func=lambda: person_present)
+metrics.gauge("gateway_sound_rate", "KY-037 events per second", func=lambda: sound_rate)
+
+def notify_input(dev=None):
+    """Wake fusion after a fusion input changed (call with `lock` held)
+
+    dev: the sensor node whose readings changed, or None for a gateway-wide
+    input (sound, vision, Pi control) that affects every device.
     """
-    if servo_pwm is None:
-        print("[SERVO] PWM not initialized")
-        return
-    
-    # Clamp angle to 0-180°
-    if angle < 0:
-        angle = 0
-    elif angle > 180:
-        angle = 180
-    
-    # Simple duty cycle calculation
-    duty = 2.5 + (angle / 18.0)
-    
-    try:
-        # Stop any previous signal first
-        servo_pwm.ChangeDutyCycle(0)
-        time.sleep(0.1)
-        
-        # Send position signal
-        servo_pwm.ChangeDutyCycle(duty)
-        print(f"[SERVO] Moving to {angle}° (duty: {duty:.2f}%)")
-        time.sleep(0.8)  # Longer wait for servo to reach position
-        
-        # Stop signal to prevent jitter
-        servo_pwm.ChangeDutyCycle(0)
-        time.sleep(0.1)
-        print(f"[SERVO] Done")
-    except Exception as e:
-        print(f"[SERVO] Error: {e}")
+    global pending_input_time
+    if dev is None:
+        devices.mark_all_dirty()
+    else:
+        devices.mark_dirty(dev)
+    if pending_input_time is None:
+        pending_input_time = time.perf_counter()
+    fusion_wakeup.set()
 
-servo_lock = threading.Lock()  # Prevent concurrent servo movements
+def notify_actuator():
+    """Wake the actuator thread (status or Pi control changed)"""
+    with status_cond:
+        status_cond.notify_all()
 
-def control_light_switch(turn_on):
-    """Control light switch via servo motor
-    
-    Adjust OFF_ANGLE and ON_ANGLE as needed (0-180°)
-    """
-    global light_switch_on
-    
-    OFF_ANGLE = 0      # OFF position
-    ON_ANGLE = 90      # ON position
-    
-    with servo_lock:  # Ensure only one servo command at a time
-        if turn_on and not light_switch_on:
-            set_servo_angle(ON_ANGLE)
-            light_switch_on = True
-            print(f"[SERVO] Light switch ON ({ON_ANGLE}°)")
-        elif not turn_on and light_switch_on:
-            set_servo_angle(OFF_ANGLE)
-            light_switch_on = False
-            print(f"[SERVO] Light switch OFF ({OFF_ANGLE}°)")
-        else:
-            print(f"[SERVO] Already {'ON' if light_switch_on else 'OFF'}")
+# ---------------------------
+# Servo Motor Control
+# ---------------------------
+# Adjust OFF / ON angles as needed (0-180°); moves run on the servo thread
+servo = ServoController(servo_pwm, off_angle=0, on_angle=90)
+metrics.gauge("gateway_light_switch_on", "Servo light switch position (1=ON)", func=lambda: int(servo.is_on))
 
 # ---------------------------
 # Camera / Person detection using PersonDetector
 # ---------------------------
 detector = None
+vision_scheduler = DetectionScheduler(PERSON_RATES, cpu_budget=VISION_CPU_BUDGET, temp_budget_c=VISION_TEMP_BUDGET_C)
+
+def on_person_change(name, count):
+    """PersonDetector callback: push a new result to fusion right away"""
+    global person_present
+    with lock:
+        person_by_camera[name] = 1 if count > 0 else 0
+        person_present = 1 if any(person_by_camera.values()) else 0
+        notify_input()
+
+def cameras_for(dev):
+    """Names of the cameras covering dev (None: no zone, use every camera)"""
+    return [name for name, ids in CAMERA_ZONES.items() if dev.device_id in ids] or None
+
+def presence_for(dev):
+    """Person presence seen by the cameras covering dev (call with `lock` held)"""
+    cameras = cameras_for(dev)
+    if not cameras:
+        return person_present
+    return 1 if any(person_by_camera.get(name, 0) for name in cameras) else 0
 
 def person_detector_thread():
-    global person_present, detector
+    global detector
     
     # สร้าง PersonDetector object
     try:
-        detector = PersonDetector(model_path='yolo11n.pt')
+        camera = CAMERA_SOURCES if len(CAMERA_SOURCES) > 1 else CAMERA_SOURCE
+        detector = PersonDetector(model_path='yolo11n.pt', camera=camera,
+                                  motion_threshold=PERSON_MOTION_THRESHOLD,
+                                  max_stale_s=PERSON_MAX_STALE_SECONDS,
+                                  backend=PERSON_BACKEND, int8=PERSON_INT8,
+                                  imgsz=PERSON_IMGSZ, roi=PERSON_ROI, lores_size=PERSON_LORES_SIZE,
+                                  scheduler=vision_scheduler, on_change=on_person_change,
+                                  enter_hits=PERSON_ENTER_HITS, exit_s=PERSON_EXIT_SECONDS,
+                                  ring_seconds=EVENT_RING_SECONDS, ring_fps=EVENT_CLIP_FPS, ring_size=EVENT_CLIP_SIZE,
+                                  batch_wait_ms=PERSON_BATCH_WAIT_MS)
         detector.start()  # เริ่ม background thread ของ detector
         print("[GATEWAY] PersonDetector initialized successfully")
     except Exception as e:
         print(f"[GATEWAY] Failed to initialize PersonDetector: {e}")
-        print("[GATEWAY] Falling back to simple detection")
-        # Fallback ใช้ Haar cascade เหมือนเดิม
-        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_fullbody.xml")
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("WARNING: Camera not opened. Person detection disabled.")
-            return
-        while system_running:
-            ret, frame = cap.read()
-            if not ret:
-                person_present = 0
-                time.sleep(PERSON_DETECT_INTERVAL)
-                continue
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            people = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(60,60))
-            with lock:
-                person_present = 1 if len(people) > 0 else 0
-            time.sleep(PERSON_DETECT_INTERVAL)
+        print("[GATEWAY] Falling back to Haar cascade detection")
+        try:
+            detector = HaarPersonDetector(camera=camera, motion_threshold=PERSON_MOTION_THRESHOLD,
+                                          max_stale_s=PERSON_MAX_STALE_SECONDS,
+                                          imgsz=PERSON_HAAR_IMGSZ, roi=PERSON_ROI, lores_size=PERSON_LORES_SIZE,
+                                          scheduler=vision_scheduler, on_change=on_person_change,
+                                          enter_hits=PERSON_ENTER_HITS, exit_s=PERSON_EXIT_SECONDS,
+                                          hog=PERSON_HAAR_HOG, cv_threads=VISION_CV_THREADS,
+                                          ring_seconds=EVENT_RING_SECONDS, ring_fps=EVENT_CLIP_FPS,
+                                          ring_size=EVENT_CLIP_SIZE)
+            detector.start()
+        except Exception as e:
+            print(f"WARNING: Haar detector failed ({e}). Person detection disabled.")
         return
     
-    # ใช้ PersonDetector (YOLO) - อ่านค่าจาก detector.person_detected
-    while system_running:
-        if detector:
-            with lock:
-                person_present = 1 if detector.person_detected > 0 else 0
-        time.sleep(PERSON_DETECT_INTERVAL)
+    # ใช้ PersonDetector (YOLO) - results arrive through on_person_change
 
 # ---------------------------
 # KY-037 reading thread (digital pin)
 # ---------------------------
+sound_events = SoundEventBuffer(debounce_s=SOUND_DEBOUNCE_MS / 1000.0)
+sound_edge = threading.Event()  # set by the GPIO callback on each accepted event
+
+def on_sound_edge(channel):
+    """GPIO interrupt callback (runs on the GPIO library's thread)"""
+    if sound_events.record():
+        sound_edge.set()
+
+def sound_is_loud(rate):
+    return SOUND_EMERGENCY_RATE is not None and rate >= SOUND_EMERGENCY_RATE
+
+def update_sound_state():
+    """Derive sound_alert / sound_rate from the events in the current window"""
+    global sound_alert, sound_rate
+    count = sound_events.count(SOUND_WINDOW_SECONDS)
+    with lock:
+        old_val = sound_alert
+        was_loud = sound_is_loud(sound_rate)
+        sound_rate = count / SOUND_WINDOW_SECONDS
+        sound_alert = 1 if count >= SOUND_ALERT_MIN_EVENTS else 0
+        loud = sound_is_loud(sound_rate)
+        if old_val != sound_alert or was_loud != loud:
+            notify_input()
+            # Log only when value changes
+            if loud and not was_loud:
+                print(f"[KY037] Loud sustained sound! ({sound_rate:.1f} events/s)")
+            elif sound_alert == 1 and old_val != sound_alert:
+                print(f"[KY037] Sound detected! ({count} events in {SOUND_WINDOW_SECONDS:.0f}s)")
+
 def ky037_watcher_thread():
-    global sound_alert
     print("[KY037] Sound sensor thread starting...")
     time.sleep(1)  # Wait for GPIO to stabilize
-    print("[KY037] Thread active")
-    
+
+    use_edges = False
+    if SOUND_EDGE_DETECT:
+        try:
+            GPIO.add_event_detect(KY037_PIN, GPIO.RISING, callback=on_sound_edge,
+                                  bouncetime=SOUND_DEBOUNCE_MS)
+            use_edges = True
+        except (RuntimeError, AttributeError) as e:
+            print(f"[KY037] Edge detection unavailable ({e})")
+    print(f"[KY037] Thread active ({'edge-triggered' if use_edges else f'polling every {SOUND_POLL_INTERVAL * 1000:.0f} ms'})")
+
+    last_val = 0
     while system_running:
         try:
-            val = GPIO.input(KY037_PIN)  # 0 or 1
-            with lock:
-                old_val = sound_alert
-                sound_alert = 1 if val == 1 else 0
-                # Log only when value changes
-                if old_val != sound_alert and sound_alert == 1:
-                    print(f"[KY037] Sound detected! Pin value: {val}")
+            if use_edges:
+                # Sleep until the next event, or until the oldest one leaves the window
+                expiry = sound_events.next_expiry(SOUND_WINDOW_SECONDS)
+                timeout = None if expiry is None else max(0.0, expiry - time.monotonic())
+                sound_edge.wait(timeout)
+                sound_edge.clear()
+            else:
+                val = GPIO.input(KY037_PIN)  # 0 or 1
+                if val == 1 and last_val == 0:
+                    sound_events.record()
+                last_val = val
+            update_sound_state()
         except Exception as e:
             if system_running:  # Only print error if still running
                 print(f"[KY037] Error reading pin: {e}")
             time.sleep(1)
             continue
-        # short sleep to avoid busy loop
-        time.sleep(0.05)
+        if not use_edges:
+            # short sleep to avoid busy loop
+            time.sleep(SOUND_POLL_INTERVAL)
+
+    if use_edges:
+        try:
+            GPIO.remove_event_detect(KY037_PIN)
+        except Exception:
+            pass
 
 # ---------------------------
 # MQTT callbacks
@@ -253,12 +358,10 @@ def ky037_watcher_thread():
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
         print("Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC_DATA)
-        client.subscribe(MQTT_TOPIC_STATUS)
-        client.subscribe(MQTT_TOPIC_CONTROL)
-        client.subscribe(MQTT_TOPIC_PI_CONTROL)
-        client.subscribe(MQTT_TOPIC_SERVO)
-        print(f"Subscribed to: {MQTT_TOPIC_DATA}, {MQTT_TOPIC_STATUS}, {MQTT_TOPIC_CONTROL}, {MQTT_TOPIC_PI_CONTROL}, {MQTT_TOPIC_SERVO}")
+        topics = [MQTT_TOPIC_DATA, MQTT_TOPIC_STATUS, MQTT_TOPIC_DEVICE_DATA, MQTT_TOPIC_DEVICE_STATUS,
+                  MQTT_TOPIC_CONTROL, MQTT_TOPIC_PI_CONTROL, MQTT_TOPIC_SERVO]
+        client.subscribe([(t, 0) for t in topics])
+        print(f"Subscribed to: {', '.join(topics)}")
         
         # Publish Pi online status with retained flag
         client.publish(MQTT_TOPIC_PI_STATUS, "true", retain=True)
@@ -266,55 +369,86 @@ def on_connect(client, userdata, flags, rc, properties=None):
     else:
         print("MQTT connect failed rc=", rc)
 
+def parse_device_topic(topic):
+    """'esp32/<id>/data' -> (id, 'data'); legacy 'esp32/data' -> (DEFAULT_DEVICE_ID, 'data')"""
+    parts = topic.split("/")
+    if parts[0] != "esp32" or parts[-1] not in ("data", "status"):
+        return None, None
+    if len(parts) == 2:
+        return DEFAULT_DEVICE_ID, parts[1]
+    if len(parts) == 3:
+        return parts[1], parts[2]
+    return None, None
+
 def on_message(client, userdata, msg):
-    global latest, esp32_online, pi_control_enabled, light_switch_on
-    
-    topic = msg.topic
-    payload_str = msg.payload.decode()
-    
-    # Handle Servo control
-    if topic == MQTT_TOPIC_SERVO:
-        turn_on = (payload_str.lower() == "on" or payload_str == "1" or payload_str.lower() == "true")
-        print(f"[MQTT] Servo command received: {'ON' if turn_on else 'OFF'}")
-        control_light_switch(turn_on)
-        return
-    
-    # Handle ESP32 status
-    if topic == MQTT_TOPIC_STATUS:
-        with lock:
-            esp32_online = (payload_str.lower() == "true" or payload_str == "1")
-        print(f"[STATUS] ESP32 is {'ONLINE' if esp32_online else 'OFFLINE'}")
-        return
-    
-    # Handle Pi control
-    if topic == MQTT_TOPIC_PI_CONTROL:
-        with lock:
-            pi_control_enabled = (payload_str.lower() == "true" or payload_str == "1")
-        print(f"[CONTROL] Pi processing {'ENABLED' if pi_control_enabled else 'DISABLED'}")
+    """Runs on paho's network thread: queue the message and return"""
+    mqtt_dispatcher.submit(msg)
+
+def handle_servo(topic, payload_str):
+    turn_on = (payload_str.lower() == "on" or payload_str == "1" or payload_str.lower() == "true")
+    print(f"[MQTT] Servo command received: {'ON' if turn_on else 'OFF'}")
+    servo.request(turn_on)
+
+def handle_device_status(topic, payload_str):
+    device_id, _ = parse_device_topic(topic)
+    online = (payload_str.lower() == "true" or payload_str == "1")
+    with lock:
+        dev = devices.get(device_id)
+        if dev is None: return
+        dev.online = online
+        dev.last_seen = time.time()
+    print(f"[STATUS] ESP32 {device_id} is {'ONLINE' if online else 'OFFLINE'}")
+
+def handle_pi_control(topic, payload_str):
+    global pi_control_enabled
+    with lock:
+        pi_control_enabled = (payload_str.lower() == "true" or payload_str == "1")
+        notify_input()
+    notify_actuator()
+    print(f"[CONTROL] Pi processing {'ENABLED' if pi_control_enabled else 'DISABLED'}")
+
+def handle_device_data(topic, payload_str):
+    device_id, _ = parse_device_topic(topic)
+    try:
+        payload = json.loads(payload_str)
+    except Exception as e:
+        print("Invalid JSON payload:", e)
         return
-    
-    # Handle data topic
-    if topic == MQTT_TOPIC_DATA:
-        try:
-            payload = json.loads(payload_str)
-        except Exception as e:
-            print("Invalid JSON payload:", e)
-            return
-
-        # payload expected structure: { "temperature":..., "humidity":..., "buttonPressed":0/1, "abnormalMovement":0/1 }
-        with lock:
-            latest["temperature"] = payload.get("temperature", latest["temperature"])
-            latest["humidity"] = payload.get("humidity", latest["humidity"])
-            latest["button"] = int(payload.get("buttonPressed", latest["button"]))
+
+    # payload expected structure: { "temperature":..., "humidity":..., "buttonPressed":0/1, "abnormalMovement":0/1 }
+    with lock:
+        dev = devices.get(device_id)
+        if dev is None:
+            return  # MAX_DEVICES reached
+        dev.last_seen = time.time()
+        # ESP32 repeats its readings every second; only changes need fusion
+        changed = devices.update(
+            dev,
+            temperature=payload.get("temperature", dev.temperature),
+            humidity=payload.get("humidity", dev.humidity),
+            button=int(payload.get("buttonPressed", dev.button)),
             # Map camelCase from ESP32 to snake_case for internal use
-            latest["abnormal_movement"] = int(payload.get("abnormalMovement", latest["abnormal_movement"]))
+            abnormal_movement=int(payload.get("abnormalMovement", dev.abnormal_movement)),
+        )
+        if changed:
+            notify_input(dev)
+
+# Per-topic handlers, run in arrival order on the dispatch worker
+mqtt_dispatcher = MessageDispatcher(queue_size=MQTT_QUEUE_SIZE)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_SERVO, handle_servo)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_PI_CONTROL, handle_pi_control)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_STATUS, handle_device_status)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_DEVICE_STATUS, handle_device_status)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_DATA, handle_device_data)
+mqtt_dispatcher.add_handler(MQTT_TOPIC_DEVICE_DATA, handle_device_data)
 
 # ---------------------------
 # Fusion logic (ตรงตามที่คุณขอ)
 # ---------------------------
-def evaluate_fusion(btn, abnormal_movement, person_present, sound_alert, temp, hum):
+def evaluate_fusion(btn, abnormal_movement, person_present, sound_alert, temp, hum, sound_rate=0.0):
     # IF abnormal_movement == 1 → EMERGENCY OR button == 1 → EMERGENCY
-    if btn == 1 or abnormal_movement == 1:
+    # (or sound_rate >= SOUND_EMERGENCY_RATE: loud for the whole window, e.g. a fall or shouting)
+    if btn == 1 or abnormal_movement == 1 or sound_is_loud(sound_rate):
         return "EMERGENCY"
     # ELIF sound_alert == 1 → WARNING
     if sound_alert == 1 or person_present == 0:
@@ -345,6 +479,14 @@ def actuator_control_thread():
     last_status = "NORMAL"
     
     while system_running:
+        # Sleep until fusion publishes a new status (or Pi control changes)
+        with status_cond:
+            status_cond.wait_for(
+                lambda: not system_running or not pi_control_enabled or current_status != last_status,
+                timeout=1.0)
+            status = current_status
+            input_time = status_input_time
+
         # Skip actuator control if Pi processing is disabled
         if not pi_control_enabled:
             # Ensure actuators are OFF when disabled
@@ -355,10 +497,10 @@ def actuator_control_thread():
                     buzzer_running = False
                 except:
                     pass
-            time.sleep(0.5)
+            last_status = "NORMAL"  # actuators are off; re-apply the status once re-enabled
+            with status_cond:
+                status_cond.wait_for(lambda: not system_running or pi_control_enabled, timeout=1.0)
             continue
-            
-        status = current_status
         
         # Only change actuators when status changes
         if status != last_status:
@@ -396,38 +538,149 @@ def actuator_control_thread():
                     except Exception as e:
                         print(f"[PWM] Start error: {e}")
             
+            if input_time is not None:
+                latency_ms = (time.perf_counter() - input_time) * 1000
+                actuator_latency_ms.append(latency_ms)
+                ACTUATOR_LATENCY_MS.observe(latency_ms)
             last_status = status
-        
-        time.sleep(0.1)  # Small delay to prevent CPU spinning
+
+def print_latency_report():
+    """Input (MQTT / GPIO / vision) -> actuator latency over recent status changes"""
+    samples = sorted(actuator_latency_ms)
+    if not samples: return
+    p50 = samples[len(samples) // 2]
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"[LATENCY] input -> actuator over {len(samples)} changes: "
+          f"p50={p50:.1f} ms  p95={p95:.1f} ms  max={samples[-1]:.1f} ms")
 
 # ---------------------------
 # Logger (DB)
 # ---------------------------
-def log_sample(ts, temp, hum, btn, movement_abn, sound, person, status):
-    cur.execute("""INSERT INTO samples VALUES (?,?,?,?,?,?,?,?)""",
-                (ts,
-                 temp,
-                 hum,
-                 btn,
-                 movement_abn,
-                 sound,
-                 person,
-                 status))
-    conn.commit()
+def log_sample(device_id, ts_ms, ts, temp, hum, btn, movement_abn, sound, person, status):
+    """Queue a row for the background writer (never blocks the main loop)"""
+    writer.write({
+        "device_id": device_id,
+        "ts_ms": ts_ms,
+        "ts": ts,
+        "temperature": temp,
+        "humidity": hum,
+        "button": btn,
+        "abnormal_movement": movement_abn,
+        "sound_alert": sound,
+        "person_present": person,
+        "status": status,
+    })
+
+def sample_logger_thread():
+    """Log one row per LOG_INTERVAL_SECONDS, whatever fusion is doing"""
+    time.sleep(3)  # Same start-up delay as the fusion loop
+    next_tick = time.time()
+    while system_running:
+        next_tick += LOG_INTERVAL_SECONDS
+        if pi_control_enabled:
+            with lock:
+                rows = [(d.device_id, d.temperature, d.humidity, d.button, d.abnormal_movement, presence_for(d), d.status)
+                        for d in devices]
+                sound = sound_alert
+                rate = sound_rate
+                person_any = person_present
+                counts = dict(devices.status_counts)
+
+            sample_time = datetime.now()
+            ts = sample_time.strftime("%Y-%m-%d %H:%M:%S")
+            ts_ms = int(sample_time.timestamp() * 1000)
+            # log to DB (one row per device)
+            for device_id, temp, hum, btn, movement_abn, person, status in rows:
+                log_sample(device_id, ts_ms, ts, temp, hum, btn, movement_abn, sound, person, status)
+
+            # optional: print short summary
+            if len(rows) == 1:
+                device_id, temp, hum, btn, movement_abn, person, status = rows[0]
+                print(f"{ts} | status={status} | btn={btn} move={movement_abn} person={person} sound={sound} ({rate:.1f}/s) temp={temp} hum={hum}")
+            else:
+                print(f"{ts} | status={current_status} | devices={len(rows)} "
+                      f"(E={counts['EMERGENCY']} W={counts['WARNING']} N={counts['NORMAL']}) person={person_any} sound={sound} ({rate:.1f}/s)")
+
+        # Fixed-rate schedule; skip ticks rather than burst after a stall
+        delay = next_tick - time.time()
+        if delay < 0:
+            next_tick = time.time()
+            delay = 0
+        time.sleep(delay)
+
+def fuse_device(dev, person, sound, rate, now):
+    """Fusion + alert hold for one device (call with `lock` held)"""
+    status = evaluate_fusion(dev.button, dev.abnormal_movement, person, sound, dev.temperature, dev.humidity, rate)
+
+    # If alert triggered, set hold duration
+    if status in ["WARNING", "EMERGENCY"]:
+        if dev.status == "NORMAL" or now >= dev.alert_hold_until:
+            dev.alert_hold_until = now + ALERT_DURATION_SECONDS
+            devices.push_hold(dev)
+            print(f"[ALERT] {dev.device_id}: {status} triggered - holding for {ALERT_DURATION_SECONDS}s")
+
+    # Entering EMERGENCY: save what the cameras saw around it (queued, never blocks)
+    if status == "EMERGENCY" and dev.status != "EMERGENCY" and detector:
+        event_recorder.trigger(dev.device_id, status, detector.rings(cameras_for(dev)), now)
+
+    # Keep alert active until hold time expires
+    if now < dev.alert_hold_until:
+        # Override status to keep alert active
+        if status == "NORMAL":
+            status = dev.status  # Keep previous alert status
+
+    devices.set_status(dev, status)
+
+def state_message(dev, person, sound, now):
+    """Fused sample for one device -> (topic, compact JSON), same fields as a samples row"""
+    return MQTT_TOPIC_STATE.format(device_id=dev.device_id), json.dumps({
+        "device_id": dev.device_id,
+        "ts_ms": int(now * 1000),
+        "ts": datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"),
+        "temperature": dev.temperature,
+        "humidity": dev.humidity,
+        "button": dev.button,
+        "abnormal_movement": dev.abnormal_movement,
+        "sound_alert": sound,
+        "person_present": person,
+        "status": dev.status,
+    }, separators=(",", ":"))
+
+def publish_states(states):
+    """Publish fused samples (retained: the dashboard gets the latest on subscribe)"""
+    for topic, payload in states:
+        client.publish(topic, payload, retain=True)
+    STATES_PUBLISHED.inc(len(states))
+
+def set_status(status, input_time):
+    """Publish a new fused status to the actuator thread"""
+    global current_status, status_input_time
+    with status_cond:
+        current_status = status
+        status_input_time = input_time
+        status_cond.notify_all()
+    vision_scheduler.set_status(status)  # detection rate follows the alert level
 
 # ---------------------------
-# Main loop
+# Main loop (fusion)
 # ---------------------------
 def main_loop():
-    global current_status, alert_start_time, alert_hold_until, system_running
+    """Re-evaluate fusion whenever an input changes or an alert hold expires
+
+    Only devices whose inputs changed (or whose hold expired) are re-fused;
+    the actuators follow the most severe device status.
+    """
+    global current_status, system_running, buzzer_pwm, pending_input_time
     print("Starting main loop...")
     print("[MAIN] Waiting 3 seconds before starting main processing...")
     time.sleep(3)  # Wait for all threads to initialize
     print("[MAIN] Main loop active")
-    
-    # Track performance
-    report_interval = 60  # Show report every 60 seconds
-    last_report_time = time.time()
+
+    # First pass over every device: inputs that never change (no ESP32
+    # traffic, nobody in view) must still be fused once
+    with lock:
+        devices.mark_all_dirty()
+    fusion_wakeup.set()
     
     # Track Pi status heartbeat
     status_interval = 5  # Send status every 5 seconds
@@ -438,63 +691,57 @@ def main_loop():
             # Check if Pi control is enabled
             if not pi_control_enabled:
                 print("[CONTROL] Pi processing disabled, waiting...")
-                time.sleep(5)
+                fusion_wakeup.wait(5)
+                fusion_wakeup.clear()
                 continue
-                
+
+            # Sleep until an input changes or the next timed job is due
+            now = time.time()
+            deadlines = [last_status_time + status_interval]
             with lock:
-                temp = latest["temperature"]
-                hum = latest["humidity"]
-                btn = latest["button"]
-                movement_abn = latest["abnormal_movement"]
-                sound = sound_alert
-                person = person_present
-                esp32_status = esp32_online
+                next_hold = devices.next_hold()
+            if next_hold is not None:
+                deadlines.append(next_hold)
+            fusion_wakeup.wait(max(0.0, min(deadlines) - now))
+            fusion_wakeup.clear()
 
             now = time.time()
-            
-            # Send periodic status heartbeat
+            fusion_start = time.perf_counter()
+            states = []
+            with lock:
+                sound = sound_alert
+                rate = sound_rate
+                input_time = pending_input_time
+                pending_input_time = None
+                for dev in devices.take_dirty() + devices.pop_expired_holds(now):
+                    person = presence_for(dev)
+                    fuse_device(dev, person, sound, rate, now)
+                    states.append(state_message(dev, person, sound, now))
+                status = devices.overall_status()
+            FUSION_MS.observe((time.perf_counter() - fusion_start) * 1000)
+
+            # Send periodic status heartbeat, with every device's current state:
+            # the dashboard keeps its live path while nothing changes
             if now - last_status_time >= status_interval:
                 client.publish(MQTT_TOPIC_PI_STATUS, "true", retain=True)
                 last_status_time = now
-            
-            status = evaluate_fusion(btn, movement_abn, person, sound, temp, hum)
-            
-            # If alert triggered, set hold duration
-            if status in ["WARNING", "EMERGENCY"]:
-                if current_status == "NORMAL" or now >= alert_hold_until:
-                    alert_start_time = now
-                    alert_hold_until = now + ALERT_DURATION_SECONDS
-                    print(f"[ALERT] {status} triggered - holding for {ALERT_DURATION_SECONDS}s")
-            
-            # Keep alert active until hold time expires
-            if now < alert_hold_until:
-                # Override status to keep alert active
-                if status == "NORMAL":
-                    status = current_status  # Keep previous alert status
-            
-            current_status = status
+                with lock:
+                    states = [state_message(dev, presence_for(dev), sound, now) for dev in devices]
 
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # log to DB
-            log_sample(ts, temp, hum, btn, movement_abn, sound, person, status)
-
-            # optional: print short summary
-            print(f"{ts} | status={status} | btn={btn} move={movement_abn} person={person} sound={sound} temp={temp} hum={hum}")
-
-            # Show performance report periodically
-            if now - last_report_time >= report_interval:
-                if detector:
-                    print("\n" + "="*60)
-                    detector.print_performance_report()
-                    print("="*60 + "\n")
-                last_report_time = now
-
-            time.sleep(1)
+            # Live path to the dashboard; the sample logger still writes history
+            if states:
+                publish_states(states)
+            
+            if status != current_status:
+                STATUS_CHANGES.inc()
+                set_status(status, input_time)
     except KeyboardInterrupt:
         print("Stopping...")
     finally:
         # Signal all threads to stop
         system_running = False  # Can use it directly now since declared global above
+        notify_actuator()
+        sound_edge.set()
         print("[GATEWAY] Stopping all threads...")
         
         # Publish Pi offline status
@@ -506,7 +753,10 @@ def main_loop():
         
         # Give threads time to exit gracefully
         time.sleep(0.5)
+        mqtt_dispatcher.stop()
         
+        print_latency_report()
+
         # Stop PersonDetector and show final report
         if detector:
             detector.stop()
@@ -518,6 +768,7 @@ def main_loop():
             print("="*60 + "\n")
         
         # Stop PWM before GPIO cleanup (critical order)
+        servo.stop()
         if buzzer_pwm:
             try:
                 if buzzer_running:
@@ -534,13 +785,23 @@ def main_loop():
         except Exception as e:
             print(f"[GATEWAY] GPIO cleanup error (ignored): {e}")
         
-        conn.close()
+        # Finish pending event clips, then flush pending rows to the DB
+        event_recorder.stop()
+        writer.stop()
         print("[GATEWAY] System shutdown complete")
 
 # ---------------------------
 # Start threads & MQTT
 # ---------------------------
 if __name__ == "__main__":
+    # start DB writer
+    writer.start()
+    event_recorder.start()
+
+    # metrics endpoint (replaces the periodic performance printout)
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+
     # start camera thread
     cam_thread = threading.Thread(target=person_detector_thread, daemon=True)
     cam_thread.start()
@@ -553,6 +814,14 @@ if __name__ == "__main__":
     actuator_thread = threading.Thread(target=actuator_control_thread, daemon=True)
     actuator_thread.start()
 
+    # start periodic DB logger
+    logger_thread = threading.Thread(target=sample_logger_thread, daemon=True)
+    logger_thread.start()
+
+    # MQTT handlers and servo moves run off paho's network thread
+    servo.start()
+    mqtt_dispatcher.start()
+
     # setup mqtt with callback API version 2
     client = mqtt.Client(
         callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+from person_detector import PersonDetector
+from tracker import iou
+
+
+class HaarPersonDetector(PersonDetector):
+    """Person detector for boards that cannot run YOLO
+
+    Same interface as PersonDetector (start / stop, person_detected,
+    on_change, stats and performance report, motion gate, scheduler,
+    tracker, metrics); only the model differs. Each frame is downscaled to
+    `imgsz` on its long side, converted to grayscale and run through
+    OpenCV's full-body Haar cascade, optionally followed by the HOG + linear
+    SVM people detector. Overlapping boxes from the two are merged.
+
+    Detection time grows with the pixel count, so imgsz=320 is about 4x
+    faster than a full 640x480 frame. cv_threads caps OpenCV's worker
+    threads (process-wide), leaving cores for MQTT and fusion.
+    """
+
+    def __init__(self, camera=None, motion_threshold=0.01, max_stale_s=5.0, imgsz=320, roi=None,
+                 lores_size=None, scheduler=None, on_change=None, enter_hits=2, exit_s=10.0,
+                 hog=False, conf=0.5, cv_threads=2, scale_factor=1.1, min_neighbors=3, min_size=(30, 30),
+                 ring_seconds=None, ring_fps=5.0, ring_size=(320, 240)):
+        """hog: also run the HOG people detector (slower, fewer misses on upright people).
+        conf: minimum HOG SVM score for a box.
+        scale_factor, min_neighbors, min_size: cascade detectMultiScale settings,
+        min_size in pixels of the downscaled image.
+        """
+        self.hog = hog
+        self.cv_threads = cv_threads
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        super().__init__(model_path=cv2.data.haarcascades + "haarcascade_fullbody.xml", camera=camera,
+                         motion_threshold=motion_threshold, max_stale_s=max_stale_s, imgsz=imgsz, roi=roi,
+                         lores_size=lores_size, scheduler=scheduler, on_change=on_change,
+                         enter_hits=enter_hits, exit_s=exit_s, conf=conf, dynamic=False,
+                         ring_seconds=ring_seconds, ring_fps=ring_fps, ring_size=ring_size,
+                         batch_wait_ms=0)  # no batched mode: waiting for other cameras only adds latency
+
+    def _load_model(self, model_path, backend, int8, imgsz, dynamic):
+        self.model_name = "Haar cascade"
+        self.backend = "haar+hog" if self.hog else "haar"
+        print(f"[VISION] Loading Haar cascade ({model_path}, hog={self.hog})...")
+        if self.cv_threads is not None:
+            cv2.setNumThreads(self.cv_threads)
+        cascade = cv2.CascadeClassifier(model_path)
+        if cascade.empty():
+            raise RuntimeError(f"Cannot load Haar cascade {model_path}")
+        if self.hog:
+            self.hog_descriptor = cv2.HOGDescriptor()
+            self.hog_descriptor.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        return cascade
+
+    def _run_model(self, frames):
+        """Frames one at a time (the cascade has no batched mode)"""
+        return [self._detect(frame) for frame in frames]
+
+    def _detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        boxes = [(x, y, x + w, y + h) for x, y, w, h in
+                 self.model.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                             minNeighbors=self.min_neighbors, minSize=self.min_size)]
+        if self.hog:
+            rects, weights = self.hog_descriptor.detectMultiScale(gray, winStride=(8, 8), padding=(8, 8), scale=1.05)
+            for (x, y, w, h), weight in zip(rects, np.ravel(weights)):
+                box = (x, y, x + w, y + h)
+                if weight >= self.conf and all(iou(box, other) < 0.5 for other in boxes):
+                    boxes.append(box)
+        return [list(map(float, box)) for box in boxes]
@@ -0,0 +1,354 @@
+"""Hardware backends for the gateway: GPIO (input + PWM) and cameras
+
+The real backend is RPi.GPIO plus Picamera2 / cv2.VideoCapture. The simulated
+backend lets the full gateway run on x86 boxes: GPIO inputs follow scripted
+edge timings and every output / PWM call is recorded instead of driven.
+
+    GATEWAY_HW=pi|sim             GPIO backend (default: pi)
+    GATEWAY_CAMERA=<source>       see open_camera() (default: auto)
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# ---------------------------
+# GPIO
+# ---------------------------
+def get_gpio(kind=None):
+    """Return an object with the RPi.GPIO API for the selected backend"""
+    kind = kind or os.getenv("GATEWAY_HW", "pi")
+    if kind == "pi":
+        import RPi.GPIO as GPIO
+        return GPIO
+    if kind == "sim":
+        print("[HW] Using simulated GPIO")
+        return SimGPIO()
+    raise ValueError(f"Unknown hardware backend: {kind} (expected 'pi' or 'sim')")
+
+
+class SimPWM:
+    """Records PWM calls on its SimGPIO instead of driving a pin"""
+
+    def __init__(self, gpio, pin, freq):
+        self.gpio = gpio
+        self.pin = pin
+        self.freq = freq
+        self.duty = 0
+        self.running = False
+        gpio._record(pin, "pwm_init", freq)
+
+    def start(self, duty):
+        self.duty = duty
+        self.running = True
+        self.gpio._record(self.pin, "pwm_start", duty)
+
+    def stop(self):
+        self.running = False
+        self.gpio._record(self.pin, "pwm_stop", None)
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+        self.gpio._record(self.pin, "pwm_duty", duty)
+
+    def ChangeFrequency(self, freq):
+        self.freq = freq
+        self.gpio._record(self.pin, "pwm_freq", freq)
+
+
+class SimGPIO:
+    """In-memory stand-in for the subset of RPi.GPIO the gateway uses
+
+    Input levels change according to edges queued with `schedule_edges()`
+    or `pulse()`; `input()` sees whatever level is current at call time, so
+    a pulse shorter than the polling interval is missed just like on a Pi.
+    Pins registered with `add_event_detect()` get their callbacks from a
+    dispatcher thread at the scripted edge times instead.
+    Outputs and PWM calls are appended to `calls` as
+    (time.perf_counter(), pin, action, value).
+    """
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels = {}  # pin -> current level
+        self.edges = {}   # pin -> [(perf_counter time, level), ...] sorted
+        self.calls = []
+        self.listeners = []  # callables(t, pin, action, value), e.g. for latency probes
+        self.detectors = {}  # pin -> [edge, callback, bouncetime s, last callback time]
+        self.edge_cond = threading.Condition(self.lock)
+        self.dispatcher = None
+
+    # --- RPi.GPIO API ---
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        with self.lock:
+            if direction == self.IN:
+                self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+            else:
+                self.levels[pin] = initial if initial is not None else self.LOW
+
+    def input(self, pin):
+        with self.lock:
+            self._advance(pin, time.perf_counter())
+            return self.levels.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        with self.lock:
+            self.levels[pin] = value
+        self._record(pin, "output", value)
+
+    def PWM(self, pin, freq):
+        return SimPWM(self, pin, freq)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self.lock:
+            if pin in self.detectors:
+                raise RuntimeError(f"Conflicting edge detection already enabled for GPIO {pin}")
+            self.detectors[pin] = [edge, callback, (bouncetime or 0) / 1000.0, None]
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self._dispatch_edges, name="SimGPIO-edges")
+                self.dispatcher.daemon = True
+                self.dispatcher.start()
+            self.edge_cond.notify_all()
+
+    def remove_event_detect(self, pin):
+        with self.lock:
+            self.detectors.pop(pin, None)
+
+    def cleanup(self, *pins):
+        with self.lock:
+            self.detectors.clear()
+            self.edge_cond.notify_all()
+        self._record(None, "cleanup", None)
+
+    # --- Simulation controls ---
+    def schedule_edges(self, pin, edges, start=None):
+        """Queue level changes: edges is [(seconds after start, level), ...]"""
+        start = time.perf_counter() if start is None else start
+        with self.lock:
+            pending = self.edges.setdefault(pin, [])
+            pending.extend((start + offset, level) for offset, level in edges)
+            pending.sort()
+            self.edge_cond.notify_all()
+
+    def pulse(self, pin, width_s=0.01, delay_s=0.0):
+        """Drive an input HIGH for width_s, starting delay_s from now"""
+        self.schedule_edges(pin, [(delay_s, self.HIGH), (delay_s + width_s, self.LOW)])
+
+    def pwm_calls(self, pin=None):
+        return [c for c in self.calls if c[2].startswith("pwm") and (pin is None or c[1] == pin)]
+
+    def _advance(self, pin, now):
+        pending = self.edges.get(pin)
+        while pending and pending[0][0] <= now:
+            self.levels[pin] = pending.pop(0)[1]
+
+    def _dispatch_edges(self):
+        """Apply scripted edges on detected pins at their due time and fire callbacks"""
+        while True:
+            fired = []
+            with self.lock:
+                now = time.perf_counter()
+                due = [self.edges[p][0][0] for p in self.detectors if self.edges.get(p)]
+                if not due or min(due) > now:
+                    self.edge_cond.wait(None if not due else min(due) - now)
+                    continue
+                for pin, det in self.detectors.items():
+                    pending = self.edges.get(pin)
+                    while pending and pending[0][0] <= now:
+                        t, level = pending.pop(0)
+                        old = self.levels.get(pin, self.LOW)
+                        self.levels[pin] = level
+                        edge, callback, bounce, last = det
+                        if level == old or callback is None:
+                            continue
+                        if edge != self.BOTH and edge != (self.RISING if level else self.FALLING):
+                            continue
+                        if last is not None and t - last < bounce:
+                            continue  # inside bouncetime, like RPi.GPIO
+                        det[3] = t
+                        fired.append((callback, pin))
+            for callback, pin in fired:
+                callback(pin)
+
+    def _record(self, pin, action, value):
+        entry = (time.perf_counter(), pin, action, value)
+        self.calls.append(entry)
+        for listener in self.listeners:
+            listener(*entry)
+
+
+# ---------------------------
+# Cameras
+# ---------------------------
+# Every camera has read() -> (ok, frame) and release(), like cv2.VideoCapture.
+
+class Picamera2Camera:
+    """Raspberry Pi camera via Picamera2 (RGB888 frames)
+
+    With lores_size, frames come from the ISP's secondary low-resolution
+    stream instead (YUV420, converted to BGR into a reused buffer), so the
+    full-size image is never copied out or scaled on the CPU.
+    """
+
+    def __init__(self, size=(640, 480), lores_size=None):
+        from picamera2 import Picamera2
+        self.cam = Picamera2()
+        self.lores_size = lores_size
+        self.bgr = None
+        if lores_size:
+            config = self.cam.create_preview_configuration(
+                main={"size": size, "format": "RGB888"},
+                lores={"size": lores_size, "format": "YUV420"})
+        else:
+            config = self.cam.create_preview_configuration(main={"size": size, "format": "RGB888"})
+        self.cam.configure(config)
+        self.cam.start()
+
+    def read(self):
+        if not self.lores_size:
+            return True, self.cam.capture_array()
+        yuv = self.cam.capture_array("lores")
+        if self.bgr is None:
+            self.bgr = np.empty((yuv.shape[0] * 2 // 3, yuv.shape[1], 3), dtype=np.uint8)
+        cv2.cvtColor(yuv, cv2.COLOR_YUV420p2BGR, dst=self.bgr)
+        return True, self.bgr
+
+    def release(self):
+        self.cam.stop()
+
+
+class OpenCVCamera:
+    """cv2.VideoCapture on a device index or stream URL"""
+
+    def __init__(self, source=0, size=(640, 480)):
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open camera source {source!r}")
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileCamera:
+    """Plays a video file as if it were a live camera
+
+    With realtime=True frames are paced at the file's FPS (a live source);
+    otherwise they are returned as fast as they can be decoded (benchmarks).
+    """
+
+    def __init__(self, path, loop=True, realtime=True):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open video file {path!r}")
+        self.loop = loop
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_interval = 1.0 / fps if realtime else 0.0
+        self.next_frame_time = time.perf_counter()
+
+    def read(self):
+        if self.frame_interval:
+            delay = self.next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_time = max(self.next_frame_time, time.perf_counter() - 1.0) + self.frame_interval
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class SyntheticCamera:
+    """Generated frames: a noisy background with a bright block moving across
+
+    No model will see a person here; it exercises the capture / inference
+    pipeline at a controlled frame rate without any video assets.
+    """
+
+    def __init__(self, size=(640, 480), fps=30.0):
+        self.width, self.height = size
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.next_frame_time = time.perf_counter()
+        self.index = 0
+        rng = np.random.default_rng(0)
+        self.background = rng.integers(0, 60, (self.height, self.width, 3), dtype=np.uint8)
+
+    def read(self):
+        if self.frame_interval:
+            delay = self.next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_time = max(self.next_frame_time, time.perf_counter() - 1.0) + self.frame_interval
+        frame = self.background.copy()
+        x = (self.index * 8) % self.width
+        frame[self.height // 3: self.height // 3 * 2, x: x + self.width // 8] = 220
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_camera(source=None, size=(640, 480), lores_size=None):
+    """Open a camera from a source spec
+
+    lores_size: read Picamera2's low-res stream at this size (ignored by
+    other sources).
+
+    auto            Picamera2 if available, else device 0
+    picamera        Picamera2
+    0, 1, ...       cv2.VideoCapture device index
+    rtsp://, http:// stream URL
+    <path>          video file, paced in real time
+    synthetic[@fps] generated frames (default 30 fps)
+    """
+    source = str(source if source is not None else os.getenv("GATEWAY_CAMERA", "auto"))
+
+    if source == "auto":
+        try:
+            cam = Picamera2Camera(size, lores_size)
+            print(f"[HW] Using Picamera2{f' (lores {lores_size[0]}x{lores_size[1]})' if lores_size else ''}")
+            return cam
+        except (ImportError, IndexError, RuntimeError) as e:
+            print(f"[HW] Picamera2 not available ({e}), falling back to cv2.VideoCapture")
+            return OpenCVCamera(0, size)
+    if source == "picamera":
+        return Picamera2Camera(size, lores_size)
+    if source.startswith("synthetic"):
+        fps = float(source.split("@", 1)[1]) if "@" in source else 30.0
+        return SyntheticCamera(size, fps)
+    if source.isdigit():
+        return OpenCVCamera(int(source), size)
+    if "://" in source:
+        return OpenCVCamera(source, size)
+    return VideoFileCamera(source)
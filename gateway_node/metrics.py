@@ -0,0 +1,208 @@
+"""In-process metrics shared by the gateway and the dashboard backend
+
+Counters, gauges and fixed-bucket latency histograms, rendered in the
+Prometheus text format. Recording is a lock plus a bisect into ~60
+buckets (about a microsecond), cheap enough to leave on in production.
+Quantiles (p50/p95/p99) are estimated from the buckets, so they are
+accurate to one bucket width (26% relative with the default log-spaced
+buckets) and clamped to the observed min / max.
+
+    import metrics
+    INFER_MS = metrics.histogram("vision_inference_ms", "YOLO inference time")
+    with INFER_MS.time():
+        ...
+    metrics.start_http_server(9100)   # GET http://127.0.0.1:9100/metrics
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 0.05 ms .. 50 s, 10 buckets per power of ten
+DEFAULT_BUCKETS_MS = tuple(float(f"{0.05 * 10 ** (i / 10):.3g}") for i in range(61))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def samples(self):
+        return [(self.name + "_total", self.value)]
+
+
+class Gauge:
+    """A set() value, or a callable read at scrape time"""
+    type = "gauge"
+
+    def __init__(self, name, help, func=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.func = func
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [(self.name, self.func() if self.func else self.value)]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value < self.min: self.min = value
+            if value > self.max: self.max = value
+
+    def time(self):
+        """Context manager observing the elapsed milliseconds"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimated q-quantile (linear within the bucket), None if empty"""
+        with self.lock:
+            counts, total, lowest, highest = list(self.counts), self.count, self.min, self.max
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else highest
+                estimate = lo + (hi - lo) * (rank - seen) / n
+                return min(max(estimate, lowest), highest)
+            seen += n
+        return highest
+
+    def summary(self):
+        """'p50=.. p95=.. p99=.. ms (n=..)' for log lines"""
+        if not self.count:
+            return "no samples"
+        p50, p95, p99 = (self.quantile(q) for q in (0.5, 0.95, 0.99))
+        return f"p50={p50:.2f} p95={p95:.2f} p99={p99:.2f} ms (n={self.count})"
+
+    def samples(self):
+        with self.lock:
+            counts, total, sum_ = list(self.counts), self.count, self.sum
+        out, cumulative = [], 0
+        for bound, n in zip(self.bounds, counts):
+            cumulative += n
+            out.append((f'{self.name}_bucket{{le="{bound:g}"}}', cumulative))
+        out.append((f'{self.name}_bucket{{le="+Inf"}}', total))
+        out.append((self.name + "_sum", sum_))
+        out.append((self.name + "_count", total))
+        return out
+
+
+class _Timer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe((time.perf_counter() - self.start) * 1000)
+
+
+# ---------------------------
+# Registry
+# ---------------------------
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get(cls, name, help, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help, **kwargs)
+        return metric
+
+
+def counter(name, help=""):
+    return _get(Counter, name, help)
+
+
+def gauge(name, help="", func=None):
+    metric = _get(Gauge, name, help)
+    if func is not None:
+        metric.func = func
+    return metric
+
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS_MS):
+    return _get(Histogram, name, help, buckets=buckets)
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, value in metric.samples():
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# HTTP endpoint
+# ---------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+def start_http_server(port, addr="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    print(f"[METRICS] Serving http://{addr}:{port}/metrics")
+    return server
@@ -0,0 +1,134 @@
+"""YOLO inference backends: PyTorch, ONNX Runtime, OpenVINO
+
+Non-PyTorch backends need a one-time export of the .pt model. The
+converted model is cached next to the .pt file and reused on later starts:
+
+    yolo11n.pt  ->  yolo11n.onnx, yolo11n_int8.onnx
+                    yolo11n_openvino_model/, yolo11n_int8_openvino_model/
+
+Exported models have a fixed input size; sizes other than 640 get their
+own cache entry (yolo11n_320.onnx, ...). Exports for batched multi-camera
+inference have a dynamic batch axis (yolo11n_dynamic.onnx, ...).
+
+All backends are loaded through ultralytics.YOLO, so results (boxes,
+classes) have the same shape whatever runs the model.
+
+    python model_backends.py yolo11n.pt [camera source] [--frames 100] [--int8]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+
+def cached_model_path(model_path, backend, int8=False, imgsz=640, dynamic=False):
+    """Where the converted model for a backend lives (the .pt itself for pytorch)"""
+    if backend == "pytorch":
+        return model_path
+    stem = (os.path.splitext(model_path)[0] + (f"_{imgsz}" if imgsz != 640 else "")
+            + ("_dynamic" if dynamic else "") + ("_int8" if int8 else ""))
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+
+
+def export_model(model_path, backend, int8=False, imgsz=640, dynamic=False):
+    """Convert model_path for backend once; returns the cached path"""
+    target = cached_model_path(model_path, backend, int8, imgsz, dynamic)
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+    print(f"[VISION] Exporting {model_path} for {backend}{' (INT8)' if int8 else ''}, one-time step...")
+    start = time.time()
+    # Ultralytics writes next to the model it exports (<stem>.onnx, <stem>_openvino_model),
+    # so each export works on its own copy of the .pt in a scratch directory beside the
+    # cache: variants never overwrite each other or a user's own export, and the result
+    # only appears under its cache name once complete.
+    workdir = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(os.path.abspath(target)))
+    try:
+        if backend == "onnx" and int8:
+            # Dynamic quantization of the FP32 export: INT8 weights, no calibration data needed
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            exported = os.path.join(workdir, os.path.basename(target))
+            quantize_dynamic(export_model(model_path, "onnx", False, imgsz, dynamic), exported,
+                             weight_type=QuantType.QUInt8)
+        else:
+            work_model = os.path.join(workdir, os.path.basename(model_path))
+            shutil.copy2(model_path, work_model)
+            if backend == "onnx":
+                exported = YOLO(work_model).export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+            else:
+                exported = YOLO(work_model).export(format="openvino", imgsz=imgsz, int8=int8, dynamic=dynamic)
+
+        try:
+            os.replace(str(exported), target)  # atomic rename (same directory)
+        except OSError:
+            if not os.path.exists(target):
+                raise
+            # another process finished the same export first; keep theirs
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"[VISION] Exported {target} in {time.time() - start:.1f}s")
+    return target
+
+
+def load_model(model_path, backend="pytorch", int8=False, imgsz=640, dynamic=False):
+    """ultralytics.YOLO for the chosen backend, exporting the model first if needed
+
+    dynamic: export with a dynamic batch axis (needed for batched inference).
+    """
+    from ultralytics import YOLO  # imported here so the Haar fallback runs without it
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+    if backend == "pytorch":
+        return YOLO(model_path)
+    return YOLO(export_model(model_path, backend, int8, imgsz, dynamic), task="detect")
+
+
+# --- Compare backends on this machine ---
+if __name__ == "__main__":
+    import statistics
+
+    from hardware import open_camera
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", nargs="?", default="yolo11n.pt")
+    parser.add_argument("camera", nargs="?", default="synthetic@0", help="camera source (see hardware.open_camera)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--int8", action="store_true", help="also time the INT8 variants")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--imgsz", type=int, default=640, help="inference input size")
+    args = parser.parse_args()
+
+    cap = open_camera(args.camera)
+    frames = [cap.read()[1] for _ in range(args.frames)]
+    cap.release()
+
+    variants = [(b, False) for b in args.backends.split(",")]
+    if args.int8:
+        variants += [(b, True) for b in args.backends.split(",") if b != "pytorch"]
+
+    print("\n" + "=" * 60)
+    print(f"INFERENCE BACKENDS ({args.model}, imgsz={args.imgsz}, {len(frames)} frames)")
+    print("=" * 60)
+    for backend, int8 in variants:
+        name = backend + (" int8" if int8 else "")
+        try:
+            model = load_model(args.model, backend, int8, args.imgsz)
+        except Exception as e:
+            print(f"   - {name:<14} unavailable: {e}")
+            continue
+        model(frames[0], verbose=False, imgsz=args.imgsz)  # warm-up
+        timings = []
+        for frame in frames:
+            start = time.perf_counter()
+            model(frame, verbose=False, conf=0.5, classes=[0], imgsz=args.imgsz)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"   - {name:<14} median {statistics.median(timings):8.2f} ms   max {max(timings):8.2f} ms")
+    print("=" * 60)
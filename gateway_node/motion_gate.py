@@ -0,0 +1,43 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """Cheap motion pre-filter in front of the person detector
+
+    Frames are shrunk to `width` pixels wide, converted to grayscale and
+    blurred, then compared against a slowly-updated background
+    (cv2.accumulateWeighted). `motion` is the fraction of pixels that differ
+    from the background by more than `pixel_threshold`; a frame "moved" when
+    it exceeds `motion_threshold`.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, motion_threshold=0.01, alpha=0.05):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.motion_threshold = motion_threshold
+        self.alpha = alpha  # background learning rate per frame
+        self.background = None
+        self.motion = 0.0
+        self.total_ms = 0.0  # time spent in check()
+
+    def check(self, frame):
+        """True if the frame differs enough from the background to need inference"""
+        start = time.perf_counter()
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, h * self.width // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype("float32")
+            moved = True  # nothing to compare against yet
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            self.motion = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+            moved = self.motion > self.motion_threshold
+            cv2.accumulateWeighted(gray, self.background, self.alpha)
+
+        self.total_ms += (time.perf_counter() - start) * 1000
+        return moved
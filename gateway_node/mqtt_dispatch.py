@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+
+from paho.mqtt.client import topic_matches_sub
+
+import metrics
+
+NETWORK_MS = metrics.histogram("gateway_mqtt_network_ms", "on_message time on paho's network thread (enqueue only)")
+HANDLER_MS = metrics.histogram("gateway_mqtt_handler_ms", "MQTT message handling time on the dispatch worker")
+QUEUE_WAIT_MS = metrics.histogram("gateway_mqtt_queue_wait_ms", "MQTT message wait in the dispatch queue")
+MESSAGES = metrics.counter("gateway_mqtt_messages", "MQTT messages handled")
+DROPPED = metrics.counter("gateway_mqtt_dropped", "MQTT messages dropped because the dispatch queue was full")
+
+_STOP = object()
+
+
+class MessageDispatcher:
+    """Hands MQTT messages from paho's network thread to a worker thread
+
+    submit() (called from on_message) only queues the topic and payload,
+    so the network loop keeps reading and answering keepalives whatever a
+    handler does. One worker runs the handlers in arrival order; a handler
+    is registered per topic filter (MQTT wildcards allowed) and called as
+    handler(topic, payload_str). Messages matching no filter are ignored.
+    """
+
+    def __init__(self, queue_size=1000):
+        self.handlers = []  # (topic filter, handler), first match wins
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.running = False
+
+        metrics.gauge("gateway_mqtt_queue_depth", "MQTT messages waiting for the dispatch worker",
+                      func=self.queue.qsize)
+
+        # --- stats ---
+        self.stats = {
+            "messages": 0,
+            "dropped": 0,
+            "unhandled": 0,
+            "errors": 0,
+        }
+
+    def add_handler(self, topic_filter, handler):
+        self.handlers.append((topic_filter, handler))
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._worker_thread, name="mqtt-dispatch")
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[MQTT] Dispatcher started ({len(self.handlers)} handlers)")
+
+    def stop(self, timeout=5):
+        """Handle whatever is queued, then stop the worker"""
+        if not self.running: return
+        self.running = False
+        self.queue.put(_STOP)
+        if self.thread: self.thread.join(timeout)
+        print(f"[MQTT] Dispatcher stopped ({self.stats['messages']} handled, {self.stats['dropped']} dropped)")
+
+    def submit(self, msg):
+        """Queue one paho message; never blocks the network thread"""
+        with NETWORK_MS.time():
+            try:
+                self.queue.put_nowait((msg.topic, msg.payload, time.perf_counter()))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                DROPPED.inc()
+                if self.stats["dropped"] % 100 == 1:
+                    print(f"[MQTT] Dispatch queue full, dropped {self.stats['dropped']} messages so far")
+
+    def dispatch(self, topic, payload):
+        """Run the handler for one message on the calling thread"""
+        for topic_filter, handler in self.handlers:
+            if topic_matches_sub(topic_filter, topic):
+                with HANDLER_MS.time():
+                    handler(topic, payload.decode())
+                MESSAGES.inc()
+                self.stats["messages"] += 1
+                return
+        self.stats["unhandled"] += 1
+
+    def _worker_thread(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            topic, payload, queued_at = item
+            QUEUE_WAIT_MS.observe((time.perf_counter() - queued_at) * 1000)
+            try:
+                self.dispatch(topic, payload)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[MQTT] Handler error on {topic}: {e}")
@@ -1,18 +1,115 @@
 import cv2
+import numpy as np
+import re
+import sys
 import threading
 import time
+from types import SimpleNamespace
 import psutil
-from ultralytics import YOLO
+from hardware import open_camera
+from model_backends import load_model
+from motion_gate import MotionGate
+from frame_slot import FrameSlot
+from frame_ring import FrameRing
+from tracker import PersonTracker
+import metrics
+
+INFERENCE_MS = metrics.histogram("vision_inference_ms", "Person detector (YOLO or Haar) time per frame")
+RESULT_AGE_MS = metrics.histogram("vision_result_age_ms", "Frame capture to detection result")
+FRAMES_CHECKED = metrics.counter("vision_frames_checked", "Frames taken by the inference thread")
+FRAMES_SKIPPED = metrics.counter("vision_frames_skipped", "Frames skipped by the motion gate")
+BATCH_SIZE = metrics.histogram("vision_batch_size", "Frames per batched model call", buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+
+
+def parse_sources(camera):
+    """[(name, spec)] from one source or a list; "name=spec" strings set the name"""
+    specs = camera if isinstance(camera, (list, tuple)) else [camera]
+    sources = []
+    for i, spec in enumerate(specs):
+        match = re.match(r"^(\w+)=(.+)$", spec) if isinstance(spec, str) else None
+        if match:
+            sources.append((match.group(1), match.group(2)))
+        else:
+            sources.append((f"cam{i}", spec))
+    return sources
+
+
+class CameraSource:
+    """One camera of a PersonDetector: capture thread, frame slot, motion gate and tracker"""
+
+    def __init__(self, name, spec, cond, motion_threshold, enter_hits, exit_s, ring=None):
+        self.name = name
+        self.spec = spec  # source spec for hardware.open_camera() or an opened camera object
+        self.slot = FrameSlot(cond)
+        self.cap = None
+        self.thread = None
+        self.gate = MotionGate(motion_threshold=motion_threshold) if motion_threshold is not None else None
+        self.tracker = PersonTracker(enter_hits=enter_hits, exit_s=exit_s)
+        self.prep_buf = None  # reused resize target
+        self.ring = ring  # FrameRing of recent frames for event clips (None: not recorded)
+        self.last_inference_time = 0
+        self.person_detected = 0
+        self.stats = {"frames_captured": 0, "results": 0, "total_age_ms": 0, "max_age_ms": 0, "presence_changes": 0}
+
 
 class PersonDetector:
-    def __init__(self, model_path='yolov11n.pt'):
-        print(f"[VISION] Loading YOLO model ({model_path})...")
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov11n.pt', camera=None, motion_threshold=0.01, max_stale_s=5.0,
+                 backend="pytorch", int8=False, imgsz=640, roi=None, lores_size=None,
+                 scheduler=None, on_change=None, enter_hits=2, exit_s=10.0, conf=0.5, dynamic=None,
+                 ring_seconds=None, ring_fps=5.0, ring_size=(320, 240), batch_wait_ms=20):
+        """camera: source spec for hardware.open_camera() or an opened camera object,
+        or a list of them ("name=spec" strings name a camera; default cam0, cam1, ...).
+        With several cameras, the newest frame of each is collected and run
+        through the model in one batched call per cycle.
+
+        backend: pytorch, onnx or openvino (see model_backends); int8 uses the
+        quantized export. dynamic: export with a dynamic batch axis (default:
+        when there are several cameras).
+
+        YOLO only runs on frames where the motion gate sees more than
+        motion_threshold of the (downscaled) image change, or once the last
+        result is max_stale_s old. motion_threshold=None runs it on every frame.
+
+        imgsz: YOLO input size; frames are downscaled to fit it before inference.
+        conf: YOLO confidence threshold for a person box.
+        roi: (x, y, w, h) as fractions of the frame; only that area is checked.
+        lores_size: capture from Picamera2's low-res stream at this size.
+        scheduler: a DetectionScheduler pacing detections (None: every frame).
+        on_change(name, count): called from the inference thread when a
+        camera's count changes.
+
+        Counts are tracked (stable): a person counts once matched in
+        enter_hits detections and stays until unseen for exit_s.
+        person_detected is the total over all cameras; person_counts() has
+        them per camera.
+
+        ring_seconds: keep this many seconds of each camera's frames
+        (ring_fps, downscaled to ring_size) for event clips; see rings().
+        batch_wait_ms: with several cameras, how long to wait after the first
+        new frame for the other cameras' frames, so they share a model call.
+        """
+        if dynamic is None:
+            dynamic = isinstance(camera, (list, tuple)) and len(camera) > 1
+        self.model = self._load_model(model_path, backend, int8, imgsz, dynamic)
+        self.max_stale_s = max_stale_s
+        self.imgsz = imgsz
+        self.conf = conf
+        self.roi = roi
+        self.lores_size = lores_size
+        self.prep_buf = None  # reused resize target
+        self.scheduler = scheduler
+        self.on_change = on_change
+        self.last_boxes = []  # (x1, y1, x2, y2) of the last detect_frame() result
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self.batch_bufs = []  # resize targets for detect_batch()
         
         self.running = False
         self.person_detected = 0 
         self.thread = None
-        self.cap = None
+        self.cond = threading.Condition()  # shared by all frame slots: "some camera has a new frame"
+        self.sources = [CameraSource(name, spec, self.cond, motion_threshold, enter_hits, exit_s,
+                                     FrameRing(ring_seconds, ring_fps, ring_size) if ring_seconds else None)
+                        for name, spec in parse_sources(camera)]
 
         # --- เก็บสถิติ ---
         self.stats = {
@@ -21,46 +118,151 @@ class PersonDetector:
             "total_inference_time_ms": 0,
             "max_inference_ms": 0,
             "min_inference_ms": 9999,
+            "frames_seen": 0,
+            "frames_skipped": 0,
+            "gate_ms": 0,
+            "batches": 0,
         }
 
+    def _load_model(self, model_path, backend, int8, imgsz, dynamic):
+        self.model_name = "YOLO"
+        self.backend = backend + (" int8" if int8 and backend != "pytorch" else "")
+        print(f"[VISION] Loading YOLO model ({model_path}, backend={self.backend})...")
+        return load_model(model_path, backend, int8, imgsz, dynamic)
+
+    def _run_model(self, frames):
+        """[[(x1, y1, x2, y2), ...] per frame] from one model call"""
+        # Run YOLO (a list of frames is one batched call)
+        results = self.model(frames if len(frames) > 1 else frames[0],
+                             verbose=False, conf=self.conf, classes=[0], imgsz=self.imgsz)
+        return [r.boxes.xyxy.tolist() for r in results]
+
     def reset_stats(self):
+        for source in self.sources:
+            source.stats = dict.fromkeys(source.stats, 0)
         self.stats = {
             "start_time": time.time(),
             "total_frames": 0,
             "total_inference_time_ms": 0,
             "max_inference_ms": 0,
             "min_inference_ms": 9999,
+            "frames_seen": 0,
+            "frames_skipped": 0,
+            "gate_ms": 0,
+            "batches": 0,
         }
 
-    def detect_frame(self, frame, draw=False):
+    def crop_roi(self, frame):
+        """View of the region of interest (no copy)"""
+        if self.roi is None:
+            return frame
+        h, w = frame.shape[:2]
+        x, y, rw, rh = self.roi
+        return frame[int(y * h): int((y + rh) * h), int(x * w): int((x + rw) * w)]
+
+    def prepare(self, frame, owner=None):
+        """ROI crop, downscaled so its long side is imgsz, in a buffer reused per owner"""
+        owner = owner or self
+        crop = self.crop_roi(frame)
+        h, w = crop.shape[:2]
+        scale = self.imgsz / max(h, w)
+        if scale >= 1:
+            return crop
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        buf = owner.prep_buf
+        if buf is None or buf.shape[:2] != (size[1], size[0]) or buf.shape[2:] != crop.shape[2:]:
+            buf = owner.prep_buf = np.empty((size[1], size[0]) + crop.shape[2:], dtype=crop.dtype)
+        cv2.resize(crop, size, dst=buf, interpolation=cv2.INTER_AREA)
+        return buf
+
+    def to_frame_coords(self, boxes, frame, prepared):
+        """Boxes found on prepare(frame) -> (x1, y1, x2, y2) in the full frame's pixels"""
+        if prepared is frame or not boxes:
+            return boxes
+        h, w = frame.shape[:2]
+        ox, oy = (int(self.roi[0] * w), int(self.roi[1] * h)) if self.roi is not None else (0, 0)
+        crop = self.crop_roi(frame)
+        sx = crop.shape[1] / prepared.shape[1]
+        sy = crop.shape[0] / prepared.shape[0]
+        return [(x1 * sx + ox, y1 * sy + oy, x2 * sx + ox, y2 * sy + oy) for x1, y1, x2, y2 in boxes]
+
+    def _infer(self, frames):
+        """One model call over prepared frames -> person boxes, one list per frame"""
         # เริ่มจับเวลา Model Inference (เฉพาะตอน AI คิด)
         inference_start = time.time()
         
-        # Run YOLO
-        results = self.model(frame, verbose=False, conf=0.5, classes=[0])
+        results = self._run_model(frames)
         
         inference_end = time.time()
         
-        # คำนวณ Inference Time (ms)
-        inference_ms = (inference_end - inference_start) * 1000
-        
-        person_count = 0
-        annotated_frame = frame
-        
-        for r in results:
-            person_count = len(r.boxes)
-            if draw and person_count > 0:
-                annotated_frame = r.plot()
+        # คำนวณ Inference Time (ms) per frame
+        inference_ms = (inference_end - inference_start) * 1000 / len(frames)
         
         # --- บันทึกสถิติ ---
-        self.stats["total_frames"] += 1
-        self.stats["total_inference_time_ms"] += inference_ms
+        INFERENCE_MS.observe(inference_ms)
+        BATCH_SIZE.observe(len(frames))
+        self.stats["batches"] += 1
+        self.stats["total_frames"] += len(frames)
+        self.stats["total_inference_time_ms"] += inference_ms * len(frames)
         
         if inference_ms > self.stats["max_inference_ms"]: self.stats["max_inference_ms"] = inference_ms
         if inference_ms < self.stats["min_inference_ms"]: self.stats["min_inference_ms"] = inference_ms
 
+        return results
+
+    def detect_frame(self, frame, draw=False):
+        """(person count, frame) for one frame; boxes (in frame pixels) in self.last_boxes"""
+        prepared = self.prepare(frame)
+        boxes = self.to_frame_coords(self._infer([prepared])[0], frame, prepared)
+        person_count = len(boxes)
+        annotated_frame = frame
+        if draw and person_count > 0:
+            annotated_frame = frame.copy()
+            for x1, y1, x2, y2 in boxes:
+                cv2.rectangle(annotated_frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+        self.last_boxes = boxes
         return person_count, annotated_frame
 
+    def detect_batch(self, frames):
+        """[(person count, boxes)] for several frames in one model call"""
+        if not frames: return []
+        while len(self.batch_bufs) < len(frames):
+            self.batch_bufs.append(SimpleNamespace(prep_buf=None))
+        prepared = [self.prepare(frame, owner=buf) for frame, buf in zip(frames, self.batch_bufs)]
+        results = self._infer(prepared)
+        return [(len(boxes), self.to_frame_coords(boxes, frame, prep))
+                for boxes, frame, prep in zip(results, frames, prepared)]
+
+    def needs_inference(self, source, frame):
+        """Motion gate + staleness check for one camera's frame"""
+        self.stats["frames_seen"] += 1
+        FRAMES_CHECKED.inc()
+        if source.gate is not None:
+            gate_ms = source.gate.total_ms
+            moved = source.gate.check(self.crop_roi(frame))
+            self.stats["gate_ms"] += source.gate.total_ms - gate_ms
+            if not moved and time.time() - source.last_inference_time < self.max_stale_s:
+                self.stats["frames_skipped"] += 1
+                FRAMES_SKIPPED.inc()
+                return False
+        source.last_inference_time = time.time()
+        return True
+
+    def rings(self, names=None):
+        """{camera name: FrameRing} of the recording cameras (all, or those in names)"""
+        return {source.name: source.ring for source in self.sources
+                if source.ring is not None and (names is None or source.name in names)}
+
+    def person_counts(self):
+        """{camera name: tracked person count}"""
+        return {source.name: source.person_detected for source in self.sources}
+
+    @property
+    def dwell_s(self):
+        """Seconds the longest-present tracked person has been in view (any camera)"""
+        now = time.time()
+        return max(source.tracker.dwell_s(now) for source in self.sources)
+
     def print_performance_report(self):
         """ แสดงรายงานเฉพาะ Model Performance & Resource Usage """
         duration = time.time() - self.stats["start_time"]
@@ -71,6 +273,10 @@ class PersonDetector:
         # คำนวณค่าเฉลี่ย
         avg_fps = total_frames / duration
         avg_inference = self.stats["total_inference_time_ms"] / total_frames
+        frames_seen = self.stats["frames_seen"] or total_frames
+        skipped = self.stats["frames_skipped"]
+        # Inference time the skipped frames would have cost, minus the gate's own cost
+        saved_ms = skipped * avg_inference - self.stats["gate_ms"]
         
         # อ่านค่า Hardware
         cpu_usage = psutil.cpu_percent()
@@ -80,13 +286,52 @@ class PersonDetector:
         print("📊  PERFORMANCE REPORT (ผลการทดสอบประสิทธิภาพ)")
         print("="*60)
         
-        print(f"1. MODEL PERFORMANCE (โมเดล YOLO)")
-        print(f"   - Average FPS:           {avg_fps:.2f} frames/sec")
+        print(f"1. MODEL PERFORMANCE (โมเดล {self.model_name}, backend: {self.backend})")
+        print(f"   - Cameras:               {len(self.sources)}")
+        print(f"   - Input:                 imgsz={self.imgsz}, roi={self.roi or 'full frame'}"
+              f"{f', lores {self.lores_size[0]}x{self.lores_size[1]}' if self.lores_size else ''}")
+        print(f"   - Inference rate:        {avg_fps:.2f} frames/sec")
         print(f"   - Inference Time (Avg):  {avg_inference:.2f} ms")
         print(f"   - Inference Time (Max):  {self.stats['max_inference_ms']:.2f} ms")
         print(f"   - Inference Time (Min):  {self.stats['min_inference_ms']:.2f} ms")
+        print(f"   - Inference Time:        {INFERENCE_MS.summary()}")
+
+        print(f"   - Batches:               {self.stats['batches']} "
+              f"(avg {total_frames / max(1, self.stats['batches']):.2f} frames/call, "
+              f"waiting up to {self.batch_wait_s * 1000:.0f} ms for the other cameras)")
+
+        for source in self.sources:
+            st = source.stats
+            captured = st["frames_captured"]
+            spec = source.spec if isinstance(source.spec, (str, int)) else type(source.spec).__name__
+            print(f"\n   [{source.name}] {spec}: {source.person_detected} person(s), "
+                  f"{st['presence_changes']} presence changes ({source.tracker.tracks_started} tracks started)")
+            if captured:
+                dropped = source.slot.dropped
+                print(f"   Capture: {captured} frames ({captured / duration:.2f}/sec), "
+                      f"{dropped} dropped unprocessed ({dropped / captured * 100:.1f}%)")
+            if st["results"]:
+                print(f"   Capture -> result age:  avg {st['total_age_ms'] / st['results']:.2f} ms, "
+                      f"max {st['max_age_ms']:.2f} ms")
+
+        print(f"\n2. MOTION GATE")
+        print(f"   - Frames checked:        {frames_seen} ({frames_seen / duration:.2f} frames/sec)")
+        print(f"   - Skipped (no motion):   {skipped} ({skipped / frames_seen * 100:.1f}%)")
+        print(f"   - Gate cost:             {self.stats['gate_ms'] / frames_seen:.2f} ms/frame")
+        # Net of the gate's own cost; when the gate costs more than it skips, say so instead
+        label = "Net CPU saved (est.):  " if saved_ms >= 0 else "Net CPU cost (est.):   "
+        print(f"   - {label}{abs(saved_ms) / 1000:.1f} s ({abs(saved_ms) / 10 / duration:.1f}% of one core)")
         
-        print(f"\n2. RESOURCE USAGE (ทรัพยากรเครื่อง)")
+        if self.scheduler:
+            print(f"\n3. DETECTION SCHEDULER")
+            for status, (target, achieved, spent) in self.scheduler.achieved_rates().items():
+                target = f"{target:.2f}" if target else "max"
+                print(f"   - {status:<10} target {target:>5} fps   achieved {achieved:6.2f} fps   ({spent:.0f}s)")
+            print(f"   - Budget backoffs:       {self.scheduler.backoff_events} (now x{self.scheduler.backoff}, "
+                  f"cpu {self.scheduler.cpu}%, temp {self.scheduler.temp}; "
+                  f"max-rate cycle {self.scheduler.frame_period * 1000:.0f} ms, backed off too)")
+
+        print(f"\n4. RESOURCE USAGE (ทรัพยากรเครื่อง)")
         print(f"   - CPU Usage:             {cpu_usage}%")
         print(f"   - RAM Usage:             {ram_usage}%")
         print("="*60 + "\n")
@@ -96,103 +341,153 @@ class PersonDetector:
         if self.running: return
         self.running = True
         self.reset_stats()
-        self.thread = threading.Thread(target=self._process_thread)
+        for source in self.sources:
+            source.slot = FrameSlot(self.cond)
+            source.thread = threading.Thread(target=self._capture_thread, args=(source,),
+                                             name=f"vision-capture-{source.name}")
+            source.thread.daemon = True
+            source.thread.start()
+        self.thread = threading.Thread(target=self._process_thread, name="vision-infer")
         self.thread.daemon = True
         self.thread.start()
         print("[VISION] Started.")
 
     def stop(self):
         self.running = False
+        for source in self.sources:
+            source.slot.close()
+        if self.scheduler: self.scheduler.close()
+        for source in self.sources:
+            if source.thread: source.thread.join()
         if self.thread: self.thread.join()
-        if self.cap:
-            try:
-                self.cap.stop()  # For Picamera2
-            except AttributeError:
+        for source in self.sources:
+            if source.cap:
                 try:
-                    self.cap.release()  # For cv2.VideoCapture
-                except:
-                    pass
+                    source.cap.release()
+                except Exception as e:
+                    print(f"[VISION] Camera release error (ignored): {e}")
         self.print_performance_report() # <--- สรุปผลตอนจบ
         print("[VISION] Stopped.")
 
-    def _process_thread(self):
-        """Loop ทำงานเบื้องหลัง (ไม่แสดงภาพ เพื่อประหยัด Resource)"""
-        # Use Picamera2 for Raspberry Pi Camera
-        use_picamera = False
-        try:
-            from picamera2 import Picamera2
-            self.cap = Picamera2()
-            config = self.cap.create_preview_configuration(main={"size": (640, 480), "format": "RGB888"})
-            self.cap.configure(config)
-            self.cap.start()
-            use_picamera = True
-            print("[VISION] Using Picamera2")
-        except (ImportError, IndexError, RuntimeError) as e:
-            print(f"[VISION] Picamera2 not available ({e}), falling back to cv2.VideoCapture")
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                print("[VISION] ERROR: Cannot open camera with cv2.VideoCapture either!")
+    def _capture_thread(self, source):
+        """Read frames as fast as the camera delivers them into its frame slot"""
+        if source.spec is None or isinstance(source.spec, (str, int)):
+            try:
+                source.cap = open_camera(source.spec, lores_size=self.lores_size)
+            except Exception as e:
+                print(f"[VISION] ERROR: Cannot open camera {source.name} ({source.spec}): {e}")
+                source.slot.close()
                 return
-            self.cap.set(3, 640)
-            self.cap.set(4, 480)
-            use_picamera = False
-        
+        else:
+            source.cap = source.spec
+
         while self.running:
             try:
-                if use_picamera:
-                    frame = self.cap.capture_array()
-                else:
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        time.sleep(0.1)
-                        continue
-                
-                count, _ = self.detect_frame(frame, draw=False)
-                self.person_detected = count
-                
+                ret, frame = source.cap.read()
+                if not ret:
+                    time.sleep(0.1)
+                    continue
+                source.slot.put(frame)
+                if source.ring is not None:
+                    source.ring.push(frame)
+                source.stats["frames_captured"] += 1
+            except Exception as e:
+                print(f"[VISION] Error in capture loop ({source.name}): {e}")
+                time.sleep(0.5)
+
+    def _next_frames(self, timeout):
+        """Newest frame of every camera that has one -> [(source, frame, capture time)]
+
+        Cameras are not in step, so after the first new frame this waits up
+        to batch_wait_s for every other open camera to deliver one too;
+        otherwise each model call would mostly get a single frame.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: any(s.slot.has_new or s.slot.closed for s in self.sources), timeout):
+                return []
+            if self.batch_wait_s > 0 and len(self.sources) > 1:
+                self.cond.wait_for(lambda: all(s.slot.has_new or s.slot.closed for s in self.sources),
+                                   self.batch_wait_s)
+            taken = []
+            for source in self.sources:
+                frame, capture_time = source.slot.take()
+                if frame is not None:
+                    taken.append((source, frame, capture_time))
+            return taken
+
+    def _process_thread(self):
+        """Loop ทำงานเบื้องหลัง (ไม่แสดงภาพ เพื่อประหยัด Resource)
+
+        Each cycle takes the newest frame of every camera (frames that arrive
+        while inference is busy are overwritten, not queued) and runs the
+        ones that pass the motion gate through the model in one batch.
+        """
+        while self.running:
+            try:
+                if self.scheduler and not self.scheduler.wait():
+                    return
+                taken = self._next_frames(timeout=1.0)
+                if not taken:
+                    if all(source.slot.closed for source in self.sources): return
+                    continue
+
+                batch = [(source, frame, t) for source, frame, t in taken if self.needs_inference(source, frame)]
+                prepared = [self.prepare(frame, owner=source) for source, frame, _ in batch]
+                results = self._infer(prepared) if batch else []
+                now = time.time()
+                for (source, frame, _), prep, boxes in zip(batch, prepared, results):
+                    source.tracker.update(self.to_frame_coords(boxes, frame, prep), now)
+                inferred = {source.name for source, _, _ in batch}
+                for source, _, _ in taken:
+                    if source.name not in inferred:
+                        source.tracker.keep_alive(now)
+                    self._publish(source)
+                for source, _, capture_time in batch:
+                    age_ms = (time.perf_counter() - capture_time) * 1000
+                    RESULT_AGE_MS.observe(age_ms)
+                    st = source.stats
+                    st["results"] += 1
+                    st["total_age_ms"] += age_ms
+                    if age_ms > st["max_age_ms"]: st["max_age_ms"] = age_ms
+
             except Exception as e:
                 print(f"[VISION] Error in detection loop: {e}")
                 time.sleep(0.5)
                 continue
 
+    def _publish(self, source):
+        """Apply the tracker's stable count and report changes"""
+        stable = source.tracker.count
+        if stable == source.person_detected:
+            return
+        if (stable > 0) != (source.person_detected > 0):
+            source.stats["presence_changes"] += 1
+        source.person_detected = stable
+        self.person_detected = sum(s.person_detected for s in self.sources)
+        if self.on_change:
+            self.on_change(source.name, stable)
+
 # --- Debug Mode ---
 if __name__ == "__main__":
     print("Running Debug Mode... Press 'q' to stop.")
     detector = PersonDetector(model_path='yolo11n.pt') 
 
-    # Initialize camera (try Picamera2 first, fallback to cv2.VideoCapture)
-    use_picamera = False
+    # Initialize camera (Picamera2 first, then cv2.VideoCapture; see hardware.open_camera)
     try:
-        from picamera2 import Picamera2
-        cap = Picamera2()
-        config = cap.create_preview_configuration(main={"size": (640, 480), "format": "RGB888"})
-        cap.configure(config)
-        cap.start()
-        use_picamera = True
-        print("Using Picamera2")
-    except (ImportError, IndexError, RuntimeError) as e:
-        print(f"Picamera2 not available ({e}), using cv2.VideoCapture")
-        cap = cv2.VideoCapture(0)
-        cap.set(3, 640)
-        cap.set(4, 480)
-        use_picamera = False
-        
-        if not cap.isOpened():
-            print("Error: Could not open camera.")
-            exit()
+        cap = open_camera(sys.argv[1] if len(sys.argv) > 1 else None)
+    except Exception as e:
+        print(f"Error: Could not open camera ({e})")
+        exit()
 
     detector.reset_stats()
 
     try:
         while True:
             # Capture frame
-            if use_picamera:
-                frame = cap.capture_array()
-            else:
-                ret, frame = cap.read()
-                if not ret: 
-                    print("Error: Failed to capture frame")
-                    break
+            ret, frame = cap.read()
+            if not ret: 
+                print("Error: Failed to capture frame")
+                break
 
             # Detect and draw
             person_count, output_frame = detector.detect_frame(frame, draw=True)
@@ -208,9 +503,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         pass
     finally:
-        if use_picamera:
-            cap.stop()
-        else:
-            cap.release()
+        cap.release()
         cv2.destroyAllWindows()
         detector.print_performance_report()
\ No newline at end of file
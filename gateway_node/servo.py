@@ -0,0 +1,110 @@
+import threading
+import time
+
+
+def angle_to_duty(angle):
+    """Servo angle (clamped to 0-180°) -> PWM duty cycle at 50 Hz
+
+    Simple formula: duty_cycle = 2.5 + (angle / 18)
+    - 0° = 2.5% duty
+    - 90° = 7.5% duty
+    - 180° = 12.5% duty
+    """
+    return 2.5 + (min(max(angle, 0), 180) / 18.0)
+
+
+class ServoController:
+    """Light-switch servo driven by a timer-based state machine on its own thread
+
+    request() only records the wanted position and returns. A move is
+    idle -> settle (signal off, `settle_s`) -> moving (position signal,
+    `move_s`) -> release (signal off again to stop jitter, `settle_s`) ->
+    idle. Requests arriving during a move coalesce: only the latest target
+    counts, and it is read when the position signal starts, so ON-OFF-ON
+    within one move ends ON without three sweeps.
+    """
+
+    def __init__(self, pwm, off_angle=0, on_angle=90, move_s=0.8, settle_s=0.1):
+        self.pwm = pwm  # GPIO.PWM at 50 Hz, or None (state only)
+        self.off_angle = off_angle
+        self.on_angle = on_angle
+        self.move_s = move_s
+        self.settle_s = settle_s
+        self.is_on = False  # position the servo was last moved to
+        self.target = None  # wanted position (None: nothing requested)
+        self.phase = "idle"
+        self.moving_to = None
+        self.deadline = None
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        # --- stats ---
+        self.stats = {
+            "requests": 0,
+            "moves": 0,
+            "coalesced": 0,  # requests superseded before their move started
+        }
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="servo")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread: self.thread.join()
+        self._duty(0)
+
+    def request(self, turn_on):
+        """Ask for ON / OFF; returns immediately"""
+        with self.cond:
+            self.stats["requests"] += 1
+            current = self.moving_to if self.phase in ("moving", "release") else self.is_on
+            if self.target is not None and self.target != current:
+                self.stats["coalesced"] += 1  # pending move replaced before it started
+            self.target = turn_on
+            if self.phase == "idle" and turn_on == self.is_on:
+                print(f"[SERVO] Already {'ON' if self.is_on else 'OFF'}")
+            self.cond.notify_all()
+
+    def _duty(self, duty):
+        if self.pwm is None:
+            return
+        try:
+            self.pwm.ChangeDutyCycle(duty)
+        except Exception as e:
+            print(f"[SERVO] Error: {e}")
+
+    def _run(self):
+        with self.cond:
+            while self.running:
+                now = time.monotonic()
+                if self.phase == "idle":
+                    if self.target is None or self.target == self.is_on:
+                        self.cond.wait()
+                        continue
+                    self._duty(0)  # stop any previous signal first
+                    self.phase, self.deadline = "settle", now + self.settle_s
+                elif now < self.deadline:
+                    self.cond.wait(self.deadline - now)
+                elif self.phase == "settle" and self.target == self.is_on:
+                    self.phase, self.deadline = "idle", None  # request undone before the move started
+                elif self.phase == "settle":
+                    self.moving_to = self.target  # latest request wins
+                    angle = self.on_angle if self.moving_to else self.off_angle
+                    self._duty(angle_to_duty(angle))
+                    print(f"[SERVO] Moving to {angle}° (duty: {angle_to_duty(angle):.2f}%)")
+                    self.phase, self.deadline = "moving", now + self.move_s
+                elif self.phase == "moving":
+                    self._duty(0)  # stop signal to prevent jitter
+                    self.is_on = self.moving_to
+                    self.stats["moves"] += 1
+                    print(f"[SERVO] Light switch {'ON' if self.is_on else 'OFF'}")
+                    self.phase, self.deadline = "release", now + self.settle_s
+                else:  # release done
+                    self.phase, self.deadline = "idle", None
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import deque
+
+
+class SoundEventBuffer:
+    """Ring buffer of KY-037 event timestamps with software debounce
+
+    Edges closer than `debounce_s` to the previous accepted event are counted
+    as bounces and dropped. Window queries answer "how many sound events in
+    the last N seconds", which fusion uses as a sound-intensity measure.
+    """
+
+    def __init__(self, capacity=512, debounce_s=0.02):
+        self.events = deque(maxlen=capacity)  # time.monotonic() of accepted events
+        self.debounce_s = debounce_s
+        self.lock = threading.Lock()
+        self.total_events = 0
+        self.bounces = 0
+
+    def record(self, t=None):
+        """Add one edge; returns False if it was a bounce"""
+        t = time.monotonic() if t is None else t
+        with self.lock:
+            if self.events and t - self.events[-1] < self.debounce_s:
+                self.bounces += 1
+                return False
+            self.events.append(t)
+            self.total_events += 1
+            return True
+
+    def count(self, window_s, now=None):
+        """Number of events in the last window_s seconds"""
+        now = time.monotonic() if now is None else now
+        since = now - window_s
+        n = 0
+        with self.lock:
+            for t in reversed(self.events):
+                if t < since: break
+                n += 1
+        return n
+
+    def rate(self, window_s, now=None):
+        """Events per second over the last window_s seconds"""
+        return self.count(window_s, now) / window_s
+
+    def next_expiry(self, window_s, now=None):
+        """When the oldest event still inside the window drops out (None if empty)"""
+        now = time.monotonic() if now is None else now
+        since = now - window_s
+        with self.lock:
+            inside = [t for t in self.events if t >= since]
+        return inside[0] + window_s if inside else None
@@ -0,0 +1,634 @@
+import sqlite3
+import threading
+import queue
+import time
+
+import metrics
+
+# ---------------------------
+# Schema
+# ---------------------------
+SCHEMA_VERSION = 6  # stored in PRAGMA user_version
+
+# Rows from single-node setups (legacy esp32/data topic, pre-v5 databases)
+DEFAULT_DEVICE_ID = "esp32"
+
+SAMPLE_COLUMNS = (
+    "device_id",
+    "ts_ms",
+    "ts",
+    "temperature",
+    "humidity",
+    "button",
+    "abnormal_movement",
+    "sound_alert",
+    "person_present",
+    "status",
+)
+
+# id is the rowid, so rows are clustered in insert (= time) order.
+# ts_ms is epoch milliseconds; ts is kept as local-time text for the dashboard.
+CREATE_SAMPLES = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL DEFAULT 'esp32',
+    ts_ms INTEGER NOT NULL,
+    ts TEXT,
+    temperature REAL,
+    humidity REAL,
+    button INTEGER,
+    abnormal_movement INTEGER,
+    sound_alert INTEGER,
+    person_present INTEGER,
+    status TEXT
+)
+"""
+
+CREATE_SAMPLES_INDEX = "CREATE INDEX IF NOT EXISTS idx_samples_ts_ms ON samples (ts_ms)"
+CREATE_SAMPLES_DEVICE_INDEX = "CREATE INDEX IF NOT EXISTS idx_samples_device_ts ON samples (device_id, ts_ms)"
+
+INSERT_SAMPLE = "INSERT INTO samples ({}) VALUES ({})".format(
+    ", ".join(SAMPLE_COLUMNS),
+    ", ".join(":" + c for c in SAMPLE_COLUMNS),
+)
+
+# Version 1 is the original table: TEXT ts, no primary key, no index.
+# ts was written with datetime.now(), so it is parsed as local time ('utc' modifier).
+_MIGRATE_V1_TO_V2 = """
+BEGIN IMMEDIATE;
+ALTER TABLE samples RENAME TO samples_v1;
+{create}
+INSERT INTO samples (ts_ms, ts, temperature, humidity, button,
+                     abnormal_movement, sound_alert, person_present, status)
+    SELECT CAST(strftime('%s', ts, 'utc') AS INTEGER) * 1000, ts, temperature, humidity, button,
+           abnormal_movement, sound_alert, person_present, status
+    FROM samples_v1
+    WHERE ts IS NOT NULL
+    ORDER BY ts;
+DROP TABLE samples_v1;
+{index};
+PRAGMA user_version = 2;
+COMMIT;
+""".format(create=CREATE_SAMPLES.strip() + ";", index=CREATE_SAMPLES_INDEX)
+
+
+# ---------------------------
+# Rollups (pre-aggregated history)
+# ---------------------------
+# (table suffix, bucket width in ms). Buckets are aligned to UTC, one row per device.
+ROLLUPS = (
+    ("1m", 60 * 1000),
+    ("1h", 60 * 60 * 1000),
+    ("1d", 24 * 60 * 60 * 1000),
+)
+
+# Means are stored as sum + non-null count so buckets can be merged incrementally
+ROLLUP_COLUMNS = (
+    "bucket_ms",
+    "device_id",
+    "n",
+    "temperature_n", "temperature_min", "temperature_max", "temperature_sum",
+    "humidity_n", "humidity_min", "humidity_max", "humidity_sum",
+    "normal_count", "warning_count", "emergency_count",
+    "person_present_sum", "sound_alert_sum",
+)
+
+CREATE_ROLLUP = """
+CREATE TABLE IF NOT EXISTS samples_{name} (
+    bucket_ms INTEGER NOT NULL,
+    device_id TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    temperature_n INTEGER NOT NULL,
+    temperature_min REAL,
+    temperature_max REAL,
+    temperature_sum REAL NOT NULL,
+    humidity_n INTEGER NOT NULL,
+    humidity_min REAL,
+    humidity_max REAL,
+    humidity_sum REAL NOT NULL,
+    normal_count INTEGER NOT NULL,
+    warning_count INTEGER NOT NULL,
+    emergency_count INTEGER NOT NULL,
+    person_present_sum INTEGER NOT NULL,
+    sound_alert_sum INTEGER NOT NULL,
+    PRIMARY KEY (bucket_ms, device_id)
+)
+"""
+
+_ADDITIVE = ("n", "temperature_n", "temperature_sum", "humidity_n", "humidity_sum",
+             "normal_count", "warning_count", "emergency_count",
+             "person_present_sum", "sound_alert_sum")
+
+UPSERT_ROLLUP = (
+    "INSERT INTO samples_{{name}} ({cols}) VALUES ({params}) "
+    "ON CONFLICT (bucket_ms, device_id) DO UPDATE SET {updates}"
+).format(
+    cols=", ".join(ROLLUP_COLUMNS),
+    params=", ".join(":" + c for c in ROLLUP_COLUMNS),
+    updates=", ".join(
+        [f"{c} = {c} + excluded.{c}" for c in _ADDITIVE] +
+        # min()/max() return NULL if either side is NULL, hence the coalesce
+        [f"{c} = {fn}(coalesce({c}, excluded.{c}), coalesce(excluded.{c}, {c}))"
+         for fn in ("min", "max") for c in (f"temperature_{fn}", f"humidity_{fn}")]
+    ),
+)
+
+BACKFILL_ROLLUP = """
+INSERT INTO samples_{name} ({cols})
+SELECT ts_ms - ts_ms % {width} AS bucket, device_id,
+       COUNT(*),
+       COUNT(temperature), MIN(temperature), MAX(temperature), TOTAL(temperature),
+       COUNT(humidity), MIN(humidity), MAX(humidity), TOTAL(humidity),
+       TOTAL(status = 'NORMAL'), TOTAL(status = 'WARNING'), TOTAL(status = 'EMERGENCY'),
+       TOTAL(person_present), TOTAL(sound_alert)
+FROM samples
+GROUP BY bucket, device_id
+""".replace("{cols}", ", ".join(ROLLUP_COLUMNS))
+
+# What the backend returns for one bucket: one device, or all of them merged (:device_id NULL)
+SELECT_ROLLUP = """
+SELECT bucket_ms, SUM(n) AS n,
+       MIN(temperature_min) AS temperature_min,
+       SUM(temperature_sum) / SUM(temperature_n) AS temperature_mean,
+       MAX(temperature_max) AS temperature_max,
+       MIN(humidity_min) AS humidity_min,
+       SUM(humidity_sum) / SUM(humidity_n) AS humidity_mean,
+       MAX(humidity_max) AS humidity_max,
+       SUM(normal_count) AS normal_count,
+       SUM(warning_count) AS warning_count,
+       SUM(emergency_count) AS emergency_count,
+       CAST(SUM(person_present_sum) AS REAL) / SUM(n) AS person_present,
+       CAST(SUM(sound_alert_sum) AS REAL) / SUM(n) AS sound_alert
+FROM samples_{name}
+WHERE bucket_ms BETWEEN :from_ms AND :to_ms
+  AND (:device_id IS NULL OR device_id = :device_id)
+GROUP BY bucket_ms
+ORDER BY bucket_ms
+"""
+
+# v5: rollups gain device_id; existing buckets belong to the single legacy node
+_MIGRATE_ROLLUP_TO_V5 = """
+BEGIN IMMEDIATE;
+ALTER TABLE samples_{{name}} RENAME TO samples_{{name}}_v4;
+{{create}}
+INSERT INTO samples_{{name}} ({cols})
+    SELECT {legacy_cols} FROM samples_{{name}}_v4;
+DROP TABLE samples_{{name}}_v4;
+COMMIT;
+""".format(
+    cols=", ".join(ROLLUP_COLUMNS),
+    legacy_cols=", ".join(f"'{DEFAULT_DEVICE_ID}'" if c == "device_id" else c for c in ROLLUP_COLUMNS),
+)
+
+
+def _new_bucket(bucket_ms, device_id):
+    return {
+        "bucket_ms": bucket_ms, "device_id": device_id, "n": 0,
+        "temperature_n": 0, "temperature_min": None, "temperature_max": None, "temperature_sum": 0.0,
+        "humidity_n": 0, "humidity_min": None, "humidity_max": None, "humidity_sum": 0.0,
+        "normal_count": 0, "warning_count": 0, "emergency_count": 0,
+        "person_present_sum": 0, "sound_alert_sum": 0,
+    }
+
+
+def rollup_batch(batch, width_ms):
+    """Aggregate a list of sample dicts into per-(bucket, device) rollup rows"""
+    buckets = {}
+    for sample in batch:
+        key = (sample["ts_ms"] - sample["ts_ms"] % width_ms, sample["device_id"])
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = _new_bucket(*key)
+        b["n"] += 1
+        for field in ("temperature", "humidity"):
+            v = sample[field]
+            if v is None: continue
+            b[field + "_n"] += 1
+            b[field + "_sum"] += v
+            if b[field + "_min"] is None or v < b[field + "_min"]: b[field + "_min"] = v
+            if b[field + "_max"] is None or v > b[field + "_max"]: b[field + "_max"] = v
+        status = (sample["status"] or "").lower()
+        if status in ("normal", "warning", "emergency"):
+            b[status + "_count"] += 1
+        b["person_present_sum"] += sample["person_present"] or 0
+        b["sound_alert_sum"] += sample["sound_alert"] or 0
+    return list(buckets.values())
+
+
+# ---------------------------
+# Alert episodes (kept forever, not subject to retention)
+# ---------------------------
+CREATE_ALERTS = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL DEFAULT 'esp32',
+    status TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL
+)
+"""
+
+CREATE_ALERTS_INDEX = "CREATE INDEX IF NOT EXISTS idx_alerts_start_ms ON alerts (start_ms)"
+
+BACKFILL_ALERTS = """
+INSERT INTO alerts (device_id, status, start_ms, end_ms)
+SELECT device_id, status, MIN(ts_ms), MAX(ts_ms) FROM (
+    SELECT device_id, ts_ms, status,
+           -- rows of the same episode share (row number - row number within status)
+           ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY ts_ms) -
+           ROW_NUMBER() OVER (PARTITION BY device_id, status ORDER BY ts_ms) AS episode
+    FROM samples
+)
+WHERE status != 'NORMAL'
+GROUP BY device_id, status, episode
+ORDER BY MIN(ts_ms)
+"""
+
+
+# ---------------------------
+# Events (EMERGENCY clips; kept forever like alerts)
+# ---------------------------
+# One row per camera clip; clip_path is NULL if no frames could be saved.
+CREATE_EVENTS = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ts_ms INTEGER NOT NULL,
+    camera TEXT,
+    clip_path TEXT,
+    frames INTEGER NOT NULL DEFAULT 0,
+    clip_start_ms INTEGER,
+    clip_end_ms INTEGER
+)
+"""
+
+CREATE_EVENTS_INDEX = "CREATE INDEX IF NOT EXISTS idx_events_ts_ms ON events (ts_ms)"
+
+INSERT_EVENT = """
+INSERT INTO events (device_id, status, ts_ms, camera, clip_path, frames, clip_start_ms, clip_end_ms)
+VALUES (:device_id, :status, :ts_ms, :camera, :clip_path, :frames, :clip_start_ms, :clip_end_ms)
+"""
+
+
+def connect(db_path, check_same_thread=True):
+    """Open a connection with the pragmas every writer of data.db should use
+
+    WAL lets the backend's SELECTs run while the gateway is writing, and
+    synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def migrate(conn, offline=False):
+    """Bring an existing database up to SCHEMA_VERSION in place
+
+    Only the gateway migrates (the backend waits in db.wait_for_schema()). The
+    steps that rewrite the whole file and hold an exclusive lock for as long
+    as that takes, the full VACUUM that switches on incremental auto-vacuum
+    and the v1 -> v2 table copy, only run with offline=True, i.e. from
+    `python storage.py --upgrade <db>` with gateway and backend stopped.
+    Online, a v1 database is refused and auto-vacuum is left off (freed
+    pages are still reused, the file just does not shrink).
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION and (not offline or conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2):
+        return
+
+    # Incremental auto-vacuum lets Retention hand freed pages back in small steps.
+    # It can only be switched on before the first table exists, or by a full VACUUM.
+    # (connect() switching to WAL already counts, so even a new file needs the VACUUM.)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        has_data = bool(_columns(conn, "samples"))
+        if not has_data or offline:
+            if has_data:
+                print("[DB] Enabling incremental auto-vacuum (full VACUUM)...")
+            start = time.time()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            if has_data:
+                print(f"[DB] VACUUM done in {time.time() - start:.1f}s")
+        else:
+            print("[DB] Incremental auto-vacuum is off; to enable it, stop gateway and backend and run "
+                  "`python storage.py --upgrade <db>`")
+
+    cols = _columns(conn, "samples")
+    if cols and "ts_ms" not in cols:
+        if not offline:
+            raise RuntimeError("database has schema v1 samples; stop gateway and backend and run "
+                               "`python storage.py --upgrade <db>` first")
+        count = conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+        print(f"[DB] Migrating samples to schema v2 ({count} rows)...")
+        start = time.time()
+        conn.executescript(_MIGRATE_V1_TO_V2)
+        print(f"[DB] Migration done in {time.time() - start:.1f}s")
+        version = 2
+    elif version < 2:
+        # Fresh database (or already has the v2 columns)
+        with conn:
+            conn.execute(CREATE_SAMPLES)
+            conn.execute(CREATE_SAMPLES_INDEX)
+
+    # v5: per-device rows (needed before the rollup / alert backfills below)
+    if "device_id" not in _columns(conn, "samples"):
+        conn.execute(f"ALTER TABLE samples ADD COLUMN device_id TEXT NOT NULL DEFAULT '{DEFAULT_DEVICE_ID}'")
+    conn.execute(CREATE_SAMPLES_DEVICE_INDEX)
+
+    if version < 3:
+        # v3: rollup tables, backfilled from whatever raw rows exist
+        start = time.time()
+        with conn:
+            for name, width in ROLLUPS:
+                conn.execute(CREATE_ROLLUP.format(name=name))
+                conn.execute(BACKFILL_ROLLUP.format(name=name, width=width))
+        print(f"[DB] Rollup tables ready ({time.time() - start:.1f}s)")
+
+    if version < 4:
+        # v4: alert episodes, rebuilt from raw history
+        with conn:
+            conn.execute(CREATE_ALERTS)
+            conn.execute(CREATE_ALERTS_INDEX)
+            conn.execute(BACKFILL_ALERTS)
+
+    if version < 5:
+        # v5: rollups keyed by (bucket, device), alerts tagged with their device
+        for name, _ in ROLLUPS:
+            if "device_id" not in _columns(conn, f"samples_{name}"):
+                conn.executescript(_MIGRATE_ROLLUP_TO_V5.format(
+                    name=name, create=CREATE_ROLLUP.format(name=name).strip() + ";"))
+        if "device_id" not in _columns(conn, "alerts"):
+            conn.execute(f"ALTER TABLE alerts ADD COLUMN device_id TEXT NOT NULL DEFAULT '{DEFAULT_DEVICE_ID}'")
+
+    if version < 6:
+        # v6: EMERGENCY clip events
+        with conn:
+            conn.execute(CREATE_EVENTS)
+            conn.execute(CREATE_EVENTS_INDEX)
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def init_db(db_path, offline=False):
+    """Create or migrate the tables (safe to call on an existing database)"""
+    conn = connect(db_path)
+    migrate(conn, offline)
+    conn.close()
+
+
+# ---------------------------
+# Retention
+# ---------------------------
+class Retention:
+    """Deletes expired rows in small chunks and frees the pages incrementally
+
+    Each `step()` removes at most `chunk_rows` rows per table and releases at
+    most `vacuum_pages` pages, so no step holds the write lock for long.
+    Days of None keep a table forever; the alerts table is never pruned.
+    """
+
+    def __init__(self, raw_days=7, rollup_days=90, daily_days=None,
+                 chunk_rows=2000, vacuum_pages=256, interval_s=60):
+        # table -> (time column, days to keep)
+        self.tables = {
+            "samples": ("ts_ms", raw_days),
+            "samples_1m": ("bucket_ms", rollup_days),
+            "samples_1h": ("bucket_ms", rollup_days),
+            "samples_1d": ("bucket_ms", daily_days),
+        }
+        self.chunk_rows = chunk_rows
+        self.vacuum_pages = vacuum_pages
+        self.interval_s = interval_s
+        self.rows_deleted = 0
+
+    def step(self, conn, now_ms=None):
+        """Run one bounded pruning step; returns True if more work is pending"""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        backlog = False
+        for table, (column, days) in self.tables.items():
+            if days is None: continue
+            cutoff = now_ms - days * 24 * 60 * 60 * 1000
+            with conn:
+                deleted = conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} WHERE {column} < ? ORDER BY {column} LIMIT ?)",
+                    (cutoff, self.chunk_rows)).rowcount
+            self.rows_deleted += deleted
+            if deleted >= self.chunk_rows:
+                backlog = True
+
+        if conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            backlog = backlog or conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+        return backlog
+
+
+# ---------------------------
+# Background batched writer
+# ---------------------------
+_STOP = object()
+
+
+DB_COMMIT_MS = metrics.histogram("db_commit_ms", "SampleWriter batch insert + rollup + alert transaction time")
+DB_ROWS_WRITTEN = metrics.counter("db_rows_written", "Sample rows committed")
+DB_ROWS_DROPPED = metrics.counter("db_rows_dropped", "Sample rows dropped because the write queue was full")
+
+
+class SampleWriter:
+    """Writes samples from a bounded queue on its own thread
+
+    Rows are grouped into one transaction per `batch_size` rows or
+    `flush_interval_ms`, whichever comes first; the rollup and alert tables
+    are updated in the same transaction. Retention runs between batches on
+    the same thread. `write()` never blocks the caller: when the queue is
+    full the row is dropped and counted.
+    """
+
+    def __init__(self, db_path, batch_size=20, flush_interval_ms=2000, queue_size=1000,
+                 retention=None):
+        self.db_path = db_path
+        self.retention = retention
+        self.open_alerts = {}  # device_id -> (alert id, status) of the episode in progress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.running = False
+
+        metrics.gauge("db_queue_depth", "Rows waiting for the DB writer", func=self.queue.qsize)
+
+        # --- stats ---
+        self.stats = {
+            "rows_written": 0,
+            "rows_dropped": 0,
+            "batches": 0,
+            "total_commit_ms": 0,
+            "max_commit_ms": 0,
+        }
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_thread, name="SampleWriter")
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[DB] Writer started (batch={self.batch_size}, interval={self.flush_interval:.1f}s)")
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the thread"""
+        if not self.running: return
+        self.running = False
+        self.queue.put(_STOP)  # blocking put: the sentinel must never be dropped
+        if self.thread: self.thread.join(timeout)
+        print(f"[DB] Writer stopped ({self.stats['rows_written']} rows, "
+              f"{self.stats['batches']} batches, {self.stats['rows_dropped']} dropped)")
+
+    def write(self, sample):
+        """Queue one sample (dict keyed by SAMPLE_COLUMNS; device_id may be omitted)"""
+        sample.setdefault("device_id", DEFAULT_DEVICE_ID)
+        try:
+            self.queue.put_nowait(sample)
+        except queue.Full:
+            self.stats["rows_dropped"] += 1
+            DB_ROWS_DROPPED.inc()
+            if self.stats["rows_dropped"] % 100 == 1:
+                print(f"[DB] Write queue full, dropped {self.stats['rows_dropped']} rows so far")
+
+    def _flush(self, conn, batch):
+        if not batch: return
+        commit_start = time.time()
+        try:
+            with conn:  # one transaction per batch
+                conn.executemany(INSERT_SAMPLE, batch)
+                for name, width in ROLLUPS:
+                    conn.executemany(UPSERT_ROLLUP.format(name=name), rollup_batch(batch, width))
+                self._update_alerts(conn, batch)
+        except sqlite3.Error as e:
+            print(f"[DB] Batch insert failed ({len(batch)} rows lost): {e}")
+            self._load_open_alerts(conn)  # their INSERTs may have been rolled back
+            batch.clear()
+            return
+        commit_ms = (time.time() - commit_start) * 1000
+
+        DB_COMMIT_MS.observe(commit_ms)
+        DB_ROWS_WRITTEN.inc(len(batch))
+        self.stats["rows_written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["total_commit_ms"] += commit_ms
+        if commit_ms > self.stats["max_commit_ms"]: self.stats["max_commit_ms"] = commit_ms
+        batch.clear()
+
+    def _load_open_alerts(self, conn):
+        """Resume the episodes in progress from the database (start-up, failed batch)
+
+        An episode's end_ms is its device's last sample, so it is still open
+        if that device's newest sample has the same status and ts_ms; after a
+        restart mid-WARNING the next samples then extend it instead of
+        starting a second row.
+        """
+        self.open_alerts = {}
+        latest = conn.execute(
+            "SELECT id, device_id, status, end_ms FROM alerts "
+            "WHERE id IN (SELECT MAX(id) FROM alerts GROUP BY device_id)").fetchall()
+        for alert_id, device_id, status, end_ms in latest:
+            row = conn.execute("SELECT status, ts_ms FROM samples WHERE device_id = ? "
+                               "ORDER BY ts_ms DESC LIMIT 1", (device_id,)).fetchone()
+            if row == (status, end_ms):
+                self.open_alerts[device_id] = (alert_id, status)
+        if self.open_alerts:
+            print(f"[DB] Resuming {len(self.open_alerts)} open alert episode(s)")
+
+    def _update_alerts(self, conn, batch):
+        """Open, extend or close each device's alert episode as its status changes"""
+        last_ts = {}
+        for sample in batch:
+            device_id, status = sample["device_id"], sample["status"]
+            last_ts[device_id] = sample["ts_ms"]
+            open_alert = self.open_alerts.get(device_id)
+            if open_alert and open_alert[1] == status:
+                continue
+            if open_alert:
+                conn.execute("UPDATE alerts SET end_ms = ? WHERE id = ?",
+                             (sample["ts_ms"], open_alert[0]))
+                del self.open_alerts[device_id]
+            if status != "NORMAL":
+                cur = conn.execute(
+                    "INSERT INTO alerts (device_id, status, start_ms, end_ms) VALUES (?, ?, ?, ?)",
+                    (device_id, status, sample["ts_ms"], sample["ts_ms"]))
+                self.open_alerts[device_id] = (cur.lastrowid, status)
+        for device_id, ts_ms in last_ts.items():
+            if device_id in self.open_alerts:
+                conn.execute("UPDATE alerts SET end_ms = ? WHERE id = ?",
+                             (ts_ms, self.open_alerts[device_id][0]))
+
+    def _prune(self, conn):
+        """One retention step; returns when the next one is due"""
+        try:
+            backlog = self.retention.step(conn)
+        except sqlite3.Error as e:
+            print(f"[DB] Retention step failed: {e}")
+            backlog = False
+        # Catch up on a backlog quickly, but still one small chunk at a time
+        return time.time() + (1.0 if backlog else self.retention.interval_s)
+
+    def _writer_thread(self):
+        conn = connect(self.db_path)
+        self._load_open_alerts(conn)
+        batch = []
+        deadline = None
+        next_prune = time.time() if self.retention else None
+
+        while True:
+            wake_at = [t for t in (deadline, next_prune) if t is not None]
+            timeout = max(0.0, min(wake_at) - time.time()) if wake_at else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Drain whatever was queued before the sentinel
+                while True:
+                    try:
+                        rest = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if rest is not _STOP:
+                        batch.append(rest)
+                self._flush(conn, batch)
+                break
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.time() + self.flush_interval
+
+            if len(batch) >= self.batch_size or (batch and time.time() >= deadline):
+                self._flush(conn, batch)
+                deadline = None
+
+            if next_prune is not None and time.time() >= next_prune:
+                next_prune = self._prune(conn)
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create or migrate the gateway database")
+    parser.add_argument("db", help="path to data.db")
+    parser.add_argument("--upgrade", action="store_true",
+                        help="offline upgrade: also run the full VACUUM / v1 table copy "
+                             "(stop gateway and backend first)")
+    args = parser.parse_args()
+    init_db(args.db, offline=args.upgrade)
+    print(f"[DB] {args.db} is at schema v{SCHEMA_VERSION}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The gateway modules are flat scripts run from gateway_node/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,208 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import storage
+
+V1_ROWS = [  # ts, temperature, humidity, button, abnormal_movement, sound_alert, person_present, status
+    ("2025-01-01 10:00:00", 25.0, 50.0, 0, 0, 0, 1, "NORMAL"),
+    ("2025-01-01 10:00:30", 27.0, 52.0, 0, 0, 1, 1, "WARNING"),
+    ("2025-01-01 10:00:59", 29.0, 54.0, 0, 0, 1, 1, "WARNING"),
+    ("2025-01-01 10:01:10", 30.0, None, 1, 0, 0, 1, "EMERGENCY"),
+    ("2025-01-01 10:01:20", 24.0, 48.0, 0, 0, 0, 0, "NORMAL"),
+]
+
+
+def ts_ms(ts):
+    """What the v1 -> v2 migration makes of a local-time ts string"""
+    return int(datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").timestamp() * 1000)
+
+
+@pytest.fixture
+def v1_db(tmp_path):
+    """A database as the original gateway left it"""
+    path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE samples (ts TEXT, temperature REAL, humidity REAL, button INTEGER, "
+                 "abnormal_movement INTEGER, sound_alert INTEGER, person_present INTEGER, status TEXT)")
+    conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?)", V1_ROWS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_fresh_database_gets_current_schema(tmp_path):
+    conn = storage.connect(str(tmp_path / "new.db"))
+    storage.migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == storage.SCHEMA_VERSION
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"samples", "samples_1m", "samples_1h", "samples_1d", "alerts", "events"} <= tables
+
+
+def test_v1_is_refused_online(v1_db):
+    conn = storage.connect(v1_db)
+    with pytest.raises(RuntimeError, match="--upgrade"):
+        storage.migrate(conn)
+    assert conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0] == len(V1_ROWS)
+
+
+def test_v1_upgrade_offline(v1_db):
+    conn = storage.connect(v1_db)
+    storage.migrate(conn, offline=True)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == storage.SCHEMA_VERSION
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    rows = conn.execute("SELECT device_id, ts_ms, ts, temperature, status FROM samples ORDER BY id").fetchall()
+    assert rows == [(storage.DEFAULT_DEVICE_ID, ts_ms(r[0]), r[0], r[1], r[7]) for r in V1_ROWS]
+    plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM samples WHERE ts_ms > 0"))
+    assert "idx_samples" in plan
+
+
+def test_upgrade_backfills_rollups(v1_db):
+    conn = storage.connect(v1_db)
+    storage.migrate(conn, offline=True)
+    minute = ts_ms("2025-01-01 10:00:00")
+    buckets = conn.execute("SELECT bucket_ms, device_id, n, temperature_min, temperature_max, temperature_sum, "
+                           "humidity_n, warning_count, emergency_count, person_present_sum, sound_alert_sum "
+                           "FROM samples_1m ORDER BY bucket_ms").fetchall()
+    assert buckets == [
+        (minute, "esp32", 3, 25.0, 29.0, 81.0, 3, 2, 0, 3, 2),
+        (minute + 60000, "esp32", 2, 24.0, 30.0, 54.0, 1, 0, 1, 1, 0),
+    ]
+    hour = conn.execute("SELECT SUM(n), SUM(temperature_sum) FROM samples_1h").fetchone()
+    assert hour == (5, 135.0)
+
+    mean = conn.execute(storage.SELECT_ROLLUP.format(name="1m"),
+                        {"from_ms": minute, "to_ms": minute, "device_id": None}).fetchone()
+    assert mean[0] == minute and mean[3] == pytest.approx(27.0)
+
+
+def test_upgrade_backfills_alert_episodes(v1_db):
+    conn = storage.connect(v1_db)
+    storage.migrate(conn, offline=True)
+    alerts = conn.execute("SELECT device_id, status, start_ms, end_ms FROM alerts ORDER BY start_ms").fetchall()
+    assert alerts == [
+        ("esp32", "WARNING", ts_ms(V1_ROWS[1][0]), ts_ms(V1_ROWS[2][0])),
+        ("esp32", "EMERGENCY", ts_ms(V1_ROWS[3][0]), ts_ms(V1_ROWS[3][0])),
+    ]
+
+
+def test_migrate_is_idempotent(v1_db):
+    conn = storage.connect(v1_db)
+    storage.migrate(conn, offline=True)
+    storage.migrate(conn)
+    storage.migrate(conn, offline=True)
+    assert conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0] == len(V1_ROWS)
+    assert conn.execute("SELECT SUM(n) FROM samples_1m").fetchone()[0] == len(V1_ROWS)
+    assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 2
+
+
+def test_v4_rollups_and_alerts_gain_device_id(tmp_path):
+    """v4 -> v5 runs online and tags existing buckets / alerts with the legacy device"""
+    path = str(tmp_path / "v4.db")
+    conn = storage.connect(path)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.execute("CREATE TABLE samples (id INTEGER PRIMARY KEY, ts_ms INTEGER NOT NULL, ts TEXT, temperature REAL, "
+                 "humidity REAL, button INTEGER, abnormal_movement INTEGER, sound_alert INTEGER, "
+                 "person_present INTEGER, status TEXT)")
+    legacy_cols = [c for c in storage.ROLLUP_COLUMNS if c != "device_id"]
+    for name, _ in storage.ROLLUPS:
+        conn.execute(f"CREATE TABLE samples_{name} (bucket_ms INTEGER PRIMARY KEY, "
+                     + ", ".join(f"{c} NOT NULL DEFAULT 0" for c in legacy_cols[1:]) + ")")
+        conn.execute(f"INSERT INTO samples_{name} (bucket_ms, n, temperature_sum) VALUES (60000, 2, 50.0)")
+    conn.execute("CREATE TABLE alerts (id INTEGER PRIMARY KEY, status TEXT NOT NULL, "
+                 "start_ms INTEGER NOT NULL, end_ms INTEGER NOT NULL)")
+    conn.execute("INSERT INTO alerts (status, start_ms, end_ms) VALUES ('WARNING', 1000, 2000)")
+    conn.execute("PRAGMA user_version = 4")
+    conn.commit()
+
+    storage.migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == storage.SCHEMA_VERSION
+    for name, _ in storage.ROLLUPS:
+        assert conn.execute(f"SELECT bucket_ms, device_id, n FROM samples_{name}").fetchall() == [(60000, "esp32", 2)]
+    assert conn.execute("SELECT device_id, status FROM alerts").fetchall() == [("esp32", "WARNING")]
+    assert "device_id" in storage._columns(conn, "samples")
+
+
+def sample(ts_ms, status, device_id="esp32"):
+    return {"device_id": device_id, "ts_ms": ts_ms, "ts": None, "temperature": 25.0, "humidity": 50.0,
+            "button": 0, "abnormal_movement": 0, "sound_alert": 0, "person_present": 1, "status": status}
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "data.db")
+    storage.init_db(path)
+    return path
+
+
+def write(writer, conn, batch):
+    """What SampleWriter._flush does with a batch, without the thread"""
+    with conn:
+        conn.executemany(storage.INSERT_SAMPLE, batch)
+        writer._update_alerts(conn, batch)
+
+
+def alerts(conn):
+    return conn.execute("SELECT device_id, status, start_ms, end_ms FROM alerts ORDER BY id").fetchall()
+
+
+def test_alert_episode_opens_extends_and_closes(db):
+    writer, conn = storage.SampleWriter(db), storage.connect(db)
+    write(writer, conn, [sample(0, "NORMAL"), sample(1000, "WARNING"), sample(2000, "WARNING")])
+    assert alerts(conn) == [("esp32", "WARNING", 1000, 2000)]
+    assert writer.open_alerts["esp32"][1] == "WARNING"
+
+    # The next batch extends the same row, then a NORMAL sample closes it
+    write(writer, conn, [sample(3000, "WARNING"), sample(4000, "NORMAL"), sample(5000, "NORMAL")])
+    assert alerts(conn) == [("esp32", "WARNING", 1000, 4000)]
+    assert writer.open_alerts == {}
+
+
+def test_alert_status_change_starts_a_new_episode(db):
+    writer, conn = storage.SampleWriter(db), storage.connect(db)
+    write(writer, conn, [sample(1000, "WARNING"), sample(2000, "EMERGENCY"), sample(3000, "EMERGENCY"),
+                         sample(4000, "WARNING")])
+    assert alerts(conn) == [
+        ("esp32", "WARNING", 1000, 2000),
+        ("esp32", "EMERGENCY", 2000, 4000),
+        ("esp32", "WARNING", 4000, 4000),
+    ]
+
+
+def test_alert_episodes_are_per_device(db):
+    writer, conn = storage.SampleWriter(db), storage.connect(db)
+    write(writer, conn, [sample(1000, "WARNING", "a"), sample(1000, "NORMAL", "b"),
+                         sample(2000, "WARNING", "a"), sample(2000, "EMERGENCY", "b"),
+                         sample(3000, "NORMAL", "a"), sample(3000, "EMERGENCY", "b")])
+    assert alerts(conn) == [("a", "WARNING", 1000, 3000), ("b", "EMERGENCY", 2000, 3000)]
+    assert list(writer.open_alerts) == ["b"]
+
+
+def test_open_alert_is_resumed_after_restart(db):
+    conn = storage.connect(db)
+    write(storage.SampleWriter(db), conn, [sample(1000, "WARNING"), sample(2000, "WARNING"),
+                                           sample(2000, "EMERGENCY", "b"), sample(3000, "NORMAL", "b")])
+
+    restarted = storage.SampleWriter(db)
+    restarted._load_open_alerts(conn)
+    assert list(restarted.open_alerts) == ["esp32"]  # b's episode had already ended
+    write(restarted, conn, [sample(3000, "WARNING"), sample(4000, "NORMAL")])
+    assert alerts(conn) == [("esp32", "WARNING", 1000, 4000), ("b", "EMERGENCY", 2000, 3000)]
+
+
+def test_writer_thread_resumes_open_alert(db):
+    first = storage.SampleWriter(db, batch_size=1)
+    first.start()
+    for ts in (1000, 2000):
+        first.write(sample(ts, "EMERGENCY"))
+    first.stop()
+
+    second = storage.SampleWriter(db, batch_size=1)
+    second.start()
+    second.write(sample(3000, "EMERGENCY"))
+    second.stop()
+    assert alerts(storage.connect(db)) == [("esp32", "EMERGENCY", 1000, 3000)]
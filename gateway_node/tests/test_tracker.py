@@ -0,0 +1,60 @@
+import pytest
+
+from tracker import PersonTracker, iou
+
+BOX = (100, 100, 200, 300)
+MOVED = (110, 105, 210, 305)  # same person a frame later
+OTHER = (400, 100, 500, 300)
+
+
+def test_iou():
+    assert iou(BOX, BOX) == 1.0
+    assert iou(BOX, OTHER) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(1 / 3)
+
+
+def test_person_counts_after_enter_hits():
+    tracker = PersonTracker(enter_hits=3, exit_s=10.0)
+    tracker.update([BOX], 0.0)
+    tracker.update([MOVED], 0.5)
+    assert tracker.count == 0
+    tracker.update([BOX], 1.0)
+    assert tracker.count == 1
+
+
+def test_single_false_positive_never_counts():
+    tracker = PersonTracker(enter_hits=2, exit_s=1.0)
+    tracker.update([OTHER], 0.0)
+    tracker.update([], 0.5)
+    assert tracker.count == 0
+    tracker.update([], 2.0)
+    assert tracker.tracks == []
+
+
+def test_missed_detections_do_not_end_presence():
+    tracker = PersonTracker(enter_hits=2, exit_s=10.0)
+    tracker.update([BOX], 0.0)
+    tracker.update([BOX], 1.0)
+    for t in (2.0, 5.0, 11.0):
+        tracker.update([], t)
+        assert tracker.count == 1
+    tracker.update([], 11.5)  # more than exit_s since last matched at 1.0
+    assert tracker.count == 0
+
+
+def test_keep_alive_holds_confirmed_tracks_only():
+    tracker = PersonTracker(enter_hits=2, exit_s=5.0)
+    tracker.update([BOX], 0.0)
+    tracker.update([BOX, OTHER], 1.0)  # OTHER is still tentative
+    tracker.keep_alive(20.0)
+    assert tracker.count == 1
+    assert [t.box for t in tracker.tracks] == [BOX]
+
+
+def test_two_people_are_tracked_separately():
+    tracker = PersonTracker(enter_hits=2, exit_s=10.0)
+    tracker.update([BOX, OTHER], 0.0)
+    tracker.update([OTHER, MOVED], 1.0)
+    assert tracker.count == 2
+    assert tracker.tracks_started == 2
+    assert tracker.dwell_s(4.0) == 4.0
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+import vision_scheduler
+from vision_scheduler import DetectionScheduler
+
+
+@pytest.fixture
+def load(monkeypatch):
+    """Scripted system load: set load["cpu"] / load["temp"]"""
+    values = {"cpu": 10.0, "temp": 40.0}
+    monkeypatch.setattr(vision_scheduler.psutil, "cpu_percent", lambda *a: values["cpu"])
+    monkeypatch.setattr(vision_scheduler, "read_cpu_temperature", lambda: values["temp"])
+    return values
+
+
+def test_interval_follows_status(load):
+    scheduler = DetectionScheduler({"NORMAL": 0.5, "WARNING": 2.0, "EMERGENCY": None})
+    assert scheduler.interval() == 2.0
+    scheduler.set_status("WARNING")
+    assert scheduler.interval() == 0.5
+    scheduler.set_status("EMERGENCY")
+    assert scheduler.interval() == 0.0  # no cycle measured yet
+
+
+def test_backoff_doubles_up_to_max_and_recovers(load):
+    scheduler = DetectionScheduler({"NORMAL": 1.0}, cpu_budget=70.0, max_backoff=4)
+    load["cpu"] = 95.0
+    for expected in (2, 4, 4):
+        scheduler._check_budget(0.0)
+        assert scheduler.backoff == expected
+    assert scheduler.interval() == 4.0
+    assert scheduler.backoff_events == 2
+
+    load["cpu"] = 20.0
+    scheduler._check_budget(0.0)
+    assert scheduler.interval() == 2.0
+    scheduler._check_budget(0.0)
+    assert scheduler.interval() == 1.0
+
+
+def test_temperature_budget_backs_off(load):
+    scheduler = DetectionScheduler({"NORMAL": 1.0}, temp_budget_c=70.0)
+    load["temp"] = 80.0
+    scheduler._check_budget(0.0)
+    assert scheduler.interval() == 2.0
+    load["temp"] = None  # unreadable sensor does not count as over budget
+    scheduler._check_budget(0.0)
+    assert scheduler.interval() == 1.0
+
+
+def test_full_rate_backs_off_from_measured_cycle(load):
+    scheduler = DetectionScheduler({"EMERGENCY": None})
+    scheduler.set_status("EMERGENCY")
+    scheduler.frame_period = 0.05
+    assert scheduler.interval() == pytest.approx(0.05)
+    load["cpu"] = 95.0
+    scheduler._check_budget(0.0)
+    scheduler._check_budget(0.0)
+    assert scheduler.interval() == pytest.approx(0.2)
+
+
+def test_wait_measures_the_detection_cycle(load):
+    scheduler = DetectionScheduler({"NORMAL": None})
+    for _ in range(5):
+        assert scheduler.wait()
+        time.sleep(0.02)
+    assert 0.015 < scheduler.frame_period < 0.1
+
+
+def test_status_change_wakes_waiting_detector(load):
+    scheduler = DetectionScheduler({"NORMAL": 0.01, "EMERGENCY": None})
+    assert scheduler.wait()  # first detection runs at once, the next is 100 s away
+    woke = []
+    waiter = threading.Thread(target=lambda: woke.append(scheduler.wait()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not woke
+    scheduler.set_status("EMERGENCY")
+    waiter.join(1.0)
+    assert woke == [True]
+    scheduler.close()
+    assert scheduler.wait() is False
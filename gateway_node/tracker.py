@@ -0,0 +1,86 @@
+import itertools
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("track_id", "box", "first_seen", "last_seen", "hits")
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+
+
+class PersonTracker:
+    """Greedy IoU tracker with enter / exit hysteresis for person presence
+
+    A detection matching no live track starts a tentative track; it counts
+    as a person once it has been matched `enter_hits` times. A track is
+    dropped `exit_s` seconds after it was last matched, so a few missed
+    detections do not end presence. Frames skipped because nothing moved
+    call keep_alive(): an unchanged scene still contains whoever was in it.
+    """
+
+    def __init__(self, iou_threshold=0.3, enter_hits=2, exit_s=10.0):
+        self.iou_threshold = iou_threshold
+        self.enter_hits = enter_hits
+        self.exit_s = exit_s
+        self.tracks = []
+        self.ids = itertools.count(1)
+        self.tracks_started = 0
+
+    def update(self, boxes, now):
+        """Match one detection result [(x1, y1, x2, y2), ...] against the live tracks"""
+        pairs = sorted(((iou(t.box, b), ti, bi) for ti, t in enumerate(self.tracks) for bi, b in enumerate(boxes)),
+                       reverse=True)
+        used_tracks, used_boxes = set(), set()
+        for score, ti, bi in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+            track = self.tracks[ti]
+            track.box = boxes[bi]
+            track.last_seen = now
+            track.hits += 1
+        for bi, box in enumerate(boxes):
+            if bi not in used_boxes:
+                self.tracks.append(Track(next(self.ids), box, now))
+                self.tracks_started += 1
+        self.expire(now)
+
+    def keep_alive(self, now):
+        """The scene did not change: confirmed tracks stay where they were"""
+        for track in self.tracks:
+            if track.hits >= self.enter_hits:
+                track.last_seen = now
+        self.expire(now)
+
+    def expire(self, now):
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.exit_s]
+
+    def confirmed(self):
+        return [t for t in self.tracks if t.hits >= self.enter_hits]
+
+    @property
+    def count(self):
+        """People currently tracked (confirmed tracks)"""
+        return len(self.confirmed())
+
+    def dwell_s(self, now):
+        """How long the longest-present person has been tracked (0 if nobody)"""
+        return max((now - t.first_seen for t in self.confirmed()), default=0.0)
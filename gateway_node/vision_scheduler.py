@@ -0,0 +1,118 @@
+import threading
+import time
+
+import psutil
+
+
+def read_cpu_temperature():
+    """SoC temperature in °C, or None where it cannot be read"""
+    try:
+        sensors = psutil.sensors_temperatures()
+    except (AttributeError, OSError):
+        sensors = {}
+    for name in ("cpu_thermal", "coretemp", "k10temp"):
+        if sensors.get(name):
+            return sensors[name][0].current
+    try:
+        with open("/sys/class/thermal/thermal_zone0/temp") as f:
+            return int(f.read()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+class DetectionScheduler:
+    """Paces PersonDetector to a target rate per fusion status
+
+    rates: {status: frames/sec}; None means as fast as frames arrive.
+    Every `check_interval_s` the system CPU load and SoC temperature are
+    compared against their budgets: while either is over, the interval
+    between detections doubles (up to `max_backoff`x); once both are back
+    under budget it halves again. Full-rate statuses back off too: their
+    interval is the measured detection cycle time (a running average of
+    how long one frame takes), so x2 means half as many frames. A status change wakes a waiting detector
+    immediately, so escalating to WARNING never waits out a NORMAL interval.
+    """
+
+    def __init__(self, rates=None, cpu_budget=70.0, temp_budget_c=70.0, max_backoff=8, check_interval_s=2.0):
+        self.rates = rates or {"NORMAL": 0.5, "WARNING": None, "EMERGENCY": None}
+        self.cpu_budget = cpu_budget
+        self.temp_budget_c = temp_budget_c
+        self.max_backoff = max_backoff
+        self.check_interval_s = check_interval_s
+        self.cond = threading.Condition()
+        self.status = "NORMAL"
+        self.backoff = 1
+        self.last_run = 0.0
+        self.frame_period = 0.0  # running average of one detection cycle, seconds
+        self.next_check = 0.0
+        self.cpu = None
+        self.temp = None
+        self.closed = False
+        self.status_since = time.time()
+        # per status: [seconds spent, detections run]
+        self.stats = {status: [0.0, 0] for status in self.rates}
+        self.backoff_events = 0
+        psutil.cpu_percent(None)  # prime the system-wide counter
+
+    def set_status(self, status):
+        with self.cond:
+            if status == self.status: return
+            self._account(time.time())
+            self.status = status
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def interval(self):
+        """Seconds between detections for the current status and backoff"""
+        rate = self.rates.get(self.status)
+        base = 1.0 / rate if rate else self.frame_period
+        return base * self.backoff
+
+    def wait(self):
+        """Block until the next detection is due; False once closed"""
+        with self.cond:
+            if self.last_run:
+                # Time since the previous detection started = how long it took
+                cycle = time.time() - self.last_run
+                self.frame_period = cycle if not self.frame_period else 0.8 * self.frame_period + 0.2 * cycle
+            while not self.closed:
+                now = time.time()
+                if now >= self.next_check:
+                    self._check_budget(now)
+                delay = self.last_run + self.interval() - now
+                if delay <= 0:
+                    break
+                self.cond.wait(min(delay, max(0.0, self.next_check - now)))
+            if self.closed:
+                return False
+            self.last_run = time.time()
+            self.stats.setdefault(self.status, [0.0, 0])[1] += 1
+            return True
+
+    def _check_budget(self, now):
+        self.next_check = now + self.check_interval_s
+        self.cpu = psutil.cpu_percent(None)
+        self.temp = read_cpu_temperature()
+        over = self.cpu > self.cpu_budget or (self.temp is not None and self.temp > self.temp_budget_c)
+        if over and self.backoff < self.max_backoff:
+            self.backoff *= 2
+            self.backoff_events += 1
+            print(f"[VISION] Over budget (cpu={self.cpu:.0f}% temp={self.temp}), "
+                  f"detection interval x{self.backoff}")
+        elif not over and self.backoff > 1:
+            self.backoff //= 2
+
+    def _account(self, now):
+        self.stats.setdefault(self.status, [0.0, 0])[0] += now - self.status_since
+        self.status_since = now
+
+    def achieved_rates(self):
+        """{status: (target fps or None, achieved fps, seconds in status)}"""
+        with self.cond:
+            self._account(time.time())
+            return {status: (self.rates.get(status), runs / spent if spent else 0.0, spent)
+                    for status, (spent, runs) in self.stats.items() if spent}
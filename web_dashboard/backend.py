@@ -1,7 +1,10 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 import sqlite3
+import csv
+import io
 from datetime import datetime
 from dotenv import load_dotenv
 import os
@@ -9,12 +12,35 @@ import paho.mqtt.client as mqtt
 import threading
 import asyncio
 import json
-import time
 import sys
+import time
+import numpy as np
+
+# Shared DB schema and metrics live with the gateway (both processes use the same data.db)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gateway_node"))
+from storage import SCHEMA_VERSION, ROLLUPS, SELECT_ROLLUP, SAMPLE_COLUMNS
+import metrics
+from db import wait_for_schema, ReadPool, SELECT_DEVICES
+import downsample
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """Start up (see startup() at the end), then run the WebSocket broadcaster on the server's loop"""
+    global app_loop, broadcaster_wake
+    startup()
+    app_loop = asyncio.get_running_loop()
+    broadcaster_wake = asyncio.Event()
+    task = asyncio.create_task(broadcaster())
+    yield
+    task.cancel()
+    app_loop = None
+    if mqtt_client is not None:
+        mqtt_client.loop_stop()
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -29,9 +55,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # /api/history paging, read by the dashboard on another port
 )
 
 DB_PATH = os.getenv("DB_PATH", "/home/earnt/Final_Project/data.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))  # read-only connections = query worker threads
+db = None  # ReadPool, opened at startup
 
 # MQTT Config
 MQTT_BROKER = "localhost"
@@ -47,9 +76,16 @@ device_status = {
 }
 status_lock = threading.Lock()
 
-# WebSocket connections
+# WebSocket connections (only touched from the event loop)
 active_connections = []
-ws_lock = threading.Lock()
+app_loop = None          # the server's event loop, set by lifespan
+broadcaster_wake = None  # asyncio.Event: status changed or a client joined
+status_dirty = False     # device_status changed since the last push
+pending_states = {}      # device_id -> sensor_data message from pi/state/+, not yet pushed
+latest_states = {}       # device_id -> last sensor_data message (sent to new clients)
+last_state_time = 0.0    # when the gateway last published a state (0: never)
+BROADCAST_POLL_SECONDS = 0.05  # how often the broadcaster checks for new samples
+WS_SEND_TIMEOUT_SECONDS = 5    # a client slower than this is dropped
 
 # Track last seen timestamps for timeout detection
 last_seen = {
@@ -58,6 +94,29 @@ last_seen = {
 }
 TIMEOUT_SECONDS = 10  # Consider device offline after 10 seconds
 
+# History aggregates: use the finest rollup that keeps a response under this many buckets
+MAX_HISTORY_BUCKETS = 1500
+MAX_HISTORY_PAGE = 5000   # rows per /api/history page
+MAX_LIST_ROWS = 1000      # /api/alerts, /api/events limit upper bound
+EXPORT_CHUNK_ROWS = 2000  # rows per query when streaming an export
+MAX_CHART_POINTS = 1000   # /api/history?points= upper bound
+CHART_SERIES = ("temperature", "humidity")  # columns whose shape downsampling preserves
+CHART_FIELDS = "ts_ms,temperature,humidity,status"  # default fields of a downsampled row
+CHART_DEFAULT_SPAN_MS = 24 * 60 * 60 * 1000  # points= without from/to: the last day
+MAX_RAW_CHART_SPAN_MS = 6 * 60 * 60 * 1000   # longer points= ranges are charted from rollups
+ROLLUP_CHART_FIELDS = ("ts_ms", "temperature", "humidity", "status", "person_present", "sound_alert")
+STATUS_CODES = {"NORMAL": 0, "WARNING": 1, "EMERGENCY": 2}
+
+# Metrics (served on /metrics)
+MQTT_HANDLER_MS = metrics.histogram("backend_mqtt_handler_ms", "MQTT bridge on_message handling time")
+WS_SEND_MS = metrics.histogram("backend_ws_send_ms", "WebSocket send_text time per client")
+DB_QUERY_MS = metrics.histogram("db_read_query_ms", "ReadPool query time (connection wait + execute + fetch)")
+MQTT_MESSAGES = metrics.counter("backend_mqtt_messages", "MQTT messages handled by the bridge")
+LIVE_STATES = metrics.counter("backend_live_states", "Gateway states received on pi/state/+")
+BAD_STATES = metrics.counter("backend_bad_states", "Malformed pi/state/+ messages dropped")
+WS_BROADCASTS = metrics.counter("backend_ws_broadcasts", "Messages pushed to all WebSocket clients")
+metrics.gauge("backend_ws_clients", "Connected WebSocket clients", func=lambda: len(active_connections))
+
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
@@ -67,19 +126,31 @@ def on_connect(client, userdata, flags, rc, properties=None):
         client.subscribe("esp32/control")
         client.subscribe("pi/control")
         client.subscribe("esp32/data")  # Subscribe to data to detect ESP32 activity
+        client.subscribe("esp32/+/status")  # Multi-node gateways: esp32/<device_id>/...
+        client.subscribe("esp32/+/data")
+        client.subscribe("pi/state/+")  # fused samples from the gateway (retained)
     else:
         print(f"[MQTT Bridge] Connection failed rc={rc}")
 
 def on_message(client, userdata, msg):
+    with MQTT_HANDLER_MS.time():
+        handle_message(client, userdata, msg)
+    MQTT_MESSAGES.inc()
+
+def handle_message(client, userdata, msg):
     global device_status, last_seen
     topic = msg.topic
+    if topic.startswith("pi/state/"):
+        handle_state(topic[len("pi/state/"):], msg.payload)
+        return
     payload = msg.payload.decode()
     
     changed = False
     with status_lock:
         old_status = device_status.copy()
         
-        if topic == "esp32/status":
+        # Any sensor node counts as ESP32 activity
+        if topic.startswith("esp32/") and topic.endswith("/status"):
             new_val = (payload.lower() == "true" or payload == "1")
             if device_status["esp32_online"] != new_val:
                 device_status["esp32_online"] = new_val
@@ -87,7 +158,7 @@ def on_message(client, userdata, msg):
                 print(f"[MQTT Bridge] ESP32 status: {'ONLINE' if new_val else 'OFFLINE'}")
             last_seen["esp32"] = time.time()
             
-        elif topic == "esp32/data":
+        elif topic.startswith("esp32/") and topic.endswith("/data"):
             # ESP32 is sending data, so it's online
             if not device_status["esp32_online"]:
                 device_status["esp32_online"] = True
@@ -117,6 +188,41 @@ def on_message(client, userdata, msg):
                 changed = True
                 print(f"[MQTT Bridge] Pi control: {'ENABLED' if new_val else 'DISABLED'}")
 
+    if changed:
+        notify_status_change()
+
+def handle_state(device_id, payload):
+    """Fan a gateway-fused sample out to WebSocket clients without touching the DB
+
+    The payload has the samples-row fields. It is checked (a JSON object for
+    this device with every SAMPLE_COLUMNS field and a known status), trimmed
+    to those fields and serialized once here; each client gets that string.
+    Anything else on the topic is logged and dropped.
+    """
+    global last_state_time
+    if not payload:
+        return  # retained state cleared
+    try:
+        state = json.loads(payload.decode())
+    except (UnicodeDecodeError, ValueError) as e:
+        BAD_STATES.inc()
+        print(f"[MQTT Bridge] Dropped pi/state/{device_id}: not JSON ({e})")
+        return
+    if (not isinstance(state, dict) or not all(c in state for c in SAMPLE_COLUMNS)
+            or state["device_id"] != device_id or not isinstance(state["status"], str)
+            or state["status"] not in STATUS_CODES):
+        BAD_STATES.inc()
+        print(f"[MQTT Bridge] Dropped pi/state/{device_id}: not a sample for this device")
+        return
+    message = json.dumps({"type": "sensor_data", "data": {c: state[c] for c in SAMPLE_COLUMNS}},
+                         separators=(",", ":"))
+    last_state_time = time.time()
+    LIVE_STATES.inc()
+    if app_loop is not None:
+        app_loop.call_soon_threadsafe(queue_state, device_id, message)
+    else:
+        latest_states[device_id] = message
+
 # Timeout checker thread
 def check_device_timeouts():
     global device_status
@@ -139,6 +245,9 @@ def check_device_timeouts():
                 changed = True
                 print(f"[TIMEOUT] Pi marked offline (no activity for {TIMEOUT_SECONDS}s)")
 
+        if changed:
+            notify_status_change()
+
 # Initialize MQTT
 def init_mqtt():
     global mqtt_client
@@ -152,96 +261,119 @@ def init_mqtt():
     mqtt_client.loop_start()
     print("[MQTT Bridge] Started MQTT client")
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# WebSocket broadcast functions
-async def broadcast_device_status():
-    with ws_lock:
-        if not active_connections:
-            return
-        
-        message = json.dumps({
-            "type": "device_status",
-            "data": device_status
-        })
-        
-        disconnected = []
-        for ws in active_connections:
-            try:
-                await ws.send_text(message)
-            except:
-                disconnected.append(ws)
-        
-        for ws in disconnected:
+# WebSocket push (runs on the server's event loop, started by lifespan)
+async def send_timed(ws, message):
+    with WS_SEND_MS.time():
+        await ws.send_text(message)
+
+async def broadcast(message):
+    """Send one already-serialized message to every client; drop clients that fail"""
+    clients = list(active_connections)
+    results = await asyncio.gather(*(asyncio.wait_for(send_timed(ws, message), WS_SEND_TIMEOUT_SECONDS)
+                                     for ws in clients), return_exceptions=True)
+    for ws, result in zip(clients, results):
+        if isinstance(result, Exception) and ws in active_connections:
             active_connections.remove(ws)
-
-async def broadcast_latest_data():
-    with ws_lock:
-        if not active_connections:
-            return
-    
+    WS_BROADCASTS.inc()
+
+def mark_status_dirty():
+    global status_dirty
+    status_dirty = True
+    broadcaster_wake.set()
+
+def queue_state(device_id, message):
+    latest_states[device_id] = message
+    pending_states[device_id] = message  # a newer state for the device replaces an unsent one
+    broadcaster_wake.set()
+
+def notify_status_change():
+    """Wake the broadcaster after device_status changed (safe from any thread)"""
+    if app_loop is not None:
+        app_loop.call_soon_threadsafe(mark_status_dirty)
+
+async def broadcaster():
+    """Push device status and the newest samples to clients when they change
+
+    Samples normally arrive from the gateway's pi/state/+ topic and are sent
+    straight from memory. Only while the gateway has published none for
+    TIMEOUT_SECONDS (an older gateway, or it is down) are new rows picked up
+    from the database instead: PRAGMA data_version on a dedicated connection
+    (it changes whenever another connection commits) is a microsecond check,
+    polled every BROADCAST_POLL_SECONDS while clients are connected. With
+    nobody watching the task sleeps until a client joins or something changes.
+    """
+    global status_dirty
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    last_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    row = conn.execute("SELECT id FROM samples ORDER BY ts_ms DESC LIMIT 1").fetchone()
+    last_id = row[0] if row else None  # new clients get this one from websocket_endpoint
+    print("[WebSocket] Broadcaster started", flush=True)
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM samples ORDER BY ts DESC LIMIT 1")
-        row = cur.fetchone()
+        while True:
+            # Sleep until woken; poll the DB only while someone is watching and the gateway is quiet
+            live = time.time() - last_state_time < TIMEOUT_SECONDS
+            poll = TIMEOUT_SECONDS if live else BROADCAST_POLL_SECONDS
+            timer = app_loop.call_later(poll, broadcaster_wake.set) if active_connections else None
+            await broadcaster_wake.wait()
+            broadcaster_wake.clear()
+            if timer: timer.cancel()
+
+            if status_dirty:
+                status_dirty = False
+                with status_lock:
+                    message = json.dumps({"type": "device_status", "data": device_status})
+                if active_connections:
+                    await broadcast(message)
+
+            if pending_states:
+                messages = list(pending_states.values())
+                pending_states.clear()
+                if active_connections:
+                    for message in messages:
+                        await broadcast(message)
+
+            if not active_connections or time.time() - last_state_time < TIMEOUT_SECONDS:
+                continue
+            try:
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version == last_version:
+                    continue
+                last_version = version
+                row = await db.one("SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 1")
+            except Exception as e:
+                print(f"[WebSocket] Broadcast error: {e}")
+                continue
+            if row and row["id"] != last_id:
+                last_id = row["id"]
+                await broadcast(json.dumps({"type": "sensor_data", "data": row}))
+    finally:
         conn.close()
-        
-        if row:
-            message = json.dumps({
-                "type": "sensor_data",
-                "data": dict(row)
-            })
-            
-            disconnected = []
-            with ws_lock:
-                for ws in active_connections:
-                    try:
-                        await ws.send_text(message)
-                    except:
-                        disconnected.append(ws)
-                
-                for ws in disconnected:
-                    active_connections.remove(ws)
-    except Exception as e:
-        print(f"[WebSocket] Broadcast error: {e}")
-
-# Periodic broadcast thread
-def periodic_broadcast_worker():
-    print("[WebSocket] Periodic broadcast task started")
-    while True:
-        time.sleep(1)  # Broadcast every 1 second
-        asyncio.run(broadcast_latest_data())
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    with ws_lock:
-        active_connections.append(websocket)
+    active_connections.append(websocket)
+    broadcaster_wake.set()  # start watching for new samples
     print(f"[WebSocket] Client connected. Total: {len(active_connections)}")
     
     # Send initial device status
     with status_lock:
-        await websocket.send_text(json.dumps({
+        message = json.dumps({
             "type": "device_status",
-            "data": device_status.copy()
-        }))
+            "data": device_status
+        })
+    await websocket.send_text(message)
     
-    # Send initial sensor data
+    # Send initial sensor data (the gateway's latest states, else the newest row)
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM samples ORDER BY ts DESC LIMIT 1")
-        row = cur.fetchone()
-        conn.close()
+        for message in list(latest_states.values()):
+            await websocket.send_text(message)
+        row = None if latest_states else await db.one("SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 1")
         
         if row:
             await websocket.send_text(json.dumps({
                 "type": "sensor_data",
-                "data": dict(row)
+                "data": row
             }))
     except Exception as e:
         print(f"[WebSocket] Error sending initial data: {e}")
@@ -250,11 +382,15 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        with ws_lock:
-            if websocket in active_connections:
-                active_connections.remove(websocket)
+        if websocket in active_connections:
+            active_connections.remove(websocket)
         print(f"[WebSocket] Client disconnected. Total: {len(active_connections)}")
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/api/device-status")
 def get_device_status():
     with status_lock:
@@ -289,66 +425,342 @@ def control_servo(turn_on: bool):
     return {"success": False, "error": "MQTT not connected"}
 
 @app.get("/api/latest")
-def get_latest():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM samples ORDER BY ts DESC LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
+async def get_latest(device_id: str = None):
+    if device_id is None:
+        row = await db.one("SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 1")
+    else:
+        row = await db.one("SELECT * FROM samples WHERE device_id = ? ORDER BY ts_ms DESC LIMIT 1", (device_id,))
 
     if not row:
         return JSONResponse({"error": "no data"}, status_code=404)
 
-    return dict(row)
+    return row
+
+@app.get("/api/devices")
+async def get_devices():
+    """Sensor nodes that have logged samples, with their last sample time"""
+    return await db.all(SELECT_DEVICES)
+
+def history_columns(fields):
+    """Comma-separated fields (None: all) -> sample columns, id and ts_ms always first"""
+    columns = ["id"] + list(SAMPLE_COLUMNS)
+    if not fields:
+        return columns
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in columns]
+    if unknown:
+        raise ValueError(f"unknown fields {unknown}, expected some of {columns}")
+    return ["id", "ts_ms"] + [f for f in wanted if f not in ("id", "ts_ms")]
+
+def history_query(fields, device_id, from_ms, to_ms, cursor, order, limit):
+    """SELECT for one page of samples, keyset-paginated on (ts_ms, id)
+
+    fields: comma-separated columns or None for all; id and ts_ms are always
+    included (the cursor is built from them). cursor: "ts_ms,id" of the last
+    row of the previous page. Raises ValueError on bad input.
+    """
+    columns = history_columns(fields)
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+
+    where, params = [], {"limit": limit}
+    if device_id is not None:
+        where.append("device_id = :device_id")
+        params["device_id"] = device_id
+    if from_ms is not None:
+        where.append("ts_ms >= :from_ms")
+        params["from_ms"] = from_ms
+    if to_ms is not None:
+        where.append("ts_ms <= :to_ms")
+        params["to_ms"] = to_ms
+    if cursor:
+        try:
+            params["cursor_ts"], params["cursor_id"] = (int(v) for v in cursor.split(","))
+        except ValueError:
+            raise ValueError("cursor must be \"ts_ms,id\" from X-Next-Cursor")
+        where.append(f"(ts_ms, id) {'>' if order == 'asc' else '<'} (:cursor_ts, :cursor_id)")
+
+    sql = (f"SELECT {', '.join(columns)} FROM samples"
+           + (f" WHERE {' AND '.join(where)}" if where else "")
+           + f" ORDER BY ts_ms {order}, id {order} LIMIT :limit")
+    return sql, params
+
+def next_cursor(row):
+    return f"{row['ts_ms']},{row['id']}"
+
+def chart_columns(fields):
+    """Columns of a downsampled row: `fields` (default CHART_FIELDS), id only if asked for"""
+    columns = history_columns(fields or CHART_FIELDS)
+    wanted = [f.strip() for f in (fields or CHART_FIELDS).split(",")]
+    return [c for c in columns if c != "id" or "id" in wanted]
+
+def columnar(rows, columns):
+    """Rows -> {column: [values]}, the compact shape of a chart response"""
+    return {c: [r[c] for r in rows] for c in columns}
+
+def downsampled_history(conn, fields, device_id, from_ms, to_ms, points, method):
+    """About `points` raw samples of one device that keep the shape of the range (oldest first, columnar)
+
+    Only ts_ms, status and the numeric chart columns of the range are read,
+    chunk by chunk, into NumPy arrays; downsample.select() picks the rows
+    (LTTB or per-bucket min/max, plus both sides of every status change)
+    and just those are fetched with the requested fields. The range is at
+    most MAX_RAW_CHART_SPAN_MS, which bounds the arrays.
+    """
+    columns = chart_columns(fields)
+    series = [c for c in columns if c in CHART_SERIES]
+    sql, params = history_query(",".join(["status"] + series), device_id, from_ms, to_ms, None, "asc", -1)
+    cur = conn.execute(sql, params)
+    ids, ts, codes, ys = [], [], [], [[] for _ in series]
+    status_codes = {}
+    while True:
+        chunk = cur.fetchmany(EXPORT_CHUNK_ROWS)
+        if not chunk:
+            break
+        cols = list(zip(*chunk))  # id, ts_ms, status, series...
+        ids.append(np.array(cols[0], dtype=np.int64))
+        ts.append(np.array(cols[1], dtype=float))
+        codes.append(np.array([status_codes.setdefault(v, len(status_codes)) for v in cols[2]], dtype=np.int16))
+        for values, col in zip(ys, cols[3:]):
+            values.append(np.array(col, dtype=float))  # NULL -> NaN
+    if not ids:
+        return columnar([], columns)
+
+    keep = downsample.select(np.concatenate(ts), [np.concatenate(v) for v in ys], np.concatenate(codes),
+                             points, method)
+    selected = np.concatenate(ids)[keep].tolist()
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM samples WHERE id IN ({', '.join('?' * len(selected))}) "
+                        f"ORDER BY ts_ms, id", selected).fetchall()
+    return columnar(rows, columns)
+
+def downsampled_rollup(conn, fields, device_id, from_ms, to_ms, points, method, resolution):
+    """About `points` rollup buckets of one device, shaped like samples rows (oldest first, columnar)
+
+    For ranges too long to chart from raw rows. A bucket becomes a row with
+    ts_ms = bucket start, temperature / humidity = bucket mean (to 0.01), status = the
+    most severe status seen in it, person_present / sound_alert = fraction
+    of samples; other fields are left out. Then selected as in
+    downsampled_history().
+    """
+    columns = [c for c in chart_columns(fields) if c in ROLLUP_CHART_FIELDS]
+    width = dict(ROLLUPS)[resolution]
+    buckets = [dict(r) for r in conn.execute(SELECT_ROLLUP.format(name=resolution),
+                                             {"from_ms": from_ms - from_ms % width, "to_ms": to_ms,
+                                              "device_id": device_id})]
+    if not buckets:
+        return columnar([], columns)
+    rows = [{
+        "ts_ms": b["bucket_ms"],
+        "temperature": round_or_none(b["temperature_mean"], 2),
+        "humidity": round_or_none(b["humidity_mean"], 2),
+        "status": "EMERGENCY" if b["emergency_count"] else "WARNING" if b["warning_count"] else "NORMAL",
+        "person_present": round_or_none(b["person_present"], 3),
+        "sound_alert": round_or_none(b["sound_alert"], 3),
+    } for b in buckets]
+
+    codes = np.array([STATUS_CODES[r["status"]] for r in rows], dtype=np.int16)
+    series = [np.array([r[c] for r in rows], dtype=float) for c in columns if c in CHART_SERIES]
+    keep = downsample.select(np.array([r["ts_ms"] for r in rows], dtype=float), series, codes, points, method)
+    return columnar([rows[i] for i in keep.tolist()], columns)
+
+def round_or_none(value, digits):
+    return None if value is None else round(value, digits)
 
 @app.get("/api/history")
-def get_history():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM samples ORDER BY ts DESC LIMIT 100")
-    rows = cur.fetchall()
-    conn.close()
-
-    return [dict(r) for r in rows]
-
-# Startup initialization
-print("[STARTUP] Initializing backend...", flush=True)
-
-# Delete old database and create fresh one
-if os.path.exists(DB_PATH):
-    os.remove(DB_PATH)
-    print("[DB] Deleted old database", flush=True)
-
-# Create new database
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-cur.execute("""
-CREATE TABLE IF NOT EXISTS samples (
-    ts TEXT,
-    temperature REAL,
-    humidity REAL,
-    button INTEGER,
-    abnormal_movement INTEGER,
-    sound_alert INTEGER,
-    person_present INTEGER,
-    status TEXT
-)
-""")
-conn.commit()
-conn.close()
-print("[DB] Created fresh database", flush=True)
-
-# Start MQTT client
-init_mqtt()
-
-# Start timeout checker thread
-timeout_thread = threading.Thread(target=check_device_timeouts, daemon=True)
-timeout_thread.start()
-print("[TIMEOUT] Started device timeout checker", flush=True)
+async def get_history(
+    device_id: str = None,
+    from_ms: int = Query(None, alias="from"),
+    to_ms: int = Query(None, alias="to"),
+    cursor: str = None,
+    fields: str = None,
+    order: str = "desc",
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_PAGE),
+    points: int = Query(None, ge=3, le=MAX_CHART_POINTS),
+    method: str = "lttb",
+):
+    """Raw samples, newest first by default
+
+    `from` / `to` are epoch milliseconds (inclusive). When the page is full
+    the X-Next-Cursor header holds the cursor for the next page.
+
+    With `points` one device's range (default: the last 24 hours) is
+    downsampled for a chart instead: about that many points, oldest first,
+    picked with `method` lttb or minmax on temperature / humidity, and
+    every status change kept. The response is columnar,
+    {"resolution": ..., "ts_ms": [...], "temperature": [...], ...}, with
+    `fields` defaulting to CHART_FIELDS; ranges over MAX_RAW_CHART_SPAN_MS
+    are charted from the rollup tables (bucket means) and "resolution" says
+    which: raw, 1m, 1h or 1d. A point with the default fields is about 35
+    bytes, so points=200 is about 7 KB and the MAX_CHART_POINTS maximum
+    about 35 KB (up to twice that with every field).
+    """
+    if points is not None:
+        if cursor:
+            return JSONResponse({"error": "points cannot be combined with cursor"}, status_code=400)
+        if device_id is None:
+            return JSONResponse({"error": "points needs a device_id (see /api/devices)"}, status_code=400)
+        if method not in ("lttb", "minmax"):
+            return JSONResponse({"error": "method must be lttb or minmax"}, status_code=400)
+        try:
+            chart_columns(fields)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        if to_ms is None:
+            to_ms = int(time.time() * 1000)
+        if from_ms is None:
+            from_ms = to_ms - CHART_DEFAULT_SPAN_MS
+        if from_ms > to_ms:
+            return JSONResponse({"error": "from must be <= to"}, status_code=400)
+
+        if to_ms - from_ms <= MAX_RAW_CHART_SPAN_MS:
+            resolution = "raw"
+            chart = await db.call(downsampled_history, fields, device_id, from_ms, to_ms, points, method)
+        else:
+            resolution = pick_rollup(to_ms - from_ms)
+            chart = await db.call(downsampled_rollup, fields, device_id, from_ms, to_ms, points, method, resolution)
+        return {"resolution": resolution, **chart}
 
-# Start periodic broadcast in background thread
-broadcast_thread = threading.Thread(target=periodic_broadcast_worker, daemon=True)
-broadcast_thread.start()
-print("[WebSocket] Started periodic broadcast thread", flush=True)
-print("[STARTUP] Backend ready!", flush=True)
+    try:
+        sql, params = history_query(fields, device_id, from_ms, to_ms, cursor, order, limit)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    rows = await db.all(sql, params)
+    headers = {"X-Next-Cursor": next_cursor(rows[-1])} if len(rows) == limit else {}
+    return JSONResponse(rows, headers=headers)
+
+def export_chunk(conn, sql, params, fmt, header):
+    """Encode one chunk of rows -> (bytes, cursor of its last row or None)"""
+    cur = conn.execute(sql, params)
+    rows = cur.fetchall()
+    if not rows:
+        return b"", None
+    names = [d[0] for d in cur.description]
+    out = io.StringIO()
+    if fmt == "csv":
+        w = csv.writer(out)
+        if header:
+            w.writerow(names)
+        w.writerows(rows)
+    else:
+        for r in rows:
+            out.write(json.dumps(dict(zip(names, r)), separators=(",", ":")))
+            out.write("\n")
+    last = dict(zip(names, rows[-1]))
+    return out.getvalue().encode(), (next_cursor(last) if len(rows) == params["limit"] else None)
+
+@app.get("/api/history/export")
+async def export_history(
+    format: str = "ndjson",
+    device_id: str = None,
+    from_ms: int = Query(None, alias="from"),
+    to_ms: int = Query(None, alias="to"),
+    fields: str = None,
+):
+    """Stream raw samples oldest first as NDJSON or CSV
+
+    Rows are read EXPORT_CHUNK_ROWS at a time by keyset cursor, each chunk
+    a short query of its own, and written out before the next is read, so
+    memory stays flat however long the range (and the gateway's writer is
+    never held up by one long read).
+    """
+    if format not in ("ndjson", "csv"):
+        return JSONResponse({"error": "format must be ndjson or csv"}, status_code=400)
+    try:
+        history_query(fields, device_id, from_ms, to_ms, None, "asc", EXPORT_CHUNK_ROWS)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
+    async def chunks():
+        cursor, header = None, True
+        while True:
+            sql, params = history_query(fields, device_id, from_ms, to_ms, cursor, "asc", EXPORT_CHUNK_ROWS)
+            data, cursor = await db.call(export_chunk, sql, params, format, header)
+            header = False
+            if data:
+                yield data
+            if cursor is None:
+                return
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"samples-{device_id or 'all'}.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(chunks(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/api/alerts")
+async def get_alerts(limit: int = Query(100, ge=1, le=MAX_LIST_ROWS)):
+    """Most recent WARNING / EMERGENCY episodes (never pruned)"""
+    return await db.all("SELECT * FROM alerts ORDER BY start_ms DESC LIMIT ?", (limit,))
+
+@app.get("/api/events")
+async def get_events(limit: int = Query(100, ge=1, le=MAX_LIST_ROWS), device_id: str = None):
+    """Most recent EMERGENCY clips (one row per camera)"""
+    return await db.all("SELECT * FROM events WHERE (? IS NULL OR device_id = ?) ORDER BY ts_ms DESC LIMIT ?",
+                        (device_id, device_id, limit))
+
+@app.get("/api/events/{event_id}/clip")
+async def get_event_clip(event_id: int):
+    """The event's clip file (MJPEG AVI); JPEG-directory clips are listed by path only"""
+    row = await db.one("SELECT clip_path FROM events WHERE id = ?", (event_id,))
+    if row is None or not row["clip_path"] or not os.path.isfile(row["clip_path"]):
+        return JSONResponse({"error": "clip not found"}, status_code=404)
+    return FileResponse(row["clip_path"], media_type="video/x-msvideo")
+
+def pick_rollup(span_ms):
+    """Finest rollup resolution whose bucket count for span_ms fits MAX_HISTORY_BUCKETS"""
+    for name, width in ROLLUPS:
+        if span_ms / width <= MAX_HISTORY_BUCKETS:
+            return name
+    return ROLLUPS[-1][0]
+
+@app.get("/api/history/aggregate")
+async def get_history_aggregate(
+    from_ms: int = Query(None, alias="from"),
+    to_ms: int = Query(None, alias="to"),
+    resolution: str = "auto",
+    device_id: str = None,
+):
+    """Min/mean/max and status counts per bucket from the rollup tables
+
+    `from` / `to` are epoch milliseconds (default: the last 24 hours).
+    Without `device_id` the buckets of all sensor nodes are merged.
+    """
+    if to_ms is None:
+        to_ms = int(time.time() * 1000)
+    if from_ms is None:
+        from_ms = to_ms - 24 * 60 * 60 * 1000
+    if from_ms > to_ms:
+        return JSONResponse({"error": "from must be <= to"}, status_code=400)
+
+    if resolution == "auto":
+        resolution = pick_rollup(to_ms - from_ms)
+    elif resolution not in dict(ROLLUPS):
+        return JSONResponse({"error": f"resolution must be auto or one of {[n for n, _ in ROLLUPS]}"},
+                            status_code=400)
+
+    # Include the bucket that contains `from`
+    width = dict(ROLLUPS)[resolution]
+    rows = await db.all(SELECT_ROLLUP.format(name=resolution),
+                        {"from_ms": from_ms - from_ms % width, "to_ms": to_ms, "device_id": device_id})
+
+    return {"resolution": resolution, "from": from_ms, "to": to_ms, "device_id": device_id,
+            "buckets": rows}
+
+# Startup initialization (called by lifespan, so importing this module has no side effects)
+def startup():
+    global db
+    print("[STARTUP] Initializing backend...", flush=True)
+
+    # The gateway creates / migrates the database; the backend only reads it
+    wait_for_schema(DB_PATH, SCHEMA_VERSION)
+    db = ReadPool(DB_PATH, size=DB_POOL_SIZE, query_ms=DB_QUERY_MS)
+    metrics.gauge("db_read_pool_idle", "Idle read-only connections", func=db.idle.qsize)
+    print(f"[DB] Database ready ({DB_POOL_SIZE} read-only connections)", flush=True)
+
+    # Start MQTT client
+    init_mqtt()
+
+    # Start timeout checker thread
+    timeout_thread = threading.Thread(target=check_device_timeouts, daemon=True)
+    timeout_thread.start()
+    print("[TIMEOUT] Started device timeout checker", flush=True)
+    print("[STARTUP] Backend ready!", flush=True)
@@ -0,0 +1,146 @@
+"""Benchmark: dashboard API latency and throughput under many concurrent clients
+
+HTTP mode drives a running backend: each client is a thread with its own
+keep-alive connection requesting the given paths round-robin, as fast as
+the server answers. --direct skips the server and compares the old
+connect-per-query access with ReadPool at the same concurrency on a
+database file.
+
+    python bench_backend.py --url http://127.0.0.1:8000 --clients 50 --duration 20
+    python bench_backend.py --direct --db /path/to/data.db --clients 50
+"""
+import argparse
+import http.client
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from db import ReadPool, SELECT_DEVICES
+
+DEFAULT_PATHS = "/api/latest,/api/history,/api/devices,/api/alerts,/api/history/aggregate"
+
+# What the HTTP handlers run, for --direct
+QUERIES = [
+    ("latest", "SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 1", ()),
+    ("history", "SELECT * FROM samples ORDER BY ts_ms DESC LIMIT 100", ()),
+    ("devices", SELECT_DEVICES, ()),
+    ("alerts", "SELECT * FROM alerts ORDER BY start_ms DESC LIMIT 100", ()),
+]
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def drive(clients, duration, request):
+    """Run request(client index, i) from `clients` threads -> ({name: [ms]}, errors, wall seconds)"""
+    timings, errors = {}, [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        local, i = {}, 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                name = request(index, i)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            finally:
+                i += 1
+            local.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        with lock:
+            for name, values in local.items():
+                timings.setdefault(name, []).extend(values)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(clients)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return timings, errors[0], time.perf_counter() - start
+
+
+def report(title, timings, errors, wall):
+    total = sum(len(v) for v in timings.values())
+    print(f"\n{title}: {total / wall:.1f} req/s, {errors} errors")
+    print(f"   {'request':<28} {'n':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(timings.items()):
+        values.sort()
+        print(f"   {name:<28} {len(values):>7} {percentile(values, 0.5):>8.2f} {percentile(values, 0.95):>8.2f} "
+              f"{percentile(values, 0.99):>8.2f} {values[-1]:>8.2f}")
+
+
+def bench_http(args):
+    url = urlparse(args.url)
+    paths = args.paths.split(",")
+    conns = {}
+
+    def request(index, i):
+        conn = conns.get(index)
+        if conn is None:
+            conn = conns[index] = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        path = paths[(index + i) % len(paths)]
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+        except Exception:
+            conn.close()
+            conns.pop(index, None)
+            raise
+        if resp.status >= 500:
+            raise RuntimeError(resp.status)
+        return path
+
+    timings, errors, wall = drive(args.clients, args.duration, request)
+    report(f"HTTP {args.url}, {args.clients} clients", timings, errors, wall)
+
+
+def bench_direct(args):
+    def per_query(index, i):
+        name, sql, params = QUERIES[(index + i) % len(QUERIES)]
+        conn = sqlite3.connect(args.db)
+        conn.row_factory = sqlite3.Row
+        [dict(r) for r in conn.execute(sql, params)]
+        conn.close()
+        return name
+
+    pool = ReadPool(args.db, size=args.pool_size)
+
+    def pooled(index, i):
+        name, sql, params = QUERIES[(index + i) % len(QUERIES)]
+        pool.executor.submit(pool.fetchall, sql, params).result()
+        return name
+
+    for title, request in ((f"connect per query, {args.clients} clients", per_query),
+                           (f"ReadPool({args.pool_size}), {args.clients} clients", pooled)):
+        timings, errors, wall = drive(args.clients, args.duration, request)
+        report(title, timings, errors, wall)
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--paths", default=DEFAULT_PATHS, help="comma-separated GET paths")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--direct", action="store_true", help="query the database file without the server")
+    parser.add_argument("--db", default=os.getenv("DB_PATH"), help="database for --direct")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.direct:
+        if not args.db:
+            parser.error("--direct needs --db (or DB_PATH)")
+        bench_direct(args)
+    else:
+        bench_http(args)
+
+
+if __name__ == "__main__":
+    main()
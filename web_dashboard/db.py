@@ -0,0 +1,113 @@
+"""Read side of the shared data.db for the dashboard backend
+
+The gateway owns the database (schema, migrations, writes; see
+gateway_node/storage.py). The backend only waits for it to be ready and
+reads it through a pool of read-only connections.
+"""
+import asyncio
+import contextlib
+import queue
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Devices with their newest sample (/api/devices). A skip-scan of idx_samples_device_ts,
+# one index seek per device for the next device_id and one for its newest ts_ms,
+# instead of a GROUP BY over every row.
+SELECT_DEVICES = """
+WITH RECURSIVE devices(device_id) AS (
+    SELECT MIN(device_id) FROM samples
+    UNION ALL
+    SELECT (SELECT MIN(device_id) FROM samples WHERE device_id > devices.device_id)
+    FROM devices WHERE device_id IS NOT NULL
+)
+SELECT device_id, (SELECT MAX(ts_ms) FROM samples WHERE samples.device_id = devices.device_id) AS last_ts_ms
+FROM devices WHERE device_id IS NOT NULL
+ORDER BY device_id
+"""
+
+
+class ReadPool:
+    """A few long-lived read-only connections, used from a bounded executor
+
+    Connections are opened once read-only (mode=ro) with a large page cache /
+    mmap window, and handed out one per query, so handlers skip the
+    connect + schema load each time. Queries run on `size` worker threads;
+    the async wrappers await them without blocking the event loop.
+    """
+
+    def __init__(self, db_path, size=4, mmap_mb=64, cache_mb=16, query_ms=None):
+        """query_ms: a metrics histogram timing each query (connection wait + execute + fetch)"""
+        self.db_path = db_path
+        self.size = size
+        self.query_ms = query_ms
+        self.idle = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout = 5000")
+            conn.execute(f"PRAGMA mmap_size = {mmap_mb * 1024 * 1024}")
+            conn.execute(f"PRAGMA cache_size = {-cache_mb * 1024}")  # negative = KiB
+            self.idle.put(conn)
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db-read")
+
+    def run(self, fn, *args):
+        """fn(conn, *args) on a pooled connection (blocking; used by the executor)"""
+        with self.query_ms.time() if self.query_ms else contextlib.nullcontext():
+            conn = self.idle.get()
+            try:
+                return fn(conn, *args)
+            finally:
+                self.idle.put(conn)
+
+    def fetchall(self, sql, params=()):
+        return self.run(lambda conn: [dict(r) for r in conn.execute(sql, params)])
+
+    def fetchone(self, sql, params=()):
+        def one(conn):
+            row = conn.execute(sql, params).fetchone()
+            return dict(row) if row else None
+        return self.run(one)
+
+    async def call(self, fn, *args):
+        """Await fn(conn, *args) on the executor"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.run, fn, *args)
+
+    async def all(self, sql, params=()):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.fetchall, sql, params)
+
+    async def one(self, sql, params=()):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.fetchone, sql, params)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def wait_for_schema(db_path, schema_version, timeout=None, interval=1.0):
+    """Block until the gateway has created / migrated db_path to schema_version (storage.SCHEMA_VERSION)
+
+    For processes that only read: opens the file read-only and never takes
+    a write lock. Raises TimeoutError after `timeout` seconds (None: wait forever).
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    waiting = False
+    while True:
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            version = None  # not created yet, or locked by an offline upgrade
+        if version == schema_version:
+            return
+        if deadline is not None and time.time() >= deadline:
+            raise TimeoutError(f"{db_path} is at schema {version}, expected {schema_version}")
+        if not waiting:
+            print(f"[DB] Waiting for the gateway to create / migrate {db_path} "
+                  f"(schema {version}, expected {schema_version})...")
+            waiting = True
+        time.sleep(interval)
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+def lttb(x, y, n):
+    """Indices of n points kept by Largest-Triangle-Three-Buckets
+
+    x must be ascending. The first and last points are always kept; every
+    bucket in between keeps the point forming the largest triangle with the
+    point kept before it and the mean of the next bucket. NaNs (missing
+    readings) are only picked when a bucket has nothing else.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    n = max(n, 3)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)  # n - 2 buckets between first and last
+    # Mean of every bucket (the last one's "next" is the final point), all at once
+    valid = ~np.isnan(y[:-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.add.reduceat(x[:-1], edges[:-1]) / np.diff(edges)
+        mean_y = (np.add.reduceat(np.where(valid, y[:-1], 0.0), edges[:-1])
+                  / np.add.reduceat(valid, edges[:-1]))
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    kept = np.empty(n, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    a = 0
+    for b in range(n - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[a] - mean_x[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[b] - y[a]))
+        area[np.isnan(area)] = -1.0
+        a = lo + int(np.argmax(area))
+        kept[b + 1] = a
+    return kept
+
+
+def minmax(y, n):
+    """Indices of the min and max of y in each of n // 2 equal-count buckets (plus first and last)"""
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    y = np.asarray(y, dtype=float)
+    buckets = max(1, n // 2)
+    starts = np.arange(buckets) * size // buckets
+    counts = np.diff(np.append(starts, size))
+    bucket = np.repeat(np.arange(buckets), counts)
+    kept = [np.array([0, size - 1])]
+    for fill, reduce in ((np.inf, np.minimum), (-np.inf, np.maximum)):
+        filled = np.where(np.isnan(y), fill, y)
+        # First row of each bucket equal to the bucket's min (max)
+        hits = np.flatnonzero(filled == np.repeat(reduce.reduceat(filled, starts), counts))
+        kept.append(hits[np.unique(bucket[hits], return_index=True)[1]])
+    return np.unique(np.concatenate(kept))
+
+
+def changes(codes):
+    """Indices on both sides of every change in codes (e.g. status)"""
+    codes = np.asarray(codes)
+    after = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    return np.unique(np.concatenate((after - 1, after)))
+
+
+def select(x, series, codes, points, method="lttb"):
+    """Row indices for a chart of about `points` rows
+
+    series: the numeric columns to preserve (each gets an equal share of
+    the points); codes: a column whose changes are always kept, up to half
+    the points (spread evenly if there are more).
+    """
+    size = len(x)
+    if size <= points:
+        return np.arange(size)
+    keep = [np.array([0, size - 1])]
+    if codes is not None:
+        changed = changes(codes)
+        if len(changed) > points // 2:
+            changed = changed[np.linspace(0, len(changed) - 1, points // 2).astype(np.int64)]
+        keep.append(changed)
+    budget = max(3, (points - sum(len(k) for k in keep)) // max(1, len(series)))
+    for y in series:
+        keep.append(lttb(x, y, budget) if method == "lttb" else minmax(y, budget))
+    if not series:
+        keep.append(np.linspace(0, size - 1, budget).astype(np.int64))
+    return np.unique(np.concatenate(keep))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules are flat scripts run from web_dashboard/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,65 @@
+import numpy as np
+
+import downsample
+
+
+def test_lttb_keeps_endpoints_and_count():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    kept = downsample.lttb(x, y, 100)
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[537] = 10.0
+    assert 537 in downsample.lttb(x, y, 20)
+
+
+def test_lttb_short_input_is_returned_whole():
+    assert list(downsample.lttb([0, 1, 2], [5, 6, 7], 10)) == [0, 1, 2]
+
+
+def test_lttb_skips_nan_when_it_can():
+    x = np.arange(100, dtype=float)
+    y = np.where(np.arange(100) % 2, np.nan, x)
+    kept = downsample.lttb(x, y, 10)
+    assert not np.isnan(y[kept[1:-1]]).any()
+
+
+def test_minmax_keeps_extremes_of_each_bucket():
+    y = np.array([1, 9, 5, 3,   2, 0, 7, 4,   6, 6, 8, 1], dtype=float)
+    kept = downsample.minmax(y, 6)  # 3 buckets of 4
+    assert list(kept) == [0, 1, 5, 6, 10, 11]
+
+
+def test_minmax_ignores_nan():
+    y = np.array([np.nan, 1, 5, np.nan, 2, 3], dtype=float)
+    kept = downsample.minmax(y, 2)
+    assert {1, 2} <= set(kept)
+
+
+def test_changes_keeps_both_sides():
+    codes = [0, 0, 0, 1, 1, 0, 0, 2]
+    assert list(downsample.changes(codes)) == [2, 3, 4, 5, 6, 7]
+    assert list(downsample.changes([1, 1, 1])) == []
+
+
+def test_select_keeps_status_changes_within_budget():
+    x = np.arange(10000, dtype=float)
+    y = np.random.default_rng(1).normal(size=10000)
+    codes = np.zeros(10000, dtype=np.int16)
+    codes[4000:4100] = 1
+    kept = downsample.select(x, [y], codes, 200)
+    assert {3999, 4000, 4099, 4100} <= set(kept)
+    assert len(kept) <= 200
+    assert list(kept) == sorted(set(kept))
+
+
+def test_select_without_series_spreads_points():
+    kept = downsample.select(np.arange(1000.0), [], None, 50)
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 40 <= len(kept) <= 50
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+import storage
+
+ROWS = 50
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The backend on a fresh database: two devices logging at the same ts_ms, no MQTT"""
+    path = str(tmp_path / "data.db")
+    storage.init_db(path)
+    conn = storage.connect(path)
+    with conn:
+        conn.executemany(storage.INSERT_SAMPLE, [
+            {"device_id": device_id, "ts_ms": 1000 * (i // 2), "ts": None, "temperature": 20.0 + i,
+             "humidity": 50.0, "button": 0, "abnormal_movement": 0, "sound_alert": 0, "person_present": 1,
+             "status": "NORMAL"}
+            for i, device_id in zip(range(ROWS), ["a", "b"] * ROWS)])
+    conn.close()
+    monkeypatch.setattr(backend, "DB_PATH", path)
+    monkeypatch.setattr(backend, "init_mqtt", lambda: None)
+    with TestClient(backend.app) as client:
+        yield client
+
+
+def all_pages(client, **params):
+    """Follow X-Next-Cursor from the first page to the last -> (rows, pages)"""
+    rows, pages, cursor = [], 0, None
+    while True:
+        resp = client.get("/api/history", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        rows += resp.json()
+        pages += 1
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows, pages
+
+
+def test_cursor_pages_cover_every_row_once_newest_first(client):
+    rows, pages = all_pages(client, limit=7)
+    assert pages == 8
+    keys = [(r["ts_ms"], r["id"]) for r in rows]
+    assert len(keys) == ROWS and len(set(keys)) == ROWS
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_cursor_pages_oldest_first_with_filters(client):
+    rows, _ = all_pages(client, limit=4, order="asc", device_id="a", **{"from": 3000, "to": 20000},
+                        fields="temperature")
+    assert [r["ts_ms"] for r in rows] == list(range(3000, 20001, 1000))
+    assert {tuple(r) for r in rows} == {("id", "ts_ms", "temperature")}
+    assert all(r["temperature"] % 2 == 0 for r in rows)  # device a holds the even samples
+
+
+def test_full_page_at_the_end_gets_an_empty_last_page(client):
+    rows, pages = all_pages(client, limit=25)
+    assert len(rows) == ROWS and pages == 3
+
+
+def test_bad_cursor_and_fields_are_rejected(client):
+    assert client.get("/api/history", params={"cursor": "nope"}).status_code == 400
+    assert client.get("/api/history", params={"fields": "temperature,secret"}).status_code == 400
+    assert client.get("/api/history", params={"limit": 0}).status_code == 422
+
+
+def test_cursor_header_is_readable_cross_origin(client):
+    resp = client.get("/api/history", params={"limit": 1}, headers={"Origin": "http://localhost:5173"})
+    assert "X-Next-Cursor" in resp.headers["access-control-expose-headers"]
+
+
+def test_export_streams_every_row_across_chunks(client, monkeypatch):
+    monkeypatch.setattr(backend, "EXPORT_CHUNK_ROWS", 7)
+    resp = client.get("/api/history/export", params={"format": "ndjson"})
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(r["ts_ms"], r["id"]) for r in rows] == sorted((r["ts_ms"], r["id"]) for r in rows)
+    assert len({r["id"] for r in rows}) == ROWS
+
+
+def test_chart_points_are_columnar_per_device(client):
+    assert client.get("/api/history", params={"points": 10}).status_code == 400  # needs device_id
+    resp = client.get("/api/history", params={"points": 10, "device_id": "a", "from": 0, "to": 24000})
+    chart = resp.json()
+    assert chart["resolution"] == "raw"
+    assert set(chart) == {"resolution", "ts_ms", "temperature", "humidity", "status"}
+    assert 3 <= len(chart["ts_ms"]) <= 10
+    assert chart["ts_ms"][0] == 0 and chart["ts_ms"][-1] == 24000
+    assert chart["ts_ms"] == sorted(chart["ts_ms"])
+    assert all(len(values) == len(chart["ts_ms"]) for key, values in chart.items() if key != "resolution")